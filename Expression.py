@@ -0,0 +1,123 @@
+from Node import NodeTypes
+from enums import OperatorsEnum
+
+
+class Expression:
+    """
+    Immutable node of a compiled condition. Expressions are only created
+    through an ExpressionTable, which hash-conses them: two structurally
+    equal subexpressions are always the same object and share one `id`.
+    """
+    __slots__ = ("id", "type", "value", "left", "right")
+
+    def __init__(self, id: int, type: NodeTypes, value: str | int,
+                 left=None, right=None):
+        object.__setattr__(self, "id", id)
+        object.__setattr__(self, "type", type)
+        object.__setattr__(self, "value", value)
+        object.__setattr__(self, "left", left)
+        object.__setattr__(self, "right", right)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Expression objects are immutable.")
+
+    def get_facts(self) -> list[int]:
+        """
+        Facts of the expression, once each, from left to right. The DAG is
+        walked with an explicit stack, each shared subexpression once.
+        """
+        facts = []
+        seen = set()
+        pending = [self]
+        while pending:
+            expression = pending.pop()
+            if expression.id in seen:
+                continue
+            seen.add(expression.id)
+            if expression.type == NodeTypes.FACT:
+                facts.append(expression.value)
+                continue
+            if expression.right is not None:
+                pending.append(expression.right)
+            pending.append(expression.left)
+        return facts
+
+    def to_string(self, symbols=None) -> str:
+        """
+        Render the expression in rule syntax, naming facts through
+        `symbols` (a SymbolTable) or by their id when it is not given.
+        The operands are rendered before their operator from an explicit
+        stack, so deep conditions do not hit the recursion limit.
+        """
+        results = []
+        pending = [(self, False)]
+        while pending:
+            expression, visited = pending.pop()
+            if expression.type == NodeTypes.FACT:
+                if symbols is None:
+                    results.append(f"#{expression.value}")
+                else:
+                    results.append(symbols.name(expression.value))
+            elif not visited:
+                pending.append((expression, True))
+                if expression.right is not None:
+                    pending.append((expression.right, False))
+                pending.append((expression.left, False))
+            elif expression.value == OperatorsEnum.NOT.value:
+                if expression.left.type == NodeTypes.FACT:
+                    results[-1] = f"!{results[-1]}"
+                else:
+                    results[-1] = f"!({results[-1]})"
+            else:
+                right = results.pop()
+                if expression.right.type == NodeTypes.OPERATOR and \
+                        expression.right.value != OperatorsEnum.NOT.value:
+                    right = f"({right})"
+                results[-1] = f"{results[-1]} {expression.value} {right}"
+        return results[0]
+
+    def __str__(self):
+        return self.to_string()
+
+
+class ExpressionTable:
+    """
+    Hash-consing table for the compiled conditions of one knowledge base.
+    Fact names are interned into `symbols`, so FACT expressions hold ids.
+    """
+
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.expressions = {}
+
+    def __len__(self):
+        return len(self.expressions)
+
+    def make(self, type: NodeTypes, value: str | int,
+             left=None, right=None):
+        # a fact id and an operator never compare equal, so the value
+        # tells the types apart without hashing the NodeTypes member
+        key = (value,
+               left.id if left is not None else -1,
+               right.id if right is not None else -1)
+        expression = self.expressions.get(key)
+        if expression is None:
+            expression = Expression(len(self.expressions), type, value,
+                                    left, right)
+            self.expressions[key] = expression
+        return expression
+
+    def restore(self, rows) -> list:
+        """
+        Refill an empty table from (type, value, left id, right id) rows in
+        id order, as saved by CompiledCache, and return the expressions.
+        """
+        table = []
+        expressions = self.expressions
+        for type, value, left, right in rows:
+            expression = Expression(len(table), type, value,
+                                    table[left] if left >= 0 else None,
+                                    table[right] if right >= 0 else None)
+            expressions[(value, left, right)] = expression
+            table.append(expression)
+        return table
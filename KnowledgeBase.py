@@ -0,0 +1,519 @@
+import logging
+import string
+import threading
+
+from Node import Node, NodeTypes
+from Expression import ExpressionTable
+from Rule import Rule
+from SymbolTable import SymbolTable
+from utils import Utils
+from enums import EngineEnum
+from backward import BackwardEngine, evaluate_node
+from forward import ForwardEngine
+from lazy import LazyEngine
+from optimizer import Optimizer
+from proof import Proof
+from bitset import BitsetEngine
+from cache import CompiledCache
+from reader import InputReader
+from rule_parser import RuleParser
+from schedule import Schedule
+from sat import SatEngine
+from truth import TruthMaintenance
+from stats import Stats, InstrumentedBackwardEngine
+from vectorized import VectorEngine
+
+logger = logging.getLogger("expert_system.parser")
+
+
+class MessageCollector(logging.Handler):
+    """
+    Keeps the warnings of a load, to be saved with its CompiledCache,
+    whatever the level of `logger`: while collecting, the logger lets the
+    warnings through to the collector, which passes on to the handlers of
+    its parents only the records the level of the logger allowed.
+    """
+
+    def __init__(self, logger):
+        super().__init__()
+        self.logger = logger
+        self.messages = []
+
+    def __enter__(self):
+        self.saved = (self.logger.level, self.logger.propagate)
+        self.threshold = self.logger.getEffectiveLevel()
+        self.logger.setLevel(min(self.threshold, logging.WARNING))
+        self.logger.propagate = False
+        self.logger.addHandler(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        level, self.logger.propagate = self.saved
+        self.logger.removeHandler(self)
+        self.logger.setLevel(level)
+
+    def emit(self, record):
+        if record.levelno >= logging.WARNING:
+            self.messages.append(record.getMessage())
+        if (record.levelno >= self.threshold and self.saved[1] and
+                self.logger.parent is not None):
+            self.logger.parent.handle(record)
+
+
+class KnowledgeBase:
+    """
+    Rules, initial facts and queries of an expert system input.
+
+    Loading compiles the rules once; after that they are only read, so one
+    KnowledgeBase can answer queries from several threads at the same time.
+    Every call of query works on its own copy of the facts, with its own
+    goal table and memo, and the facts given to a call are only asserted
+    for that call. Loading and asserting facts take a lock and should not
+    overlap with running queries.
+    """
+
+    def __init__(self):
+        self.symbols = SymbolTable()
+        self.expressions = ExpressionTable(self.symbols)
+        self.parser = RuleParser(self.expressions)
+        self.rules = []  # rules with a definite conclusion, see Rule
+        self.ambiguous_rules = []  # rules only the sat engine decides
+        self.rules_index = {}
+        self.facts = {}  # fact id -> True, False or None
+        self.queries = []  # fact ids
+        self.trees = {}  # query -> (expanded tree, plans) for evaluate
+        self.engines = {}  # compiled forward, bitset and sat engines
+        self.dependencies = None  # Schedule of the rules
+        self.original = None  # knowledge base this one was optimized from
+        self.lock = threading.Lock()
+        self.init_facts()
+
+    def init_facts(self):
+        for letter in string.ascii_uppercase:
+            self.symbols.intern(letter)
+        self.init_new_facts()
+
+    def init_new_facts(self):
+        """
+        Give the facts interned since the last call their default value.
+        """
+        for fact in range(len(self.facts), len(self.symbols)):
+            self.facts[fact] = False
+
+    def is_empty(self):
+        return (not self.rules and not self.ambiguous_rules and
+                not self.queries and
+                len(self.symbols) == len(string.ascii_uppercase) and
+                not any(self.facts.values()))
+
+    def load_file(self, path, cache=False):
+        """
+        Load the input file `path` and the files it includes. With `cache`,
+        an empty knowledge base is restored from the CompiledCache of the
+        file when its hash still matches, and the cache is (re)written
+        otherwise.
+        """
+        if not cache or not self.is_empty():
+            self.load_lines(InputReader().read_file(path))
+            self.log_loaded(path)
+            return
+        digest = CompiledCache.digest(path)
+        with self.lock:
+            messages = CompiledCache.read(self, path, digest)
+        if messages is not None:
+            # replay the warnings of the load that wrote the cache
+            for message in filter(None, messages.split("\n")):
+                logger.warning("%s", message)
+            logger.info("Using the compiled cache of %s.", path)
+            self.log_loaded(path)
+            return
+        reader = InputReader()
+        with MessageCollector(logger) as collector:
+            self.load_lines(reader.read_file(path))
+        CompiledCache.write(self, path, digest,
+                            "\n".join(collector.messages),
+                            reader.included[1:])
+        self.log_loaded(path)
+
+    def log_loaded(self, path):
+        logger.info("Loaded %s: %d rules, %d facts, %d queries.", path,
+                    len(self.rules), len(self.symbols), len(self.queries))
+
+    def load(self, input):
+        """
+        Add the rules, facts and queries of `input`, an iterable of lines.
+        """
+        self.load_lines(InputReader().read_lines(input))
+
+    def load_lines(self, lines):
+        with self.lock:
+            self.trees.clear()
+            self.engines.clear()
+            ambiguous = len(self.ambiguous_rules)
+            self.parse_inputfile(lines)
+            if len(self.ambiguous_rules) > ambiguous:
+                logger.warning("%d rules whose conclusion is not a "
+                               "conjunction of facts and negated facts (it "
+                               "uses `|` or `^`, or negates more than a "
+                               "fact) are only used by the sat engine.",
+                               len(self.ambiguous_rules) - ambiguous)
+            self.dependencies = Schedule(self.rules, len(self.symbols))
+            self.report_cycles()
+
+    def report_cycles(self):
+        """
+        Log the cycles of the rules once they are loaded, and warn about
+        those that go through a negation.
+        """
+        for facts, negated in self.dependencies.cycles():
+            names = ", ".join(self.symbols.name(fact) for fact in facts)
+            if negated:
+                logger.warning("Negation through the cycle of %s: their "
+                               "values depend on the order of the rules.",
+                               names)
+            else:
+                logger.info("Cycle between %s.", names)
+
+    def parse_inputfile(self, lines):
+        """
+        Read the (source, line number, line) entries of `lines`, as yielded
+        by InputReader. A line that cannot be read is reported with its
+        location and skipped, and the load goes on with the next one.
+        """
+        for source, number, line in lines:
+            try:
+                self.parse_line(line, source, number)
+            except Exception as e:
+                logger.warning("Error in line %d of %s: %s. Line skipped.",
+                               number, source, e)
+
+    def parse_line(self, line, source, number):
+        text = Utils.remove_comments(line)
+        line = text.strip()
+        if len(line) == 0:
+            return
+        if line.startswith('=') or line.startswith('?'):
+            if not Utils.is_string_valid(line):
+                logger.warning("Invalid character found in line %d of %s. "
+                               "Line skipped.", number, source)
+            elif line.startswith('='):
+                self.extract_facts(line)
+            else:
+                self.extract_queries(line)
+            return
+        known = len(self.symbols)
+        # unstripped, so that error columns are those of the input line
+        self.extract_rule(text)
+        for fact in range(known, len(self.symbols)):
+            name = self.symbols.name(fact)
+            if len(name) > 1 and Utils.is_letter_group(name):
+                logger.warning("Fact %s in line %d of %s cannot be given or "
+                               "queried: `=` and `?` lines read it as %s. "
+                               "Name it with mixed case, a digit or `_`.",
+                               name, number, source, ", ".join(name.upper()))
+
+    def extract_rule(self, line):
+        """
+        Parse a rule line with the RuleParser, which compiles its rules
+        into the expression table, and add them. A RuleSyntaxError gives
+        the column where the line stopped making sense.
+        """
+        try:
+            rules = self.parser.parse(line)
+        finally:
+            # the names read before an error are interned all the same
+            self.init_new_facts()
+        for rule in rules:
+            self.register_rule(rule)
+
+    def register_rule(self, rule: Rule):
+        """
+        File a compiled rule: a rule with a definite conclusion is used by
+        every engine, one whose conclusion uses `|` or `^` (like
+        `A => B | C`) only by the sat engine.
+        """
+        if not rule.is_definite():
+            self.ambiguous_rules.append(rule)
+            return
+        self.dependencies = None
+        self.rules.append(rule)
+        Utils.index_rule(self.rules_index, rule)
+
+    def split_fact_names(self, line):
+        """
+        Split the facts of a `=` or `?` line into names. Names are separated
+        by spaces, and a group of letters all in the same case is read one
+        letter per fact, in upper case like the original reader did, so
+        `=ABC` and `=abc` both mean A, B and C. A longer name needs mixed
+        case or another character (`Rain`, `RAIN_1`, `rain_1`): a rule
+        naming a fact `RAIN` is warned about when it is loaded, and so is a
+        group spelling such a fact here.
+        """
+        names = []
+        for group in line.split():
+            if not Utils.is_letter_group(group):
+                names.append(group)
+                continue
+            if len(group) > 1 and group in self.symbols:
+                logger.warning("`%s` is read as %s, not as the fact %s of "
+                               "the rules.", group, ", ".join(group.upper()),
+                               self.symbols.name(self.symbols.get(group)))
+            names.extend(group.upper())
+        return names
+
+    def extract_facts(self, line):
+        facts = self.split_fact_names(line[1:])
+        for index, fact in enumerate(facts):
+            if not Utils.is_fact_name(fact):
+                logger.warning("Wrong fact format found at index %d: "
+                               "\"%s\". Skipped.", index, fact)
+                continue
+            fact = self.symbols.intern(fact)
+            self.init_new_facts()
+            self.facts[fact] = True
+
+    def extract_queries(self, line):
+        queries = self.split_fact_names(line[1:])
+        for index, query in enumerate(queries):
+            if not Utils.is_fact_name(query):
+                logger.warning("Wrong query format found at index %d: "
+                               "\"%s\". Skipped.", index, query)
+                continue
+            self.queries.append(self.symbols.intern(query))
+        self.init_new_facts()
+
+    def assert_facts(self, names):
+        """
+        Make the facts `names` true for every following query.
+        """
+        with self.lock:
+            for name in names:
+                self.facts[self.symbols.intern(name)] = True
+                self.init_new_facts()
+
+    def retract_facts(self, names):
+        with self.lock:
+            for name in names:
+                fact = self.symbols.get(name)
+                if fact is not None:
+                    self.facts[fact] = False
+
+    def reset_facts(self):
+        with self.lock:
+            for fact in self.facts:
+                self.facts[fact] = False
+
+    def truth_maintenance(self) -> TruthMaintenance:
+        """
+        Answers for the asserted facts that are then kept up to date by
+        asserting and retracting facts on the returned TruthMaintenance,
+        without solving again from scratch.
+        """
+        return TruthMaintenance(self)
+
+    def fact_ids(self, names) -> list[int]:
+        """
+        Ids of the facts `names` that the knowledge base knows of. No rule
+        reads or concludes an unknown fact, see unknown_facts.
+        """
+        ids = []
+        for name in names:
+            fact = self.symbols.get(name)
+            if fact is not None:
+                ids.append(fact)
+        return ids
+
+    def unknown_facts(self, facts=None) -> set:
+        """
+        Upper-cased names of the facts among `facts` (names) that the
+        knowledge base does not know of. Nothing can change their value, so
+        a query of one of them is true, as given, while any other unknown
+        query is false.
+        """
+        return {name.upper() for name in facts or ()
+                if self.symbols.get(name) is None}
+
+    def scenario_facts(self, facts=None) -> dict:
+        """
+        Copy of the asserted facts, with `facts` (names) also made true.
+        """
+        scenario = dict(self.facts)
+        for fact in self.fact_ids(facts or ()):
+            scenario[fact] = True
+        return scenario
+
+    def schedule(self) -> Schedule:
+        """
+        Schedule of the rules, built when they are loaded (or on first use
+        for a knowledge base restored from its CompiledCache).
+        """
+        if self.dependencies is None:
+            with self.lock:
+                if self.dependencies is None:
+                    self.dependencies = Schedule(self.rules,
+                                                 len(self.symbols))
+        return self.dependencies
+
+    def engine(self, engine: EngineEnum):
+        if engine == EngineEnum.SAT and self.original is not None:
+            # the sat engine decides the rules as they were loaded
+            return self.original.engine(engine)
+        compiled = self.engines.get(engine)
+        if compiled is None:
+            schedule = self.schedule()
+            with self.lock:
+                compiled = self.engines.get(engine)
+                if compiled is None:
+                    if engine == EngineEnum.FORWARD:
+                        compiled = ForwardEngine(self.rules, schedule)
+                    elif engine == EngineEnum.SAT:
+                        compiled = SatEngine(self)
+                    else:
+                        compiled = BitsetEngine(self.rules, schedule)
+                    self.engines[engine] = compiled
+        return compiled
+
+    def query(self, queries=None, facts=None,
+              engine=EngineEnum.BACKWARD, stats: Stats = None) -> dict:
+        """
+        Answer `queries` (names, the queries of the input by default) with
+        `facts` (names) asserted for this call only, and return the values
+        by name. The knowledge base is left unchanged.
+        With `stats`, the solve is timed and the backward engine counts its
+        work into it (the lazy engine only its goal expansions, and those
+        it avoided).
+        The sat engine answers None for a query that the rules leave
+        undetermined, and raises ContradictionError when they contradict
+        the facts. The other engines ignore the rules with a `|` or `^` in
+        their conclusion.
+        """
+        if stats is not None:
+            with stats.phase("solve"):
+                return self._query(queries, facts, engine, stats)
+        return self._query(queries, facts, engine)
+
+    def _query(self, queries, facts, engine, stats=None):
+        if queries is None:
+            names = [self.symbols.name(query) for query in self.queries]
+        else:
+            names = list(queries)
+        scenario = self.scenario_facts(facts)
+        unknown = self.unknown_facts(facts)
+        ids = [self.symbols.get(name) for name in names]
+        if engine == EngineEnum.SAT:
+            answers = self.engine(engine).answer(
+                scenario, [id for id in ids if id is not None])
+            return {name: answers[id] if id is not None
+                    else name.upper() in unknown
+                    for name, id in zip(names, ids)}
+        if engine == EngineEnum.FORWARD:
+            self.engine(engine).run(scenario)
+        elif engine == EngineEnum.BITSET:
+            bitset = self.engine(engine)
+            scenario = bitset.run(bitset.store(scenario)).to_dict()
+        elif engine == EngineEnum.LAZY:
+            lazy = LazyEngine(self, scenario, count=stats is not None)
+            lazy.solve([id for id in ids if id is not None])
+            if stats is not None:
+                stats.run["goal_expansions"] += len(lazy.expanded)
+                stats.run["goals_avoided"] += lazy.avoided
+        elif stats is not None:
+            InstrumentedBackwardEngine(self, scenario, stats).solve(
+                [id for id in ids if id is not None])
+        else:
+            BackwardEngine(self, scenario).solve(
+                [id for id in ids if id is not None])
+        return {name: scenario[id] if id is not None
+                else name.upper() in unknown
+                for name, id in zip(names, ids)}
+
+    def optimized(self, facts=None) -> "KnowledgeBase":
+        """
+        Knowledge base answering the queries of this one with its rules
+        partially evaluated by the Optimizer for its asserted facts and
+        `facts` (names). It shares the symbols and the expressions of this
+        one, and its sat engine, which needs the rules as they are. Its
+        answers only hold for these facts: asserting or retracting facts,
+        or giving facts to a query, needs the rules of this knowledge base.
+        """
+        scenario = self.scenario_facts(facts)
+        self.schedule()  # the Optimizer reads it, built before the lock
+        with self.lock:
+            rules = Optimizer(self, scenario).optimize()
+        kb = KnowledgeBase()
+        kb.symbols = self.symbols
+        kb.expressions = self.expressions
+        kb.parser = self.parser
+        kb.ambiguous_rules = list(self.ambiguous_rules)
+        kb.facts = scenario
+        kb.queries = list(self.queries)
+        kb.original = self
+        for rule in rules:
+            kb.register_rule(rule)
+        kb.dependencies = Schedule(kb.rules, len(kb.symbols))
+        return kb
+
+    def explain(self, queries=None, facts=None, format="json") -> str:
+        """
+        Solve `queries` (names, the queries of the input by default) like
+        query, and return the proofs of their values rebuilt from the
+        derivations of the solve, as JSON trees or as a Graphviz DOT graph
+        (`format` "dot"). Unknown facts are left out.
+        """
+        if queries is None:
+            ids = list(self.queries)
+        else:
+            ids = self.fact_ids(queries)
+        scenario = self.scenario_facts(facts)
+        given = {fact for fact, value in scenario.items() if value is True}
+        engine = BackwardEngine(self, scenario)
+        engine.solve(ids)
+        proof = Proof(self, scenario, engine.derivations, given)
+        if format == "dot":
+            return proof.to_dot(ids)
+        return proof.to_json(ids)
+
+    def evaluate(self, query: str, facts=None):
+        """
+        Answer `query` with the non-destructive evaluator. The expanded tree
+        of each query is built once and cached with the plans of its facts,
+        then re-evaluated against the asserted facts and `facts` (names) on
+        every call.
+        """
+        name = query
+        query = self.symbols.get(name)
+        if query is None:
+            return name.upper() in self.unknown_facts(facts)
+        cached = self.trees.get(query)
+        schedule = self.schedule()  # BackwardEngine reads it, see optimized
+        if cached is None:
+            with self.lock:
+                cached = self.trees.get(query)
+                if cached is None:
+                    tree = BackwardEngine(self, self.facts).make_tree(
+                        Node(NodeTypes.FACT, query))
+                    cached = self.trees[query] = (tree, {})
+        tree, plans = cached
+        return evaluate_node(tree, self.scenario_facts(facts), {}, schedule,
+                             plans)
+
+    def query_scenarios(self, scenarios, queries=None) -> list[dict]:
+        """
+        Answer `queries` for each scenario of `scenarios`, a list of lists
+        of true fact names, at once with the vectorized engine. Like the
+        forward engine, the asserted facts are not used: each scenario
+        gives all of its initial facts.
+        """
+        if queries is None:
+            names = [self.symbols.name(query) for query in self.queries]
+        else:
+            names = list(queries)
+        vector = VectorEngine(self.rules, len(self.facts), self.schedule())
+        state = vector.run(vector.scenarios(
+            [self.fact_ids(scenario) for scenario in scenarios]))
+        ids = [self.symbols.get(name) for name in names]
+        unknown = [self.unknown_facts(scenario) for scenario in scenarios]
+        return [{name: bool(state[row, id]) if id is not None
+                 else name.upper() in unknown[row]
+                 for name, id in zip(names, ids)}
+                for row in range(len(state))]
@@ -14,6 +14,7 @@ class ChildLinkTypes(Enum):
 
 
 class Child:
+    __slots__ = ("node", "link_type")
     node: None
     link_type: None
 
@@ -35,6 +36,7 @@ class Child:
 
 
 class Node:
+    __slots__ = ("type", "value", "left", "right", "children")
     type: NodeTypes
     value: str | bool | None
     left: Child
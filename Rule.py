@@ -1,29 +1,33 @@
-from enums import RelationEnum, TokensEnum
+from Node import NodeTypes
+from bytecode import Bytecode
+from enums import OperatorsEnum, TokensEnum
 
 
 class Rule:
-    conditions = []
-    conclusions = []
-    relation = ""
+    """
+    One rule, kept compact since a knowledge base may hold millions of
+    them: the instances have `__slots__`, and the tokens of both sides are
+    packed in one `array("i")` of codes, `fact id * 8 + LETTER` for a fact
+    name and the TokensEnum value otherwise, the conclusion starting at
+    `split`. The facts and literals of the conclusion are tuples, and the
+    facts of the condition are read from its Bytecode when asked for.
+    Rules are built by RuleParser, or by CompiledCache, through restore.
+    """
+    __slots__ = ("conditions", "conclusions", "relation", "tokens", "split",
+                 "compiled_condition", "compiled_conclusion", "bytecode",
+                 "concluded_facts", "conclusion_literals", "definite")
 
-    condition_tokens = []
-    conclusion_tokens = []
-
-    def __init__(self, conditions, conclusions, relation: RelationEnum):
-        relation = relation.lower()
-        self.conditions = conditions.strip()
-        self.conclusions = conclusions.strip()
-        self.relation = relation
-
-        condition_tokens = self.tokenize(conditions)
-        if (not self.validate_rule(condition_tokens)):
-            raise ValueError(f"Wrong condition format: {conditions}")
-        self.condition_tokens = condition_tokens
-
-        conclusion_tokens = self.tokenize(conclusions)
-        if (not self.validate_rule(conclusion_tokens)):
-            raise ValueError(f"Wrong conclusion format: {conclusions}")
-        self.conclusion_tokens = conclusion_tokens
+    symbol_tokens = {
+        "^": TokensEnum.OPERATOR_XOR,
+        "!": TokensEnum.OPERATOR_NOT,
+        "(": TokensEnum.PARENTHESIS_OPEN,
+        ")": TokensEnum.PARENTHESIS_CLOSED,
+        "|": TokensEnum.OPERATOR_OR,
+        "+": TokensEnum.OPERATOR_AND,
+    }
+    LETTER = TokensEnum.LETTER.value
+    token_types = {token.value: (token, char)
+                   for char, token in symbol_tokens.items()}
 
     def get_conditions(self):
         return self.conditions
@@ -31,78 +35,122 @@ class Rule:
     def get_conclusions(self):
         return self.conclusions
 
+    @staticmethod
+    def restore(conditions, conclusions, relation, tokens, split,
+                compiled_condition, compiled_conclusion, bytecode):
+        """
+        Build a rule from parts that were validated and compiled before
+        (by RuleParser, or saved by CompiledCache) without tokenizing it
+        again. `tokens` are the packed codes of both sides, the conclusion
+        starting at `split`.
+        """
+        rule = Rule.__new__(Rule)
+        rule.conditions = conditions
+        rule.conclusions = conclusions
+        rule.relation = relation
+        rule.tokens = tokens
+        rule.split = split
+        rule.compiled_condition = compiled_condition
+        rule.compiled_conclusion = compiled_conclusion
+        rule.bytecode = bytecode
+        rule.read_conclusion()
+        return rule
+
+    def get_tokens(self, symbols) -> tuple[list, list]:
+        """
+        The (TokensEnum, text) token lists of the condition and of the
+        conclusion, naming the facts through `symbols`.
+        """
+        decoded = [(TokensEnum.LETTER, symbols.name(code >> 3))
+                   if code & 7 == Rule.LETTER
+                   else Rule.token_types[code]
+                   for code in self.tokens]
+        return decoded[:self.split], decoded[self.split:]
+
+    def read_conclusion(self):
+        """
+        Derive the conclusion literals, the concluded facts and whether the
+        rule is definite from the compiled conclusion.
+        """
+        conclusion = self.compiled_conclusion
+        self.definite = self.is_conjunction_of_literals(conclusion)
+        if self.definite:
+            literals = self.extract_literals(conclusion)
+        else:
+            # any fact of an ambiguous conclusion may be made true
+            literals = [(fact, True) for fact in conclusion.get_facts()]
+        self.conclusion_literals = tuple(literals)
+        self.concluded_facts = tuple(dict.fromkeys(
+            fact for fact, _ in literals))
+
+    def get_compiled_condition(self):
+        return self.compiled_condition
+
+    def get_compiled_conclusion(self):
+        return self.compiled_conclusion
+
+    def is_definite(self):
+        """
+        Whether the conclusion is a conjunction of facts and negated facts
+        (like `B + !C`, double negations left out), which sets each of
+        them. Another conclusion (using `|` or `^`, or negating more than a
+        fact) only restricts its facts, and only the sat engine uses it.
+        """
+        return self.definite
+
+    def get_bytecode(self):
+        return self.bytecode
+
+    def get_condition_facts(self):
+        """
+        Ids of the facts the condition reads, read from the Bytecode.
+        """
+        return Bytecode.facts(self.bytecode)
+
+    def get_concluded_facts(self):
+        return self.concluded_facts
+
+    def get_conclusion_literals(self):
+        return self.conclusion_literals
+
     def __str__(self):
         return f"{self.conditions}{self.relation}{self.conclusions}"
 
     @staticmethod
-    def tokenize(str):
-        tokens = []
-        str = str.strip()
-        for char in str:
-            if char.isspace():
-                continue
-            if char.isalpha():
-                tokens.append((TokensEnum.LETTER, char))
-            elif char == "^":
-                tokens.append((TokensEnum.OPERATOR_XOR, char))
-            elif char == "!":
-                tokens.append((TokensEnum.OPERATOR_NOT, char))
-            elif char == "(":
-                tokens.append((TokensEnum.PARENTHESIS_OPEN, char))
-            elif char == ")":
-                tokens.append((TokensEnum.PARENTHESIS_CLOSED, char))
-            elif char == "|":
-                tokens.append((TokensEnum.OPERATOR_OR, char))
-            elif char == "+":
-                tokens.append((TokensEnum.OPERATOR_AND, char))
-            else:
-                raise ValueError(f"Unexpected character found in rule: {char}")
-        return tokens
+    def without_double_negation(expression):
+        """
+        `expression` without the pairs of `!` in front of it, so that `!!A`
+        reads as `A` and `!!(A + B)` as `A + B`.
+        """
+        NOT = OperatorsEnum.NOT.value
+        while (expression.type == NodeTypes.OPERATOR and
+               expression.value == NOT and
+               expression.left.type == NodeTypes.OPERATOR and
+               expression.left.value == NOT):
+            expression = expression.left.left
+        return expression
+
+    @staticmethod
+    def is_conjunction_of_literals(expression):
+        expression = Rule.without_double_negation(expression)
+        if expression.type == NodeTypes.FACT:
+            return True
+        if expression.value == OperatorsEnum.NOT.value:
+            return expression.left.type == NodeTypes.FACT
+        return (expression.value == OperatorsEnum.AND.value and
+                Rule.is_conjunction_of_literals(expression.left) and
+                Rule.is_conjunction_of_literals(expression.right))
 
     @staticmethod
-    def validate_rule(tokens):
-        open_parenthesis_counter = 0
-        closed_parenthesis_counter = 0
-        previous_token = None
-
-        for i in range(len(tokens)):
-            token = tokens[i]
-            if (not isinstance(token, tuple)):
-                raise TypeError("Token should be a tuple.")
-            if (i == len(tokens) - 1):
-                if (token[0] is not TokensEnum.LETTER
-                        and token[0] is not TokensEnum.PARENTHESIS_CLOSED):
-                    return False
-            elif token[0] == TokensEnum.LETTER:
-                if (previous_token is not None and
-                    (previous_token[0] == TokensEnum.LETTER or
-                     previous_token[0] == TokensEnum.PARENTHESIS_CLOSED)):
-                    return False
-            elif token[0] == TokensEnum.PARENTHESIS_OPEN:
-                open_parenthesis_counter += 1
-                if (previous_token is not None and
-                    (previous_token[0] == TokensEnum.LETTER or
-                     previous_token[0] == TokensEnum.PARENTHESIS_CLOSED)):
-                    return False
-            if token[0] == TokensEnum.PARENTHESIS_CLOSED:
-                closed_parenthesis_counter += 1
-                if (previous_token is None or
-                        previous_token[0] is not TokensEnum.LETTER):
-                    return False
-            elif token[0] == TokensEnum.OPERATOR_NOT:
-                if (previous_token is not None and
-                    (previous_token[0] == TokensEnum.LETTER or
-                     previous_token[0] == TokensEnum.PARENTHESIS_CLOSED)):
-                    return False
-            elif (token[0] == TokensEnum.OPERATOR_AND or
-                  token[0] == TokensEnum.OPERATOR_OR or
-                  token[0] == TokensEnum.OPERATOR_XOR):
-                if (previous_token is None or
-                    (previous_token[0] is not TokensEnum.LETTER and
-                     previous_token[0] is not TokensEnum.PARENTHESIS_CLOSED)):
-                    return False
-            previous_token = token
-        if (open_parenthesis_counter != closed_parenthesis_counter):
-            # print(open_parenthesis_counter, closed_parenthesis_counter)
-            return False
-        return True
+    def extract_literals(expression):
+        """
+        Return the (fact id, positive) pairs of a conjunction of literals,
+        a fact being negative under an odd number of `!`.
+        """
+        expression = Rule.without_double_negation(expression)
+        if expression.type == NodeTypes.FACT:
+            return [(expression.value, True)]
+        if expression.value == OperatorsEnum.NOT.value:
+            return [(expression.left.value, False)]
+        return (Rule.extract_literals(expression.left) +
+                Rule.extract_literals(expression.right))
@@ -0,0 +1,32 @@
+class SymbolTable:
+    """
+    Interns fact names into dense integer ids (0, 1, 2, ...), so the engines
+    can work on ints and only the parser and the output deal with names.
+    Names are case-insensitive, like single-letter facts always were, and
+    keep the spelling they were first interned with.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name.upper() in self.ids
+
+    def intern(self, name: str) -> int:
+        key = name.upper()
+        id = self.ids.get(key)
+        if id is None:
+            id = len(self.names)
+            self.ids[key] = id
+            self.names.append(name)
+        return id
+
+    def get(self, name: str) -> int | None:
+        return self.ids.get(name.upper())
+
+    def name(self, id: int) -> str:
+        return self.names[id]
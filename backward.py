@@ -0,0 +1,441 @@
+import heapq
+import logging
+
+from Node import Node, NodeTypes, Child, ChildLinkTypes
+from bytecode import Bytecode
+from enums import GoalStatesEnum, OperatorsEnum
+
+logger = logging.getLogger("expert_system.solver")
+
+
+def evaluate_node(node: Node, facts: dict, values: dict, schedule=None,
+                  plans=None):
+    """
+    Non-destructive evaluation of the trees of make_tree: computes the
+    value of `node` against `facts` without rewriting the tree, like the
+    backward engine would. A FACT node keeps a value given in `facts`, and
+    otherwise takes the value of the first condition below it that holds
+    (false for an inverted link). The facts resolved along the way are
+    kept in the `values` side table by id, so each is resolved once
+    whatever the number of leaves reading it, and the same tree can be
+    evaluated again later against another fact state.
+    The facts of a cyclic component of the `schedule` are resolved
+    together, pass after pass like BackwardEngine.solve_component. The
+    tree is walked with explicit stacks, so deep trees do not hit the
+    recursion limit. What a fact needs from the tree (see fact_plan) is
+    kept in `plans`, so that a cached tree is only walked on the first
+    evaluation that reaches each of its facts.
+    """
+    if node.get_type() == NodeTypes.FACT:
+        resolve_fact(node, facts, values, schedule, plans)
+        return values[node.get_value()]
+    for leaf in fact_leaves(node):
+        resolve_fact(leaf, facts, values, schedule, plans)
+    return condition_value(node, facts, values)
+
+
+def fact_leaves(node: Node) -> list[Node]:
+    """
+    FACT nodes of the condition tree `node`, without the trees below them.
+    """
+    leaves = []
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        match node.get_type():
+            case NodeTypes.FACT:
+                leaves.append(node)
+            case NodeTypes.OPERATOR:
+                if node.get_right() is not None:
+                    pending.append(node.get_right().get_node())
+                pending.append(node.get_left().get_node())
+    return leaves
+
+
+def condition_value(node: Node, facts: dict, values: dict):
+    """
+    Value of the condition tree `node`, reading each fact from `values`,
+    or from `facts` when it was not resolved.
+    """
+    results = []
+    pending = [(node, False)]
+    while pending:
+        node, visited = pending.pop()
+        type = node.get_type()
+        value = node.get_value()
+        if type == NodeTypes.FACT:
+            results.append(values[value] if value in values
+                           else facts.get(value))
+        elif type == NodeTypes.BOOLEAN:
+            results.append(value)
+        elif type != NodeTypes.OPERATOR:
+            raise SystemError(
+                "Something went wrong during tree construction. "
+                "Condition node should not be of type PHRASE.")
+        elif not visited:
+            pending.append((node, True))
+            if node.get_right() is not None:
+                pending.append((node.get_right().get_node(), False))
+            pending.append((node.get_left().get_node(), False))
+        elif value == OperatorsEnum.NOT.value:
+            if results[-1] is not None:
+                results[-1] = not results[-1]
+        else:
+            rvalue = results.pop()
+            lvalue = results[-1]
+            if lvalue is None or rvalue is None:
+                results[-1] = None
+            elif value == OperatorsEnum.AND.value:
+                results[-1] = lvalue and rvalue
+            elif value == OperatorsEnum.OR.value:
+                results[-1] = lvalue or rvalue
+            elif value == OperatorsEnum.XOR.value:
+                results[-1] = lvalue ^ rvalue
+            else:
+                raise ValueError(f"Unknown operator: {value}")
+    return results[0]
+
+
+def component_nodes(node: Node, schedule) -> list[Node]:
+    """
+    FACT nodes of the facts in the component of `node`, in the order of
+    the members of the component: the tree reaches all of them from
+    `node` without leaving the component.
+    """
+    component = schedule.component[node.get_value()]
+    nodes = {node.get_value(): node}
+    pending = [node]
+    while pending:
+        for child in pending.pop().get_children():
+            for leaf in fact_leaves(child.get_node()):
+                fact = leaf.get_value()
+                if (fact not in nodes and fact < schedule.size and
+                        schedule.component[fact] == component):
+                    nodes[fact] = leaf
+                    pending.append(leaf)
+    return [nodes[fact] for fact in sorted(nodes)]
+
+
+def condition_code(node: Node) -> list:
+    """
+    Postfix code of the condition tree `node`, in the format of Bytecode
+    (fact ids, and negative opcodes for the operators), for run_condition.
+    """
+    code = []
+    pending = [(node, False)]
+    while pending:
+        node, visited = pending.pop()
+        type = node.get_type()
+        if type == NodeTypes.FACT:
+            code.append(node.get_value())
+        elif type != NodeTypes.OPERATOR:
+            raise SystemError(
+                "Something went wrong during tree construction. "
+                "Condition node should be a FACT or an OPERATOR.")
+        elif visited:
+            code.append(Bytecode.opcodes[node.get_value()])
+        else:
+            pending.append((node, True))
+            if node.get_right() is not None:
+                pending.append((node.get_right().get_node(), False))
+            pending.append((node.get_left().get_node(), False))
+    return code
+
+
+def run_condition(code: list, facts: dict, values: dict):
+    """
+    Run the `code` of condition_code like Bytecode.run, reading each fact
+    from `values`, or from `facts` when it was not resolved.
+    """
+    stack = []
+    for op in code:
+        if op >= 0:
+            stack.append(values[op] if op in values else facts.get(op))
+        elif op == Bytecode.NOT:
+            if stack[-1] is not None:
+                stack[-1] = not stack[-1]
+        else:
+            right = stack.pop()
+            left = stack[-1]
+            if left is None or right is None:
+                stack[-1] = None
+            elif op == Bytecode.AND:
+                stack[-1] = left and right
+            elif op == Bytecode.OR:
+                stack[-1] = left or right
+            else:
+                stack[-1] = left ^ right
+    return stack[0]
+
+
+def fact_plan(node: Node, schedule=None) -> tuple:
+    """
+    What resolving the fact of the FACT node `node` takes, walked once from
+    the tree: whether it is solved with the other facts of a cyclic
+    component of the `schedule`, the (fact, conditions) of those members
+    (only `node` itself otherwise), each condition being its
+    condition_code with whether its link is direct, and the FACT nodes
+    outside of the members that the conditions read, to resolve first.
+    """
+    fact = node.get_value()
+    cyclic = (schedule is not None and fact < schedule.size and
+              schedule.component[fact] in schedule.cyclic)
+    members = component_nodes(node, schedule) if cyclic else [node]
+    inside = {member.get_value() for member in members}
+    needed = {}
+    conditions = []
+    for member in members:
+        codes = []
+        for child in member.get_children():
+            condition = child.get_node()
+            for leaf in fact_leaves(condition):
+                if leaf.get_value() not in inside:
+                    needed.setdefault(leaf.get_value(), leaf)
+            codes.append((condition_code(condition),
+                          child.get_link_type() == ChildLinkTypes.DEFAULT))
+        conditions.append((member.get_value(), codes))
+    return cyclic, conditions, list(needed.values())
+
+
+def resolve_fact(node: Node, facts: dict, values: dict, schedule=None,
+                 plans=None):
+    """
+    Resolve the fact of the FACT node `node` into `values`, after the
+    facts its conditions read, taking the plan of each fact from `plans`
+    (fact id -> fact_plan) or adding it there.
+    """
+    if plans is None:
+        plans = {}
+    stack = [node]
+    active = set()  # facts whose conditions wait for other facts
+    while stack:
+        node = stack[-1]
+        fact = node.get_value()
+        if fact in values:
+            stack.pop()
+            continue
+        if facts.get(fact) is not False or not node.get_children():
+            values[fact] = facts.get(fact)
+            stack.pop()
+            continue
+        plan = plans.get(fact)
+        if plan is None:
+            plan = plans[fact] = fact_plan(node, schedule)
+        cyclic, members, needed = plan
+        if fact not in active:
+            missing = [leaf for leaf in needed
+                       if leaf.get_value() not in values and
+                       leaf.get_value() not in active]
+            if missing:
+                active.add(fact)
+                stack.extend(missing)
+                continue
+        stack.pop()
+        active.discard(fact)
+        for member, _ in members:
+            values[member] = facts.get(member)
+        changed = True
+        while changed:
+            changed = False
+            for member, conditions in members:
+                if values[member] is not False:
+                    continue
+                for code, direct in conditions:
+                    if run_condition(code, facts, values) is True:
+                        values[member] = direct
+                        changed = changed or cyclic and direct
+                        break
+
+
+class BackwardEngine:
+    """
+    Backward chaining over the rules of a KnowledgeBase. An engine holds
+    the state of one solve (the facts and the goal table), so each call
+    of KnowledgeBase.query uses its own engine while the knowledge base
+    itself is only read. The facts a query depends on are solved in the
+    order of the Schedule of the knowledge base, so a fact (negated or not)
+    is final before any condition reads it. Conditions are evaluated by
+    running the Bytecode of their rule; Node trees are only built by
+    make_tree, for evaluate_node.
+    """
+
+    def __init__(self, kb, facts: dict):
+        self.kb = kb
+        self.facts = facts  # fact id -> True, False or None
+        self.schedule = kb.schedule()
+        self.goals = {}  # fact -> GoalStatesEnum for the current run
+        self.planned = set()  # components queued or solved in this run
+        self.agenda = []  # heap of the components queued, by number
+        self.derivations = {}  # fact -> the Rule that set it, see Proof
+
+    def solve(self, queries) -> dict:
+        """
+        Resolve every query and return their values by fact id.
+        """
+        return {query: self.resolve_goal(query) for query in queries}
+
+    def describe(self, rule):
+        """
+        Condition of `rule` in rule syntax, for the trace. Only called
+        when the solver logger is enabled for DEBUG.
+        """
+        return rule.get_compiled_condition().to_string(self.kb.symbols)
+
+    def condition_tree(self, rule, nodes: dict, pending: list) -> Node:
+        """
+        Node tree of the condition of `rule`, for make_tree, whose FACT
+        leaves are the nodes of `nodes` (fact id -> Node), the nodes it
+        creates being added to `nodes` and to `pending`.
+        """
+        root = None
+        stack = [(rule.get_compiled_condition(), None, None)]
+        while stack:
+            expression, parent, left = stack.pop()
+            if expression.type == NodeTypes.FACT:
+                node = nodes.get(expression.value)
+                if node is None:
+                    node = Node(NodeTypes.FACT, expression.value)
+                    nodes[expression.value] = node
+                    pending.append(node)
+            else:
+                node = Node(NodeTypes.OPERATOR, expression.value)
+                if expression.right is not None:
+                    stack.append((expression.right, node, False))
+                stack.append((expression.left, node, True))
+            if parent is None:
+                root = node
+            elif left:
+                parent.set_left(Child(node))
+            else:
+                parent.set_right(Child(node))
+        return root
+
+    def evaluate(self, rule):
+        return Bytecode.run(rule.get_bytecode(), self.facts)
+
+    @staticmethod
+    def determine_link(query, rule):
+        """
+        This function determines whether the link between a fact and its
+        condition is direct or inverted.
+        For example, in the rule "A + B => C", the condition "A + B" directly
+        supports "C".
+        In the rule "A + B => !C", the condition "A + B" inversely supports
+        "C". The link follows the literal of the fact itself, so in
+        "A => B + !C" the condition still directly supports "B".
+        """
+        literals = rule.get_conclusion_literals()
+        if (query, False) in literals and (query, True) not in literals:
+            return ChildLinkTypes.INVERTED
+        return ChildLinkTypes.DEFAULT
+
+    def make_tree(self, parent_node):
+        """
+        Extend a FACT node with the condition trees of the rules concluding
+        its fact, and the FACT leaves of those trees with theirs, until
+        every fact reached is expanded, for evaluate_node (the solver itself
+        runs the Bytecode of the rules). Every fact has a single node,
+        shared by the leaves reading it and expanded once, so the result is
+        a graph, cyclic when the rules are. Expansion does not depend on the
+        current facts.
+        """
+        if not isinstance(parent_node, Node):
+            raise TypeError("make_tree: arg should be of type Node.")
+        if parent_node.get_type() != NodeTypes.FACT:
+            raise ValueError("make_tree: node is not of type FACT.")
+        nodes = {parent_node.get_value(): parent_node}
+        pending = [parent_node]
+        while pending:
+            node = pending.pop()
+            fact = node.get_value()
+            for rule in self.kb.rules_index.get(fact, ()):
+                condition = self.condition_tree(rule, nodes, pending)
+                node.add_child(Child(condition,
+                                     self.determine_link(fact, rule)))
+        return parent_node
+
+    def expand_goal(self, fact):
+        """
+        Register in the goal table the facts of the components of the
+        Schedule that must be solved to resolve `fact`, and queue those
+        components, so each one is solved once per run whatever the order
+        of the queries.
+        """
+        components = self.schedule.plan(fact, self.planned)
+        members = self.schedule.members
+        goals = self.goals
+        for component in components:
+            for member in members[component]:
+                goals[member] = GoalStatesEnum.EXPANDED
+            heapq.heappush(self.agenda, component)
+
+    def resolve_goal(self, fact):
+        """
+        Return the value of `fact` for the current run. A fact that is not
+        false is given, and a false fact is expanded once, then the queued
+        components are solved in the order of the Schedule until its own
+        is.
+        """
+        goal = self.goals.get(fact)
+        if goal is None:
+            if self.facts.get(fact) is not False:
+                return self.facts.get(fact)
+            self.expand_goal(fact)
+            if fact not in self.goals:
+                # interned after the rules: no rule concludes it
+                return self.facts[fact]
+        while self.goals[fact] != GoalStatesEnum.RESOLVED:
+            self.solve_component(heapq.heappop(self.agenda))
+        return self.facts[fact]
+
+    def solve_component(self, component):
+        """
+        Solve the facts of `component`, whose dependencies are all solved
+        already: once for a single fact, and pass after pass until nothing
+        changes for a cycle, each pass only making facts true.
+        """
+        members = self.schedule.members[component]
+        if component in self.schedule.cyclic:
+            while self.solve_pass(members):
+                pass
+        elif self.facts[members[0]] is False:
+            self.solve_goal(members[0])
+        for fact in members:
+            self.goals[fact] = GoalStatesEnum.RESOLVED
+
+    def solve_pass(self, members) -> bool:
+        """
+        Solve every false fact of a cyclic component once, and return
+        whether one became true.
+        """
+        changed = False
+        for fact in members:
+            if self.facts[fact] is False:
+                self.solve_goal(fact)
+                changed = changed or self.facts[fact] is True
+        return changed
+
+    def solve_goal(self, fact):
+        """
+        Run the Bytecode of the rules concluding `fact` in order, until
+        one holds and sets its value.
+        """
+        symbols = self.kb.symbols
+        facts = self.facts
+        rules = self.kb.rules_index.get(fact, ())
+        trace = logger.isEnabledFor(logging.DEBUG)
+        if trace:
+            logger.debug("Solving query %s with %d condition(s).",
+                         symbols.name(fact), len(rules))
+        for rule in rules:
+            if trace:
+                text = self.describe(rule)  # rendered once for both lines
+                logger.debug("solving condition: %s", text)
+            if self.evaluate(rule) is True:
+                facts[fact] = (self.determine_link(fact, rule) ==
+                               ChildLinkTypes.DEFAULT)
+                self.derivations[fact] = rule
+                if trace:
+                    logger.debug("Fact %s set to %s based on condition %s.",
+                                 symbols.name(fact), facts[fact], text)
+                return
@@ -0,0 +1,113 @@
+import json
+import multiprocessing
+import os
+from collections import deque
+
+from enums import EngineEnum
+from server import QueryServer
+
+# The knowledge base of the running batch. Forked workers inherit it
+# copy-on-write instead of parsing the rules again.
+_kb = None
+
+
+def answer_chunk(lines):
+    """
+    Answer a chunk of JSON line scenarios in a worker; return the answers
+    as one block of JSON lines.
+    """
+    server = QueryServer(_kb)
+    return b"".join(server.respond(line) for line in lines)
+
+
+class BatchRunner:
+    """
+    Answers a JSONL file of scenarios, in the request format of
+    QueryServer, against one loaded KnowledgeBase. The scenarios are read
+    as a stream and sent in chunks to a pool of forked workers, and the
+    answers are written in input order. At most a few chunks per worker are
+    in flight at a time, so memory does not grow with the input.
+
+    The Schedule of the rules and the engines the scenarios name are built
+    in the parent before the workers are forked, so that they inherit them
+    with the rules. The input being a stream, a chunk naming an engine not
+    compiled yet waits for the answers in flight, and the pool is forked
+    again once it is compiled.
+    """
+
+    compiled = (EngineEnum.FORWARD, EngineEnum.BITSET, EngineEnum.SAT)
+
+    def __init__(self, kb, workers=None, chunk_size=512):
+        self.kb = kb
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+    def chunks(self, input):
+        chunk = []
+        for line in input:
+            if not line.strip():
+                continue
+            chunk.append(line)
+            if len(chunk) == self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def engines(self, chunk) -> set:
+        """
+        The compiled engines the scenarios of `chunk` name.
+        """
+        engines = set()
+        for line in chunk:
+            if b'"engine"' not in line:
+                continue
+            try:
+                engine = EngineEnum(json.loads(line).get("engine"))
+            except (ValueError, AttributeError):
+                continue  # a worker answers it with the error
+            if engine in self.compiled:
+                engines.add(engine)
+        return engines
+
+    def run(self, input, output):
+        """
+        Answer the scenarios of `input`, a binary file of JSON lines, and
+        write the answers to `output`, a binary file.
+        """
+        global _kb
+        _kb = self.kb
+        # a knowledge base restored from its cache has no Schedule yet:
+        # build it once here instead of in every worker
+        self.kb.schedule()
+        if (self.workers == 1 or
+                "fork" not in multiprocessing.get_all_start_methods()):
+            for chunk in self.chunks(input):
+                output.write(answer_chunk(chunk))
+            return
+        context = multiprocessing.get_context("fork")
+        built = set()
+        pool = None
+        pending = deque()
+        try:
+            for chunk in self.chunks(input):
+                missing = self.engines(chunk) - built
+                if pool is None or missing:
+                    if pool is not None:
+                        # its workers were forked without these engines
+                        while pending:
+                            output.write(pending.popleft().get())
+                        pool.close()
+                        pool.join()
+                    for engine in missing:
+                        self.kb.engine(engine)
+                    built |= missing
+                    pool = context.Pool(self.workers)
+                pending.append(pool.apply_async(answer_chunk, (chunk,)))
+                if len(pending) >= 4 * self.workers:
+                    output.write(pending.popleft().get())
+            while pending:
+                output.write(pending.popleft().get())
+        finally:
+            if pool is not None:
+                pool.terminate()
@@ -0,0 +1,60 @@
+"""
+Throughput of the batch runner (BatchRunner) on a JSONL scenario file for
+a growing number of worker processes.
+
+Usage: python benchmarks/bench_batch.py [scenarios] [max_workers]
+"""
+import io
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from KnowledgeBase import KnowledgeBase  # noqa: E402
+from batch import BatchRunner  # noqa: E402
+
+LETTERS = [chr(ord("A") + i) for i in range(26)]
+
+
+def generate_rules(rng, count):
+    lines = []
+    for _ in range(count):
+        conclusion = rng.randrange(8, 26)
+        operands = rng.sample(LETTERS[:conclusion], rng.randint(1, 4))
+        condition = operands[0]
+        for operand in operands[1:]:
+            condition += f" {rng.choice('++|^')} {operand}"
+        lines.append(f"{condition} => {LETTERS[conclusion]}")
+    return lines + ["?" + "".join(LETTERS[20:])]
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    rng = random.Random(42)
+    kb = KnowledgeBase()
+    kb.load(generate_rules(rng, 200))
+    scenarios = b"".join(
+        (json.dumps({"id": index,
+                     "facts": rng.sample(LETTERS[:8], rng.randint(0, 8))})
+         + "\n").encode()
+        for index in range(count))
+    expected = None
+    workers = 1
+    while workers <= limit:
+        output = io.BytesIO()
+        start = time.perf_counter()
+        BatchRunner(kb, workers).run(io.BytesIO(scenarios), output)
+        elapsed = time.perf_counter() - start
+        if expected is None:
+            expected, single = output.getvalue(), elapsed
+        status = ("same answers" if output.getvalue() == expected
+                  else "DIFFERENT")
+        print(f"{workers:>3} workers: {count / elapsed:10.0f} scenarios/s "
+              f"(x{single / elapsed:.1f}, {status})")
+        workers *= 2
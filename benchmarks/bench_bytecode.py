@@ -0,0 +1,112 @@
+"""
+Cost of evaluating every rule condition once, for the three evaluators of a
+condition: evaluate_node over a Node tree (built by to_node), the former
+recursive evaluation of the compiled expression (evaluate_expression, kept
+below) and Bytecode.run over its postfix code. For each, the
+Python bytecode instructions executed per condition (counted with an opcode
+trace) and the time per condition.
+
+Usage: python benchmarks/bench_bytecode.py [shape] [size]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from KnowledgeBase import KnowledgeBase  # noqa: E402
+from Node import Child, Node, NodeTypes  # noqa: E402
+from backward import evaluate_node  # noqa: E402
+from bytecode import Bytecode  # noqa: E402
+from enums import OperatorsEnum  # noqa: E402
+from generate import generate  # noqa: E402
+
+
+def to_node(expression) -> Node:
+    """
+    Build a fresh Node tree with the shape of `expression`.
+    """
+    if expression.type == NodeTypes.FACT:
+        return Node(NodeTypes.FACT, expression.value)
+    node = Node(NodeTypes.OPERATOR, expression.value)
+    node.set_left(Child(to_node(expression.left)))
+    if expression.right is not None:
+        node.set_right(Child(to_node(expression.right)))
+    return node
+
+
+def evaluate_expression(expression, facts: dict, memo: dict):
+    """
+    Evaluate `expression` against `facts`, its subexpressions being
+    stored in `memo` by expression id.
+    """
+    if expression.id in memo:
+        return memo[expression.id]
+    if expression.type == NodeTypes.FACT:
+        value = facts[expression.value]
+    elif expression.value == OperatorsEnum.NOT.value:
+        value = evaluate_expression(expression.left, facts, memo)
+        if value is not None:
+            value = not value
+    else:
+        lvalue = evaluate_expression(expression.left, facts, memo)
+        rvalue = evaluate_expression(expression.right, facts, memo)
+        if lvalue is None or rvalue is None:
+            value = None
+        elif expression.value == OperatorsEnum.AND.value:
+            value = lvalue and rvalue
+        elif expression.value == OperatorsEnum.OR.value:
+            value = lvalue or rvalue
+        else:
+            value = lvalue ^ rvalue
+    memo[expression.id] = value
+    return value
+
+
+def count_instructions(evaluate, conditions):
+    count = [0]
+
+    def trace(frame, event, arg):
+        frame.f_trace_opcodes = True
+        if event == "opcode":
+            count[0] += 1
+        return trace
+
+    sys.settrace(trace)
+    try:
+        for condition in conditions:
+            evaluate(condition)
+    finally:
+        sys.settrace(None)
+    return count[0]
+
+
+def measure(label, evaluate, conditions, repeat=5):
+    instructions = count_instructions(evaluate, conditions)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for condition in conditions:
+            evaluate(condition)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<12} {instructions / len(conditions):10.1f} "
+          f"instructions/condition "
+          f"{best / len(conditions) * 1e6:8.2f} us/condition")
+
+
+if __name__ == "__main__":
+    shape = sys.argv[1] if len(sys.argv) > 1 else "nested"
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    kb = KnowledgeBase()
+    kb.load(generate(shape, size))
+    facts = kb.scenario_facts(None)
+    rules = kb.rules
+    trees = [to_node(rule.get_compiled_condition()) for rule in rules]
+    print(f"{shape}: {len(rules)} rules")
+    measure("tree", lambda tree: evaluate_node(tree, facts, {}), trees)
+    measure("expression",
+            lambda rule: evaluate_expression(
+                rule.get_compiled_condition(), facts, {}), rules)
+    measure("bytecode",
+            lambda rule: Bytecode.run(rule.get_bytecode(), facts), rules)
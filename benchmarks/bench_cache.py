@@ -0,0 +1,68 @@
+"""
+Startup time of a large input file: parsing and compiling it from source
+against restoring it from its compiled cache (CompiledCache).
+
+Usage: python benchmarks/bench_cache.py [rules]
+"""
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from KnowledgeBase import KnowledgeBase  # noqa: E402
+from cache import CompiledCache  # noqa: E402
+
+
+def generate_rules(rng, count):
+    lines = []
+    for index in range(count):
+        operands = [f"fact_{rng.randrange(index + 1)}"
+                    for _ in range(rng.randint(1, 4))]
+        condition = operands[0]
+        for operand in operands[1:]:
+            negated = "!" if rng.random() < 0.1 else ""
+            condition += f" {rng.choice('+|^')} {negated}{operand}"
+        if rng.random() < 0.3:
+            condition = f"fact_{rng.randrange(index + 1)} + ({condition})"
+        lines.append(f"{condition} => fact_{index + 1}")
+    lines.append("= fact_0")
+    lines.append(f"? fact_{count}")
+    return lines
+
+
+def timed_load(path, cache):
+    best = None
+    for _ in range(3):
+        kb = KnowledgeBase()
+        start = time.perf_counter()
+        kb.load_file(path, cache)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, kb
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rules.txt")
+        with open(path, "w") as output:
+            output.write("\n".join(generate_rules(rng, count)) + "\n")
+        uncached, expected = timed_load(path, False)
+        start = time.perf_counter()
+        KnowledgeBase().load_file(path, True)
+        first = time.perf_counter() - start
+        cached, kb = timed_load(path, True)
+        same = kb.query() == expected.query()
+        status = "same answers" if same else "DIFFERENT"
+        size = os.path.getsize(CompiledCache.path(path))
+        print(f"{len(kb.rules)} rules, {os.path.getsize(path) / 1024:.0f} "
+              f"KiB source, {size / 1024:.0f} KiB cache: "
+              f"uncached {uncached:.3f} s, first load (writes cache) "
+              f"{first:.3f} s, cached {cached:.3f} s "
+              f"(x{uncached / cached:.1f}, {status})")
@@ -0,0 +1,82 @@
+"""
+Backward chaining (solve_queries) against the saturating engines
+(ForwardEngine, BitsetEngine) when every fact is queried, on a wide and on a
+deep rule set.
+
+Usage: python benchmarks/bench_engines.py [rules] [repeat]
+"""
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from KnowledgeBase import KnowledgeBase  # noqa: E402
+from enums import EngineEnum  # noqa: E402
+
+LETTERS = [chr(ord("A") + i) for i in range(26)]
+
+
+def wide_rules(rng, count):
+    """
+    Many rules with a wide AND/OR fan-in over the first half, one in ten
+    negating its conclusion.
+    """
+    lines = []
+    for _ in range(count):
+        operands = rng.sample(LETTERS[:13], rng.randint(2, 6))
+        operator = rng.choice("+|")
+        condition = f" {operator} ".join(operands)
+        negated = "!" if rng.random() < 0.1 else ""
+        lines.append(f"{condition} => {negated}{rng.choice(LETTERS[13:])}")
+    return lines, "=" + "".join(rng.sample(LETTERS[:13], 6))
+
+
+def deep_rules(rng, count):
+    """Implication chains over the whole alphabet, repeated with noise."""
+    lines = []
+    while len(lines) < count:
+        for index in range(25):
+            noise = rng.choice(LETTERS[:index + 1])
+            lines.append(f"{LETTERS[index]} + {noise} => {LETTERS[index + 1]}")
+    return lines[:count], "=A"
+
+
+def load(lines, facts):
+    kb = KnowledgeBase()
+    kb.load(lines + [facts, "?" + "".join(LETTERS)])
+    return kb
+
+
+def measure(lines, facts, repeat, engine=EngineEnum.BACKWARD):
+    best = None
+    for _ in range(repeat):
+        kb = load(lines, facts)
+        if engine != EngineEnum.BACKWARD:
+            # Compiling an engine is a load-time cost, like parsing.
+            kb.engine(engine)
+        start = time.perf_counter()
+        answers = kb.query(engine=engine)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, answers
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    rng = random.Random(42)
+    for name, shape in (("wide", wide_rules), ("deep", deep_rules)):
+        lines, facts = shape(rng, count)
+        backward, expected = measure(lines, facts, repeat)
+        prefix = f"{name:<5} {count} rules: "
+        print(f"{prefix}{'backward':<8} {backward * 1e3:8.2f} ms")
+        for engine in (EngineEnum.FORWARD, EngineEnum.BITSET):
+            elapsed, answers = measure(lines, facts, repeat, engine)
+            status = "same answers" if answers == expected else "DIFFERENT"
+            print(f"{'':<{len(prefix)}}{engine.value:<8} "
+                  f"{elapsed * 1e3:8.2f} ms "
+                  f"(x{backward / elapsed:.1f}, {status})")
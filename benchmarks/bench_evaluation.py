@@ -0,0 +1,149 @@
+"""
+Allocations per query: destructive solving (make_tree and solve_fact_node on
+a fresh tree every time, as the solver did before the non-destructive
+evaluator), the backward solver running the Bytecode of the rules
+(KnowledgeBase.query, which builds no tree) and the non-destructive evaluator
+re-using the cached tree of each query (KnowledgeBase.evaluate). The trees
+and the plans of their facts are built once, before the non-destructive
+run, and their cost is printed on its own line.
+
+Usage: python benchmarks/bench_evaluation.py [scenarios] [seed]
+"""
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from KnowledgeBase import KnowledgeBase  # noqa: E402
+from Node import Node, NodeTypes, ChildLinkTypes  # noqa: E402
+from backward import BackwardEngine  # noqa: E402
+from enums import OperatorsEnum  # noqa: E402
+
+LETTERS = [chr(ord("A") + i) for i in range(26)]
+
+
+def generate_rules(rng, count=40):
+    lines = []
+    for _ in range(count):
+        conclusion = rng.randrange(6, 26)
+        operands = rng.sample(LETTERS[:conclusion], rng.randint(2, 4))
+        condition = operands[0]
+        for operand in operands[1:]:
+            condition += f" {rng.choice('+|^')} {operand}"
+        lines.append(f"{condition} => {LETTERS[conclusion]}")
+    return lines
+
+
+def count_nodes():
+    counter = [0]
+    original = Node.__init__
+
+    def counting_init(self, *args, **kwargs):
+        counter[0] += 1
+        original(self, *args, **kwargs)
+    Node.__init__ = counting_init
+    return counter, original
+
+
+def run(label, kb, scenarios, queries, solve):
+    counter, original = count_nodes()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for initial in scenarios:
+        solve(kb, initial, queries)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    Node.__init__ = original
+    total = len(scenarios) * len(queries)
+    print(f"{label:<16} {counter[0] / total:10.1f} nodes/query "
+          f"{peak / 1024:10.1f} KiB peak "
+          f"{elapsed / total * 1e6:10.1f} us/query")
+
+
+def solve_fact_node(node, facts):
+    """
+    Former destructive solver: the FACT node `node` takes the value of the
+    first of its conditions that holds, and is rewritten into a BOOLEAN
+    node, so the tree can only be solved once. The generated rules are
+    acyclic.
+    """
+    fact = node.get_value()
+    if facts.get(fact) is False:
+        for condition in node.get_children():
+            if solve_condition(condition.get_node(), facts) is True:
+                facts[fact] = (condition.get_link_type() ==
+                               ChildLinkTypes.DEFAULT)
+                break
+    node.remove_children()
+    node.set_type(NodeTypes.BOOLEAN)
+    node.set_value(facts.get(fact))
+    return node
+
+
+def solve_condition(node, facts):
+    """
+    Value of the condition tree `node`, each OPERATOR node being rewritten
+    into a BOOLEAN node once its operands are.
+    """
+    match node.get_type():
+        case NodeTypes.BOOLEAN:
+            return node.get_value()
+        case NodeTypes.FACT:
+            return solve_fact_node(node, facts).get_value()
+    lvalue = solve_condition(node.get_left().get_node(), facts)
+    if node.get_value() == OperatorsEnum.NOT.value:
+        value = None if lvalue is None else not lvalue
+    else:
+        rvalue = solve_condition(node.get_right().get_node(), facts)
+        if lvalue is None or rvalue is None:
+            value = None
+        elif node.get_value() == OperatorsEnum.AND.value:
+            value = lvalue and rvalue
+        elif node.get_value() == OperatorsEnum.OR.value:
+            value = lvalue or rvalue
+        else:
+            value = lvalue ^ rvalue
+    node.remove_children()
+    node.set_type(NodeTypes.BOOLEAN)
+    node.set_value(value)
+    return value
+
+
+def destructive(kb, initial, queries):
+    facts = kb.scenario_facts(initial)
+    engine = BackwardEngine(kb, facts)
+    for query in queries:
+        tree = engine.make_tree(Node(NodeTypes.FACT, kb.symbols.get(query)))
+        solve_fact_node(tree, facts)
+
+
+def bytecode(kb, initial, queries):
+    kb.query(queries, initial)
+
+
+def non_destructive(kb, initial, queries):
+    for query in queries:
+        kb.evaluate(query, initial)
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rng = random.Random(int(sys.argv[2]) if len(sys.argv) > 2 else 42)
+    kb = KnowledgeBase()
+    kb.load(generate_rules(rng))
+    queries = LETTERS[20:]
+    scenarios = [rng.sample(LETTERS[:6], rng.randint(1, 6))
+                 for _ in range(count)]
+    print(f"{len(kb.rules)} rules, {count} scenarios, "
+          f"{len(queries)} queries per scenario")
+    run("destructive", kb, scenarios, queries, destructive)
+    run("bytecode", kb, scenarios, queries, bytecode)
+    # with no fact given, every fact of the trees gets its plan
+    run("cache (once)", kb, [[]], queries, non_destructive)
+    run("non-destructive", kb, scenarios, queries, non_destructive)
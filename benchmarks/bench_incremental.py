@@ -0,0 +1,72 @@
+"""
+Facts changing one at a time: the backward engine answering the queries
+from scratch after every change, against TruthMaintenance updating the
+answers from the change alone. The knowledge base is made of independent
+rule chains, so every change only affects the chain it happens in.
+
+Usage: python benchmarks/bench_incremental.py [chains] [length] [updates]
+"""
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from KnowledgeBase import KnowledgeBase  # noqa: E402
+
+
+def chain_rules(chains, length):
+    lines = []
+    for chain in range(chains):
+        for index in range(length):
+            lines.append(f"c{chain}_{index} + !blocked_{chain} "
+                         f"=> c{chain}_{index + 1}")
+        # a cycle at the end of each chain
+        lines.append(f"c{chain}_{length} => loop_{chain}")
+        lines.append(f"loop_{chain} => c{chain}_{length}")
+    queries = [f"loop_{chain}" for chain in range(chains)]
+    return lines + ["? " + " ".join(queries)]
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    chains = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    length = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    updates = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    rng = random.Random(42)
+    kb = KnowledgeBase()
+    kb.load(chain_rules(chains, length))
+    changes = []
+    for _ in range(updates):
+        chain = rng.randrange(chains)
+        changes.append(rng.choice([f"c{chain}_0", f"blocked_{chain}"]))
+
+    asserted = set()
+    start = time.perf_counter()
+    expected = []
+    for name in changes:
+        asserted ^= {name}
+        expected.append(kb.query(facts=sorted(asserted)))
+    full = time.perf_counter() - start
+
+    truth = kb.truth_maintenance()
+    evaluations = 0
+    start = time.perf_counter()
+    answers = []
+    for name in changes:
+        if name in truth.asserted_names():
+            truth.retract_facts([name])
+        else:
+            truth.assert_facts([name])
+        evaluations += truth.evaluations
+        answers.append(truth.answers())
+    incremental = time.perf_counter() - start
+
+    status = "same answers" if answers == expected else "DIFFERENT"
+    print(f"{len(kb.rules)} rules, {updates} updates: from scratch "
+          f"{full / updates * 1e3:.3f} ms/update, incremental "
+          f"{incremental / updates * 1e3:.3f} ms/update "
+          f"({evaluations / updates:.1f} conditions evaluated per update, "
+          f"x{full / incremental:.1f}, {status})")
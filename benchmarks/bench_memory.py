@@ -0,0 +1,107 @@
+"""
+Memory of large knowledge bases, measured with tracemalloc on the synthetic
+knowledge bases of generate.py:
+- rules: the bytes each Rule keeps (its slots, packed token codes,
+  Bytecode, facts and texts), parsing the rules again once their
+  expressions and fact names exist, against the former layout, where a
+  Rule had an instance dict, a list of (TokensEnum, name) tuples per side
+  with a string per fact name, and lists of facts and literals, rebuilt
+  here from the same rules;
+- nodes: the bytes per Node of the trees of the conditions, built with
+  to_node of bench_bytecode.py (one Child per edge);
+- knowledge base: everything KnowledgeBase.load keeps, per rule, the
+  shared expressions, symbols, indexes and Schedule included.
+
+Usage: python benchmarks/bench_memory.py [sizes] [shapes]
+"""
+import gc
+import logging
+import os
+import sys
+import tracemalloc
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from KnowledgeBase import KnowledgeBase  # noqa: E402
+from bench_bytecode import to_node  # noqa: E402
+from generate import SHAPES, generate  # noqa: E402
+
+
+class FormerRule:
+    """
+    The attributes a Rule kept in its instance dict before it had slots.
+    """
+
+    def __init__(self, rule, symbols):
+        condition_tokens, conclusion_tokens = rule.get_tokens(symbols)
+        # the former parser sliced new strings for the texts of the rule
+        # and for every fact name it read
+        self.conditions = copy(rule.conditions)
+        self.conclusions = copy(rule.conclusions)
+        self.relation = copy(rule.relation)
+        self.condition_tokens = [(token, copy(text))
+                                 for token, text in condition_tokens]
+        self.conclusion_tokens = [(token, copy(text))
+                                  for token, text in conclusion_tokens]
+        self.compiled_condition = rule.compiled_condition
+        self.compiled_conclusion = rule.compiled_conclusion
+        self.bytecode = array("i", rule.bytecode)
+        self.condition_facts = rule.get_condition_facts()
+        self.definite = rule.definite
+        self.conclusion_literals = [(fact, positive) for fact, positive
+                                    in rule.conclusion_literals]
+        self.concluded_facts = list(rule.concluded_facts)
+
+
+def copy(text):
+    return ("_" + text)[1:] if text is not None else None
+
+
+def load(lines):
+    kb = KnowledgeBase()
+    kb.load(lines)
+    return kb
+
+
+def allocated(build):
+    """
+    Bytes still allocated by `build()` once it returns, and its result.
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+
+def rule_lines(lines):
+    return [line for line in lines if line[:1] not in ("=", "?")]
+
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in
+             (sys.argv[1] if len(sys.argv) > 1 else "10000,50000").split(",")]
+    shapes = sys.argv[2].split(",") if len(sys.argv) > 2 else list(SHAPES)
+    logging.disable(logging.WARNING)
+    for shape in shapes:
+        for size in sizes:
+            lines = generate(shape, size)
+            loaded, kb = allocated(lambda: load(lines))
+            count = len(kb.rules) + len(kb.ambiguous_rules)
+            compact, rules = allocated(lambda: [
+                rule for line in rule_lines(lines)
+                for rule in kb.parser.parse(line)])
+            former, _ = allocated(lambda: [FormerRule(rule, kb.symbols)
+                                           for rule in rules])
+            trees, _ = allocated(lambda: [
+                to_node(rule.get_compiled_condition()) for rule in rules])
+            # a Node per operand and operator, and a Child per edge
+            nodes = sum(len(rule.get_bytecode()) for rule in rules)
+            print(f"{shape:<14} {size:>7}: rules {compact / count:6.0f} "
+                  f"B/rule (former {former / count:6.0f}, "
+                  f"{former / compact:4.1f}x), nodes "
+                  f"{trees / nodes:6.0f} B/node, knowledge base "
+                  f"{loaded / count:6.0f} B/rule")
@@ -0,0 +1,71 @@
+"""
+Partial evaluation of the rules for the facts of the input, on the
+synthetic knowledge bases of generate.py and on a "redundant" shape whose
+rules read given facts, repeat each other and are subsumed by earlier
+rules: rules before and after the Optimizer, the time it takes, and the
+time of the backward engine on the rules as they are and as optimized.
+The answers are checked to agree.
+
+Usage: python benchmarks/bench_optimizer.py [sizes] [shapes] [repeat]
+"""
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from KnowledgeBase import KnowledgeBase  # noqa: E402
+from generate import SHAPES, generate  # noqa: E402
+
+
+def redundant(size, seed=42):
+    """
+    A chain of `size` rules where each step has a rule reading a given
+    fact, the same rule twice, and a rule with a stronger condition.
+    """
+    rng = random.Random(seed)
+    lines = []
+    for index in range(size):
+        given = f"G{rng.randrange(size)}"
+        step = f"F{index} + {given}"
+        lines.append(f"{step} => F{index + 1}")
+        lines.append(f"{step} => F{index + 1}")
+        lines.append(f"{step} + F{rng.randrange(index + 1)} => F{index + 1}")
+        lines.append(f"(F{index} | !{given}) + {given} => F{index + 1}")
+    lines.append("=F0 " + " ".join(f"G{index}" for index in range(size)))
+    lines.append(f"?F{size}")
+    return lines
+
+
+def best_of(repeat, run):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in
+             (sys.argv[1] if len(sys.argv) > 1 else "1000,10000").split(",")]
+    shapes = (sys.argv[2].split(",") if len(sys.argv) > 2
+              else list(SHAPES) + ["redundant"])
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    logging.disable(logging.WARNING)
+    for shape in shapes:
+        for size in sizes:
+            kb = KnowledgeBase()
+            kb.load(redundant(size) if shape == "redundant"
+                    else generate(shape, size))
+            optimizing, optimized = best_of(repeat, kb.optimized)
+            before, expected = best_of(repeat, kb.query)
+            after, answers = best_of(repeat, optimized.query)
+            print(f"{shape:<14} {size:>6}: rules {len(kb.rules):>6} -> "
+                  f"{len(optimized.rules):>6} in {optimizing * 1e3:8.2f} ms, "
+                  f"solve {before * 1e3:8.2f} ms -> {after * 1e3:8.2f} ms "
+                  f"({(before - after) * 1e3:8.2f} ms saved)"
+                  f"{'' if answers == expected else ', DIFFERENT'}")
@@ -0,0 +1,323 @@
+"""
+Time to read one rule line whose condition is nested `depth` parentheses
+deep, for:
+- the former pipeline (kept below): Utils.is_string_valid, is_rule_valid,
+  the split on the relation, tokenize and validate_rule on both sides, and
+  compile_tokens into the ExpressionTable;
+- parse_condition_into_tree, the former tree parser of the backward
+  engine (kept below), on the condition alone;
+- RuleParser.parse, which does the work of the pipeline in one pass.
+
+Usage: python benchmarks/bench_parser.py [depths] [repeat]
+"""
+import os
+import random
+import re
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from Expression import ExpressionTable  # noqa: E402
+from Node import Child, Node, NodeTypes  # noqa: E402
+from Rule import Rule  # noqa: E402
+from SymbolTable import SymbolTable  # noqa: E402
+from bytecode import Bytecode  # noqa: E402
+from enums import OperatorsEnum, TokensEnum  # noqa: E402
+from rule_parser import RuleParser  # noqa: E402
+from utils import Utils  # noqa: E402
+
+# a fact name is a letter followed by letters, digits or underscores
+TOKEN_PATTERN = re.compile(r"\s*(?:([A-Za-z][A-Za-z0-9_]*)|(.))")
+BINARY_OPERATORS = {
+    TokensEnum.OPERATOR_AND: OperatorsEnum.AND.value,
+    TokensEnum.OPERATOR_OR: OperatorsEnum.OR.value,
+    TokensEnum.OPERATOR_XOR: OperatorsEnum.XOR.value,
+}
+
+
+def is_rule_valid(rule):
+    if (("<=>" not in rule) and ("=>" not in rule)):
+        return False
+    if (not rule[0].isalpha()):
+        return False
+    if (rule.isalpha()):
+        return False
+    return True
+
+
+def tokenize(str):
+    tokens = []
+    str = str.strip()
+    for match in TOKEN_PATTERN.finditer(str):
+        name, char = match.groups()
+        if name is not None:
+            tokens.append((TokensEnum.LETTER, name))
+        elif char in Rule.symbol_tokens:
+            tokens.append((Rule.symbol_tokens[char], char))
+        else:
+            raise ValueError(f"Unexpected character found in rule: {char}")
+    return tokens
+
+
+def validate_rule(tokens):
+    open_parenthesis_counter = 0
+    closed_parenthesis_counter = 0
+    previous_token = None
+
+    for i in range(len(tokens)):
+        token = tokens[i]
+        if (not isinstance(token, tuple)):
+            raise TypeError("Token should be a tuple.")
+        if (i == len(tokens) - 1):
+            if (token[0] is not TokensEnum.LETTER
+                    and token[0] is not TokensEnum.PARENTHESIS_CLOSED):
+                return False
+        elif token[0] == TokensEnum.LETTER:
+            if (previous_token is not None and
+                (previous_token[0] == TokensEnum.LETTER or
+                 previous_token[0] == TokensEnum.PARENTHESIS_CLOSED)):
+                return False
+        elif token[0] == TokensEnum.PARENTHESIS_OPEN:
+            open_parenthesis_counter += 1
+            if (previous_token is not None and
+                (previous_token[0] == TokensEnum.LETTER or
+                 previous_token[0] == TokensEnum.PARENTHESIS_CLOSED)):
+                return False
+        if token[0] == TokensEnum.PARENTHESIS_CLOSED:
+            closed_parenthesis_counter += 1
+            if (previous_token is None or
+                    previous_token[0] is not TokensEnum.LETTER):
+                return False
+        elif token[0] == TokensEnum.OPERATOR_NOT:
+            if (previous_token is not None and
+                (previous_token[0] == TokensEnum.LETTER or
+                 previous_token[0] == TokensEnum.PARENTHESIS_CLOSED)):
+                return False
+        elif (token[0] == TokensEnum.OPERATOR_AND or
+              token[0] == TokensEnum.OPERATOR_OR or
+              token[0] == TokensEnum.OPERATOR_XOR):
+            if (previous_token is None or
+                (previous_token[0] is not TokensEnum.LETTER and
+                 previous_token[0] is not TokensEnum.PARENTHESIS_CLOSED)):
+                return False
+        previous_token = token
+    return open_parenthesis_counter == closed_parenthesis_counter
+
+
+def compile_tokens(table, tokens):
+    """
+    Compile a validated token list into a shared Expression of `table`.
+    Binary operators all have the same precedence and associate to the
+    left.
+    """
+    expression, index = compile_sequence(table, tokens, 0)
+    if index != len(tokens):
+        raise ValueError("Unexpected token in condition: "
+                         f"{tokens[index][1]}")
+    return expression
+
+
+def compile_sequence(table, tokens, index):
+    left, index = compile_operand(table, tokens, index)
+    while index < len(tokens):
+        token_type = tokens[index][0]
+        if token_type not in BINARY_OPERATORS:
+            break
+        right, index = compile_operand(table, tokens, index + 1)
+        left = table.make(NodeTypes.OPERATOR, BINARY_OPERATORS[token_type],
+                          left, right)
+    return left, index
+
+
+def compile_operand(table, tokens, index):
+    if index >= len(tokens):
+        raise ValueError("Condition ends with an operator.")
+    token_type, value = tokens[index]
+    if token_type == TokensEnum.LETTER:
+        return (table.make(NodeTypes.FACT, table.symbols.intern(value)),
+                index + 1)
+    if token_type == TokensEnum.OPERATOR_NOT:
+        operand, index = compile_operand(table, tokens, index + 1)
+        return table.make(NodeTypes.OPERATOR, OperatorsEnum.NOT.value,
+                          operand), index
+    if token_type == TokensEnum.PARENTHESIS_OPEN:
+        expression, index = compile_sequence(table, tokens, index + 1)
+        if (index >= len(tokens) or
+                tokens[index][0] != TokensEnum.PARENTHESIS_CLOSED):
+            raise ValueError("Mismatched parentheses in condition.")
+        return expression, index + 1
+    raise ValueError(f"Unexpected token in condition: {value}")
+
+
+def pack_tokens(tokens, symbols) -> array:
+    letter = TokensEnum.LETTER
+    return array("i", [symbols.intern(text) * 8 + Rule.LETTER
+                       if token is letter else token.value
+                       for token, text in tokens])
+
+
+def handle_not_operator(condition, index):
+    if index == -1 or index == len(condition) - 1:
+        raise ValueError("Invalid NOT operator usage.")
+    if condition[index + 1] == '(':
+        # Find the matching closing parenthesis
+        open_parens = 1
+        for j in range(index + 2, len(condition)):
+            if condition[j] == '(':
+                open_parens += 1
+            elif condition[j] == ')':
+                open_parens -= 1
+            if open_parens == 0:
+                # Replace !(...) with ( ... ) and add NOT operator
+                inner = condition[index + 2:j]
+                parent_node = Node(NodeTypes.OPERATOR, '!')
+                parent_node.set_left(
+                    Child(parse_condition_into_tree(inner)))
+                return parent_node
+        raise ValueError(
+            "Mismatched parentheses in NOT operator usage.")
+    else:
+        # Handle single character NOT
+        if not condition[index + 1].isalpha():
+            raise ValueError("Invalid character after NOT operator.")
+        parent_node = Node(NodeTypes.OPERATOR, '!')
+        parent_node.set_left(
+            Child(Node(NodeTypes.FACT, condition[index + 1])))
+        return parent_node
+
+
+def parse_condition_into_tree(condition):
+    """
+    Parse a condition string (like "A+B|C") into a Node tree.
+    Uses right-to-left scan to respect precedence encoded by parentheses.
+    """
+    if condition is None:
+        raise ValueError("Empty condition")
+    condition = condition.strip()
+    if len(condition) == 0:
+        raise ValueError("Empty condition")
+
+    length = len(condition)
+    if condition[0] == '(' and condition[-1] == ')':
+        open_parens = 0
+        encloses = True
+        for i, ch in enumerate(condition):
+            if ch == '(':
+                open_parens += 1
+            elif ch == ')':
+                open_parens -= 1
+                if open_parens == 0 and i < length - 1:
+                    encloses = False
+                    break
+        if encloses:
+            condition = condition[1:-1].strip()
+            length = len(condition)
+
+    operators = "+|^"
+    open_parenthesis_counter = 0
+
+    for i in range(length):
+        index = (length - 1 - i)
+        char = condition[index]
+        if char.isspace():
+            continue
+        if char == ')':
+            open_parenthesis_counter += 1
+            continue
+        elif char == '(':
+            open_parenthesis_counter -= 1
+        if open_parenthesis_counter > 0:
+            continue
+        if char in operators:
+            parent_node = Node(NodeTypes.OPERATOR, char)
+            left_node_content = (condition[:index]).strip()
+            right_node_content = (condition[(index + 1):]).strip()
+            right_node_type = (NodeTypes.FACT if len(right_node_content) == 1
+                               else NodeTypes.PHRASE)
+            left_node_type = (NodeTypes.FACT if len(left_node_content) == 1
+                              else NodeTypes.PHRASE)
+            parent_node.set_left(
+                Child(Node(left_node_type, left_node_content)))
+            parent_node.set_right(
+                Child(Node(right_node_type, right_node_content)))
+            if (parent_node.get_left().get_node().get_type() ==
+                    NodeTypes.PHRASE):
+                parent_node.set_left(Child(parse_condition_into_tree(
+                    parent_node.get_left().get_node().get_value())))
+            if (parent_node.get_right().get_node().get_type() ==
+                    NodeTypes.PHRASE):
+                parent_node.set_right(Child(parse_condition_into_tree(
+                    parent_node.get_right().get_node().get_value())))
+            return parent_node
+        elif (char == '!'):
+            return handle_not_operator(condition, index)
+        elif (char.isalpha()) and (length == 1):
+            return Node(NodeTypes.FACT, char)
+
+    return Node(NodeTypes.PHRASE, condition)
+
+
+def nested_rule(depth, seed=42):
+    # nested to the left: the former validator rejects `))`
+    rng = random.Random(seed)
+    condition = "f0"
+    for index in range(1, depth + 1):
+        condition = f"({condition} {rng.choice('+|^')} f{index})"
+    return f"g + {condition} => h"
+
+
+def pipeline(line):
+    if not Utils.is_string_valid(line) or not is_rule_valid(line):
+        raise ValueError("Invalid rule.")
+    conditions, conclusions = line.split("=>")
+    condition_tokens = tokenize(conditions)
+    conclusion_tokens = tokenize(conclusions)
+    if (not validate_rule(condition_tokens) or
+            not validate_rule(conclusion_tokens)):
+        raise ValueError("Invalid rule.")
+    table = ExpressionTable(SymbolTable())
+    condition = compile_tokens(table, condition_tokens)
+    Rule.restore(conditions.strip(), conclusions.strip(), "=>",
+                 pack_tokens(condition_tokens + conclusion_tokens,
+                             table.symbols),
+                 len(condition_tokens), condition,
+                 compile_tokens(table, conclusion_tokens),
+                 Bytecode.compile(condition))
+
+
+def tree(line):
+    parse_condition_into_tree(line.split("=>")[0])
+
+
+def fused(line):
+    RuleParser(ExpressionTable(SymbolTable())).parse(line)
+
+
+def measure(parse, line, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(line)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    depths = [int(depth) for depth in
+              (sys.argv[1] if len(sys.argv) > 1 else "10,100,1000")
+              .split(",")]
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    sys.setrecursionlimit(100000)
+    for depth in depths:
+        line = nested_rule(depth)
+        times = {label: measure(parse, line, repeat) for label, parse in
+                 (("pipeline", pipeline), ("tree", tree),
+                  ("parser", fused))}
+        print(f"depth {depth:>6} ({len(line):>7} chars): " +
+              ", ".join(f"{label} {seconds * 1e3:9.3f} ms"
+                        for label, seconds in times.items()) +
+              f" (x{times['pipeline'] / times['parser']:.1f} and "
+              f"x{times['tree'] / times['parser']:.1f})")
@@ -0,0 +1,66 @@
+"""
+Cost of explanations on the synthetic knowledge bases of generate.py: a
+plain solve (which records its backpointers), the same solve with the
+debug trace of the solver logged to a null stream (the former way to see
+why a fact holds), and the reconstruction of the JSON and DOT proofs of
+the queries from the backpointers of a solve.
+
+Usage: python benchmarks/bench_proof.py [sizes] [shapes] [repeat]
+"""
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from KnowledgeBase import KnowledgeBase  # noqa: E402
+from backward import BackwardEngine  # noqa: E402
+from generate import SHAPES, generate  # noqa: E402
+from proof import Proof  # noqa: E402
+
+
+def best_of(repeat, run):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def solve(kb):
+    engine = BackwardEngine(kb, kb.scenario_facts())
+    engine.solve(kb.queries)
+    return engine
+
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in
+             (sys.argv[1] if len(sys.argv) > 1 else "1000,10000").split(",")]
+    shapes = sys.argv[2].split(",") if len(sys.argv) > 2 else list(SHAPES)
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    logging.getLogger("expert_system.parser").setLevel(logging.ERROR)
+    solver = logging.getLogger("expert_system.solver")
+    solver.propagate = False
+    for shape in shapes:
+        for size in sizes:
+            kb = KnowledgeBase()
+            kb.load(generate(shape, size))
+            plain = best_of(repeat, lambda: solve(kb))
+            trace = logging.StreamHandler(open(os.devnull, "w"))
+            solver.addHandler(trace)
+            solver.setLevel(logging.DEBUG)
+            traced = best_of(repeat, lambda: solve(kb))
+            solver.removeHandler(trace)
+            solver.setLevel(logging.NOTSET)
+            engine = solve(kb)
+            given = {fact for fact, value in kb.facts.items() if value}
+            proof = Proof(kb, engine.facts, engine.derivations, given)
+            as_json = best_of(repeat, lambda: proof.to_json(kb.queries))
+            as_dot = best_of(repeat, lambda: proof.to_dot(kb.queries))
+            print(f"{shape:<14} {size:>6}: solve {plain * 1e3:8.2f} ms, "
+                  f"traced {traced * 1e3:8.2f} ms, "
+                  f"{len(engine.derivations):>6} backpointers, "
+                  f"json {as_json * 1e3:8.2f} ms, dot {as_dot * 1e3:8.2f} ms")
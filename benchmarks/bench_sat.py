@@ -0,0 +1,69 @@
+"""
+Time of the sat engine on the synthetic knowledge bases of generate.py and on
+a "disjunctive" shape whose rules conclude `|` of two facts (which only the
+sat engine can use): the encoding of the rules into clauses, then the answer
+of the queries. For the shapes of generate.py, the backward engine is timed
+too and the two are checked to agree.
+
+Usage: python benchmarks/bench_sat.py [sizes] [shapes]
+"""
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from KnowledgeBase import KnowledgeBase  # noqa: E402
+from enums import EngineEnum  # noqa: E402
+from generate import SHAPES, generate  # noqa: E402
+
+
+def disjunctive(size, seed=42):
+    """
+    Facts d0..d{size} in layers: each concludes one of two facts of the
+    next layer, and one rule in three rules one of them out, deciding it.
+    """
+    rng = random.Random(seed)
+    lines = []
+    for index in range(size):
+        left, right = rng.sample(range(index + 1, size + 2), 2)
+        lines.append(f"d{index} => d{left} | d{right}")
+        if rng.random() < 1 / 3:
+            lines.append(f"d{index} => !d{rng.choice((left, right))}")
+    queries = [f"d{rng.randrange(size)}" for _ in range(min(size, 100))]
+    return lines + ["= d0", "? " + " ".join(queries)]
+
+
+def run(lines, engine):
+    kb = KnowledgeBase()
+    kb.load(lines)
+    start = time.perf_counter()
+    compiled = kb.engine(engine) if engine == EngineEnum.SAT else None
+    built = time.perf_counter()
+    answers = kb.query(engine=engine)
+    return answers, built - start, time.perf_counter() - built, compiled
+
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in
+             (sys.argv[1] if len(sys.argv) > 1 else "100,1000").split(",")]
+    shapes = (sys.argv[2].split(",") if len(sys.argv) > 2 else
+              list(SHAPES) + ["disjunctive"])
+    logging.disable(logging.WARNING)
+    for shape in shapes:
+        for size in sizes:
+            lines = (disjunctive(size) if shape == "disjunctive" else
+                     generate(shape, size))
+            answers, encode, solve, sat = run(lines, EngineEnum.SAT)
+            solver = sat.solver
+            line = (f"{shape:<14} {size:>6}: {len(solver):>7} variables "
+                    f"{solver.clauses:>7} clauses, encode {encode:8.3f} s, "
+                    f"answer {solve:8.3f} s ({solver.conflicts} conflicts, "
+                    f"{sat.loops} loop formulas)")
+            if shape != "disjunctive":
+                expected, _, backward, _ = run(lines, EngineEnum.BACKWARD)
+                line += (f", backward {backward:8.3f} s"
+                         f"{'' if expected == answers else ', DIFFERENT'}")
+            print(line)
@@ -0,0 +1,59 @@
+"""
+Scaling with the number of distinct facts, using multi-character fact names:
+parsing, forward chaining to saturation and backward chaining on a sample
+of queries, for layered rule sets of growing size.
+
+Usage: python benchmarks/bench_scaling.py [max_facts]
+"""
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from KnowledgeBase import KnowledgeBase  # noqa: E402
+from enums import EngineEnum  # noqa: E402
+
+DEPTH = 10
+
+
+def layered_rules(rng, facts):
+    """`facts` facts in DEPTH layers, each derived from the previous one."""
+    width = facts // DEPTH
+    lines = []
+    for layer in range(1, DEPTH):
+        for index in range(width):
+            operands = [f"fact_{layer - 1}_{rng.randrange(width)}"
+                        for _ in range(rng.randint(1, 3))]
+            condition = f" {rng.choice('+|')} ".join(operands)
+            lines.append(f"{condition} => fact_{layer}_{index}")
+    initial = [f"fact_0_{index}" for index in range(0, width, 2)]
+    queries = [f"fact_{DEPTH - 1}_{rng.randrange(width)}" for _ in range(100)]
+    return lines + ["= " + " ".join(initial), "? " + " ".join(queries)]
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rng = random.Random(42)
+    size = 1000
+    while size <= limit:
+        lines = layered_rules(rng, size)
+        kb = KnowledgeBase()
+        parse, _ = timed(lambda: kb.load(lines))
+        backward, expected = timed(kb.query)
+        forward, answers = timed(
+            lambda: kb.query(engine=EngineEnum.FORWARD))
+        status = "same answers" if answers == expected else "DIFFERENT"
+        print(f"{len(kb.symbols):>7} facts {len(kb.rules):>7} rules: "
+              f"parse {parse:7.3f} s, backward (100 queries) "
+              f"{backward:7.3f} s, forward {forward:7.3f} s ({status})")
+        size *= 10
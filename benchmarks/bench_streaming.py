@@ -0,0 +1,57 @@
+"""
+Memory of the input pipeline as the input file grows: peak traced memory
+while streaming every line of the file through InputReader, against
+reading the whole file into a list of lines first.
+
+Usage: python benchmarks/bench_streaming.py [max_rules]
+"""
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from reader import InputReader  # noqa: E402
+
+
+def write_rules(path, count):
+    with open(path, "w") as output:
+        for index in range(count):
+            output.write(f"fact_{index} + (fact_{index // 2} | "
+                         f"!fact_{index // 3}) => fact_{index + 1}\n")
+
+
+def peak(function):
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def stream(path):
+    for _ in InputReader().read_file(path):
+        pass
+
+
+def read_all(path):
+    with open(path, "r") as input:
+        lines = input.readlines()
+    for _ in lines:
+        pass
+
+
+if __name__ == "__main__":
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rules.txt")
+        count = 10000
+        while count <= limit:
+            write_rules(path, count)
+            size = os.path.getsize(path)
+            print(f"{count:>8} rules {size / 2 ** 20:7.1f} MiB: "
+                  f"streamed {peak(lambda: stream(path)) / 1024:8.1f} KiB "
+                  f"peak, read whole "
+                  f"{peak(lambda: read_all(path)) / 1024:8.1f} KiB peak")
+            count *= 10
@@ -0,0 +1,96 @@
+"""
+Timing harness over the synthetic knowledge bases of generate.py: for every
+shape and size, the time spent parsing the input (parse_inputfile), expanding
+the goals of the queries (expand_goal) and solving them (solve_goal),
+measured separately. The results are printed and saved as JSON, so two runs
+of the engine can be compared.
+
+Usage: python benchmarks/bench_suite.py [--sizes 100,1000] [--shapes chain,..]
+                                        [--repeat 3] [--output results.json]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from KnowledgeBase import KnowledgeBase  # noqa: E402
+from backward import BackwardEngine  # noqa: E402
+from generate import SHAPES, generate  # noqa: E402
+
+
+def measure(lines):
+    """
+    Time the three phases of one backward run of `lines`.
+    """
+    kb = KnowledgeBase()
+    start = time.perf_counter()
+    kb.load(lines)
+    parsed = time.perf_counter()
+    engine = BackwardEngine(kb, dict(kb.facts))
+    for query in kb.queries:
+        if query not in engine.goals and engine.facts[query] is False:
+            engine.expand_goal(query)
+    built = time.perf_counter()
+    engine.solve(kb.queries)
+    solved = time.perf_counter()
+    return {
+        "rules": len(kb.rules),
+        "facts": len(kb.symbols),
+        "parse": parsed - start,
+        "expand": built - parsed,
+        "solve": solved - built,
+    }
+
+
+def run(shapes, sizes, repeat):
+    results = []
+    for shape in shapes:
+        for size in sizes:
+            lines = generate(shape, size)
+            best = None
+            for _ in range(repeat):
+                timing = measure(lines)
+                if best is None:
+                    best = timing
+                for phase in ("parse", "expand", "solve"):
+                    best[phase] = min(best[phase], timing[phase])
+            best.update(shape=shape, size=size)
+            results.append(best)
+            print(f"{shape:<14} {size:>7}: {best['rules']:>7} rules, "
+                  f"parse {best['parse'] * 1e3:9.2f} ms, expand "
+                  f"{best['expand'] * 1e3:9.2f} ms, solve "
+                  f"{best['solve'] * 1e3:9.2f} ms")
+    return results
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    parser = argparse.ArgumentParser(
+        description="Time parsing, tree building and solving on synthetic "
+        "knowledge bases.")
+    parser.add_argument("--sizes", default="100,1000",
+                        help="comma-separated rule counts")
+    parser.add_argument("--shapes", default=",".join(SHAPES),
+                        help="comma-separated shapes of generate.py")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per case, the best time is kept")
+    parser.add_argument("--output", default="bench_results.json",
+                        help="JSON file the results are written to")
+    args = parser.parse_args()
+
+    results = run(args.shapes.split(","),
+                  [int(size) for size in args.sizes.split(",")],
+                  args.repeat)
+    with open(args.output, "w") as output:
+        json.dump({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }, output, indent=2)
+    print(f"Results written to {args.output}")
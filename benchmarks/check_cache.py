@@ -0,0 +1,91 @@
+"""
+Check of the knowledge bases restored from their CompiledCache: every
+shape of generate.py is loaded from source, then twice with the cache
+(the first load writes it, the second restores it), and the restored
+knowledge base must give the answers of the one loaded from source with
+evaluate and with every engine but sat. A restored knowledge base has no
+Schedule until its first use, so a call that builds it while holding the
+lock of the knowledge base hangs: each check runs with a timeout.
+
+Usage: python benchmarks/check_cache.py [size] [timeout]
+"""
+import logging
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from KnowledgeBase import KnowledgeBase  # noqa: E402
+from enums import EngineEnum  # noqa: E402
+from generate import SHAPES, generate  # noqa: E402
+
+ENGINES = [engine for engine in EngineEnum if engine != EngineEnum.SAT]
+
+
+def answers(kb):
+    """
+    Answers of `kb` to its queries, with evaluate and with each engine.
+    """
+    names = [kb.symbols.name(query) for query in kb.queries]
+    result = {"evaluate": {name: kb.evaluate(name) for name in names}}
+    for engine in ENGINES:
+        result[engine.value] = kb.query(engine=engine)
+    return result
+
+
+def cached_answers(path, timeout):
+    """
+    Answers of the knowledge base restored from the cache of `path`, None
+    when they take more than `timeout` seconds.
+    """
+    result = []
+
+    def run():
+        kb = KnowledgeBase()
+        kb.load_file(path, cache=True)
+        result.append(answers(kb))
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return result[0] if result else None
+
+
+def check(shape, size, directory, timeout):
+    """
+    Return a description of the first wrong answer for `shape`, None when
+    there is none.
+    """
+    path = os.path.join(directory, f"{shape}.txt")
+    with open(path, "w") as output:
+        output.write("\n".join(generate(shape, size)) + "\n")
+    kb = KnowledgeBase()
+    kb.load_file(path)
+    expected = answers(kb)
+    KnowledgeBase().load_file(path, cache=True)
+    restored = cached_answers(path, timeout)
+    if restored is None:
+        return f"{shape}: no answer after {timeout} s from the cache"
+    for name, values in expected.items():
+        if restored[name] != values:
+            return (f"{shape}: {restored[name]} instead of {values} "
+                    f"({name} from the cache)")
+    return None
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    timeout = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        failures = [failure for failure in
+                    (check(shape, size, directory, timeout)
+                     for shape in SHAPES)
+                    if failure is not None]
+    for failure in failures:
+        print(failure)
+    print(f"{len(SHAPES)} shapes of {size} rules restored from their cache: "
+          f"{len(failures)} with wrong answers")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,105 @@
+"""
+Check of deep conditions under the default recursion limit: rules whose
+condition is a chain of `depth` operands, `depth` nested parentheses or
+`depth` negations are answered by every engine, by query_scenarios and by
+evaluate, by the backward and lazy engines again with the solver trace
+(-vv) logged to a null stream, and explained as JSON and DOT proofs.
+Every answer must be the one of the backward engine, and nothing may
+raise RecursionError.
+
+Usage: python benchmarks/check_deep.py [depth]
+"""
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from KnowledgeBase import KnowledgeBase  # noqa: E402
+from enums import EngineEnum  # noqa: E402
+
+
+def cases(depth):
+    """
+    Rule lines of each case, with the initial facts to answer them from.
+    """
+    names = [f"a{index}" for index in range(depth)]
+    return {
+        "chain": ([" + ".join(names) + " => Z",
+                   " | ".join(names) + " => Y", "?Z Y"],
+                  [[], ["a1"], names]),
+        "nested": (["(" * depth + "A" + " + B)" * depth + " => Z",
+                    "(" * depth + "A" + " ^ B)" * depth + " => Y", "?Z Y"],
+                   [[], ["A"], ["A", "B"]]),
+        "negated": (["!(" * depth + "A" + ")" * depth + " => Z",
+                     "!(" * (depth + 1) + "A" + ")" * (depth + 1) + " => Y",
+                     "?Z Y"],
+                    [[], ["A"]]),
+        "cycle": (["(" * depth + "Z" + " | B)" * depth + " => Y", "Y => Z",
+                   "?Z Y"],
+                  [[], ["B"], ["Z"]]),
+    }
+
+
+def traced(kb, facts, engine):
+    """
+    Answers of `engine` from `facts` with the debug trace of the solver
+    formatted into a null stream.
+    """
+    solver = logging.getLogger("expert_system.solver")
+    trace = logging.StreamHandler(open(os.devnull, "w"))
+    solver.addHandler(trace)
+    solver.setLevel(logging.DEBUG)
+    solver.propagate = False
+    try:
+        return kb.query(facts=facts, engine=engine)
+    finally:
+        solver.removeHandler(trace)
+        trace.stream.close()
+        solver.setLevel(logging.NOTSET)
+        solver.propagate = True
+
+
+def check(name, lines, scenarios):
+    """
+    Return a description of the first wrong answer or error of the case
+    `name`, None when there is none.
+    """
+    kb = KnowledgeBase()
+    kb.load(lines)
+    queries = [kb.symbols.name(query) for query in kb.queries]
+    for facts in scenarios:
+        where = f"{name} from {facts[:3]}"
+        try:
+            expected = kb.query(facts=facts, engine=EngineEnum.BACKWARD)
+            results = {engine.value: kb.query(facts=facts, engine=engine)
+                       for engine in EngineEnum}
+            results["query_scenarios"] = kb.query_scenarios([facts])[0]
+            results["evaluate"] = {query: kb.evaluate(query, facts)
+                                   for query in queries}
+            for engine in (EngineEnum.BACKWARD, EngineEnum.LAZY):
+                results[f"{engine.value}, traced"] = traced(kb, facts,
+                                                            engine)
+            json.loads(kb.explain(facts=facts))
+            kb.explain(facts=facts, format="dot")
+        except RecursionError as e:
+            return f"{where}: RecursionError: {e}"
+        for way, values in results.items():
+            if values != expected:
+                return f"{where}: {values} instead of {expected} ({way})"
+    return None
+
+
+if __name__ == "__main__":
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    logging.getLogger("expert_system").setLevel(logging.ERROR)
+    failures = [failure for failure in
+                (check(name, lines, scenarios)
+                 for name, (lines, scenarios) in cases(depth).items())
+                if failure is not None]
+    for failure in failures:
+        print(failure)
+    print(f"{len(cases(depth))} cases of depth {depth}: "
+          f"{len(failures)} failing")
+    sys.exit(1 if failures else 0)
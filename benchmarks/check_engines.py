@@ -0,0 +1,136 @@
+"""
+Differential check of the engines: random stratified knowledge bases (with
+`!`, `^`, cycles and negated conclusions) are answered from random initial
+facts by every engine but sat, by the vectorized engine of
+query_scenarios and by evaluate, and every answer is compared with the
+backward engine. The lazy engine also answers the queries one by one.
+
+The answers of a negation through a cycle depend on the order of
+evaluation, so the knowledge bases are built in levels: a rule reads the
+facts of its own level only positively, and those of lower levels any
+way. A knowledge base that still has a negation through a cycle is
+skipped, and the check fails when fewer than MINIMUM of them are
+compared.
+
+Usage: python benchmarks/check_engines.py [seeds] [scenarios]
+"""
+import logging
+import os
+import random
+import string
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from KnowledgeBase import KnowledgeBase  # noqa: E402
+from enums import EngineEnum  # noqa: E402
+
+FACTS = string.ascii_uppercase[:8]
+ENGINES = [EngineEnum.LAZY, EngineEnum.FORWARD, EngineEnum.BITSET]
+LEVELS = 3
+MINIMUM = 0.95  # share of the knowledge bases that must be compared
+SKIPPED = []  # seeds of the knowledge bases skipped
+
+
+def condition(rng, positive, negative, sign=True, depth=0):
+    """
+    Random condition reading the facts of `positive` in positive positions
+    and those of `negative` in the others (under `!` or `^`), `sign` being
+    the position of the condition: True, False, or None under a `^`.
+    """
+    if sign is not True and not negative:
+        # nothing may be read here: an operand of no use, as for `A | A`
+        return rng.choice(positive)
+    if depth > 2 or rng.random() < 0.4:
+        if negative and sign is not None and rng.random() < 0.2:
+            return "!" + rng.choice(positive if sign is False else negative)
+        return rng.choice(positive if sign is True else negative)
+    if negative and rng.random() < 0.1:
+        flipped = None if sign is None else not sign
+        return f"!({condition(rng, positive, negative, flipped, depth + 1)})"
+    operator = rng.choice("++||^" if negative else "++||")
+    inner = None if operator == "^" else sign
+    return (f"({condition(rng, positive, negative, inner, depth + 1)} "
+            f"{operator} "
+            f"{condition(rng, positive, negative, inner, depth + 1)})")
+
+
+def stratified_rules(rng):
+    """
+    Random rules over FACTS, each fact given a level: a rule concluding
+    facts of one level reads those of lower levels any way, and those of
+    its own level positively, unless one of its conclusions is concluded
+    false by some rule (a fact concluded both ways is read negatively by
+    all its rules). Only facts above the lowest level are concluded false.
+    """
+    level = {fact: rng.randrange(LEVELS) for fact in FACTS}
+    lowest = min(level.values())
+    above = [fact for fact in FACTS if level[fact] > lowest]
+    negated = set(rng.sample(above, min(2, len(above))))
+    lines = []
+    for _ in range(rng.randint(2, 10)):
+        top = rng.choice(FACTS)
+        peers = [fact for fact in FACTS if level[fact] == level[top]]
+        conclusions = rng.sample(peers, min(rng.randint(1, 2), len(peers)))
+        below = [fact for fact in FACTS if level[fact] < level[top]]
+        contested = any(fact in negated for fact in conclusions)
+        positive = below if contested else below + peers
+        conclusion = " + ".join(
+            ("!" if fact in negated and rng.random() < 0.5 else "") + fact
+            for fact in conclusions)
+        lines.append(f"{condition(rng, positive, below)} => {conclusion}")
+    return lines + ["?" + " ".join(FACTS)]
+
+
+def answers(kb, facts):
+    """
+    Answers of `kb` to every fact from the true facts `facts`, by name of
+    the way they were computed.
+    """
+    result = {engine.value: kb.query(facts=facts, engine=engine)
+              for engine in ENGINES}
+    result["lazy, one by one"] = {
+        fact: kb.query([fact], facts, EngineEnum.LAZY)[fact]
+        for fact in FACTS}
+    result["query_scenarios"] = kb.query_scenarios([facts])[0]
+    result["evaluate"] = {fact: kb.evaluate(fact, facts) for fact in FACTS}
+    return result
+
+
+def check(seed, scenarios):
+    """
+    Return a description of the first wrong answer for `seed`, None when
+    there is none or the knowledge base is skipped.
+    """
+    rng = random.Random(seed)
+    lines = stratified_rules(rng)
+    kb = KnowledgeBase()
+    kb.load(lines)
+    if kb.schedule().unstratified:
+        SKIPPED.append(seed)
+        return None
+    for _ in range(scenarios):
+        facts = sorted(rng.sample(FACTS, rng.randint(0, len(FACTS))))
+        expected = kb.query(facts=facts, engine=EngineEnum.BACKWARD)
+        for name, values in answers(kb, facts).items():
+            if values != expected:
+                return (f"seed {seed}: {lines} from {''.join(facts)}: "
+                        f"{values} instead of {expected} ({name})")
+    return None
+
+
+if __name__ == "__main__":
+    seeds = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    scenarios = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    logging.disable(logging.WARNING)
+    results = [check(seed, scenarios) for seed in range(seeds)]
+    failures = [failure for failure in results if failure is not None]
+    for failure in failures[:5]:
+        print(failure)
+    compared = seeds - len(SKIPPED)
+    print(f"{seeds} knowledge bases ({compared} compared, {len(SKIPPED)} "
+          f"skipped), {scenarios} scenarios each: "
+          f"{len(failures)} with answers differing from backward")
+    if compared < MINIMUM * seeds:
+        print(f"fewer than {MINIMUM:.0%} of the knowledge bases compared")
+    sys.exit(1 if failures or compared < MINIMUM * seeds else 0)
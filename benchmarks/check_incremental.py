@@ -0,0 +1,91 @@
+"""
+Differential check of TruthMaintenance: random stratified knowledge bases
+(see check_engines.py) go through random assertions and retractions, and
+after each change the answers kept up to date are compared with the
+forward and backward engines answering from scratch. Knowledge bases with
+a negation through a cycle are skipped, their answers depending on the
+order of evaluation.
+
+random_rules gives knowledge bases without levels, for the checks that
+do not need them stratified.
+
+Usage: python benchmarks/check_incremental.py [seeds] [updates]
+"""
+import logging
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from KnowledgeBase import KnowledgeBase  # noqa: E402
+from check_engines import FACTS, stratified_rules  # noqa: E402
+from enums import EngineEnum  # noqa: E402
+
+SKIPPED = []  # seeds of the knowledge bases skipped
+
+
+def condition(rng, depth=0):
+    if depth > 2 or rng.random() < 0.4:
+        return ("!" if rng.random() < 0.2 else "") + rng.choice(FACTS)
+    if rng.random() < 0.1:
+        return f"!({condition(rng, depth + 1)})"
+    return (f"({condition(rng, depth + 1)} {rng.choice('++||^')} "
+            f"{condition(rng, depth + 1)})")
+
+
+def random_rules(rng):
+    lines = []
+    for _ in range(rng.randint(2, 10)):
+        conclusion = " + ".join(("!" if rng.random() < 0.2 else "") + fact
+                                for fact in rng.sample(FACTS,
+                                                       rng.randint(1, 2)))
+        lines.append(f"{condition(rng)} => {conclusion}")
+    return lines + ["?" + " ".join(FACTS)]
+
+
+def check(seed, updates):
+    """
+    Return a description of the first wrong answer for `seed`, None when
+    there is none or the knowledge base is skipped.
+    """
+    rng = random.Random(seed)
+    lines = stratified_rules(rng)
+    kb = KnowledgeBase()
+    kb.load(lines)
+    if kb.schedule().unstratified:
+        SKIPPED.append(seed)
+        return None
+    truth = kb.truth_maintenance()
+    changes = []
+    for _ in range(updates):
+        fact = rng.choice(FACTS)
+        if fact in truth.asserted_names():
+            truth.retract_facts([fact])
+            changes.append(f"-{fact}")
+        else:
+            truth.assert_facts([fact])
+            changes.append(f"+{fact}")
+        asserted = sorted(truth.asserted_names())
+        answers = truth.answers()
+        for engine in (EngineEnum.FORWARD, EngineEnum.BACKWARD):
+            expected = kb.query(facts=asserted, engine=engine)
+            if answers != expected:
+                return (f"seed {seed}: {lines} after {' '.join(changes)}: "
+                        f"{answers} instead of {expected} ({engine.value})")
+    return None
+
+
+if __name__ == "__main__":
+    seeds = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    logging.disable(logging.WARNING)
+    failures = [failure for failure in
+                (check(seed, updates) for seed in range(seeds))
+                if failure is not None]
+    for failure in failures[:5]:
+        print(failure)
+    print(f"{seeds} knowledge bases ({seeds - len(SKIPPED)} compared, "
+          f"{len(SKIPPED)} skipped), {updates} updates each: "
+          f"{len(failures)} with wrong answers")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,58 @@
+"""
+Differential check of the Optimizer: random knowledge bases, stratified
+ones (see check_engines.py) and ones that may have a negation through a
+cycle (see check_incremental.py), are optimized for random initial facts,
+and the answers of every engine but sat on the optimized rules are
+compared with its answers on the rules as they are.
+
+Usage: python benchmarks/check_optimizer.py [seeds] [scenarios]
+"""
+import logging
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from KnowledgeBase import KnowledgeBase  # noqa: E402
+from check_engines import FACTS, stratified_rules  # noqa: E402
+from check_incremental import random_rules  # noqa: E402
+from enums import EngineEnum  # noqa: E402
+
+ENGINES = [EngineEnum.BACKWARD, EngineEnum.LAZY, EngineEnum.FORWARD,
+           EngineEnum.BITSET]
+
+
+def check(seed, scenarios):
+    """
+    Return a description of the first answer the optimized rules change
+    for `seed`, None when there is none.
+    """
+    rng = random.Random(seed)
+    lines = (stratified_rules if seed % 2 else random_rules)(rng)
+    kb = KnowledgeBase()
+    kb.load(lines)
+    for _ in range(scenarios):
+        facts = sorted(rng.sample(FACTS, rng.randint(0, len(FACTS))))
+        optimized = kb.optimized(facts)
+        for engine in ENGINES:
+            expected = kb.query(facts=facts, engine=engine)
+            answers = optimized.query(engine=engine)
+            if answers != expected:
+                return (f"seed {seed}: {lines} from {''.join(facts)}: "
+                        f"{answers} instead of {expected} ({engine.value})")
+    return None
+
+
+if __name__ == "__main__":
+    seeds = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    scenarios = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    logging.disable(logging.WARNING)
+    failures = [failure for failure in
+                (check(seed, scenarios) for seed in range(seeds))
+                if failure is not None]
+    for failure in failures[:5]:
+        print(failure)
+    print(f"{seeds} knowledge bases, {scenarios} scenarios each: "
+          f"{len(failures)} with answers changed by the Optimizer")
+    sys.exit(1 if failures else 0)
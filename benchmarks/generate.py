@@ -0,0 +1,121 @@
+"""
+Synthetic input files for the benchmarks, in the input file syntax, with
+one shape per kind of knowledge base that stresses the engines:
+
+    chain           long implication chains
+    wide_or         facts concluded by wide disjunctions of derived facts
+    wide_and        facts concluded by wide conjunctions of derived facts
+    nested          conditions with deeply nested parentheses
+    biconditional   chains of `<=>` rules
+    cycles          rings of rules concluding each other
+    negation        conditions made mostly of negated facts
+
+Every shape gives `size` rules (about), a `=` line for its initial facts
+and a `?` line for its queries.
+
+Usage: python benchmarks/generate.py shape size [seed] > input.txt
+"""
+import random
+import sys
+
+WIDTH = 8  # operands of the wide and nested conditions
+
+
+def chain(rng, size):
+    lines = [f"f{index} => f{index + 1}" for index in range(size)]
+    return lines, ["f0"], [f"f{size}"]
+
+
+def wide(rng, size, operator):
+    # the operands are concluded by rules of their own, so that reading
+    # one operand less saves solving it
+    half = max(size // 2, 1)
+    inputs = [f"in{index}" for index in range(half)]
+    lines = [f"src{index} => in{index}" for index in range(half)]
+    for index in range(half):
+        operands = rng.sample(inputs, min(WIDTH, half))
+        lines.append(f" {operator} ".join(operands) + f" => out{index}")
+    queries = [f"out{rng.randrange(half)}" for _ in range(min(half, 100))]
+    return lines, [f"src{index}" for index in range(0, half, 2)], queries
+
+
+def wide_or(rng, size):
+    return wide(rng, size, "|")
+
+
+def wide_and(rng, size):
+    return wide(rng, size, "+")
+
+
+def nested(rng, size):
+    lines = []
+    for index in range(size):
+        condition = f"n{rng.randrange(index + 1)}"
+        for _ in range(WIDTH):
+            condition = (f"({condition} {rng.choice('+|^')} "
+                         f"n{rng.randrange(index + 1)})")
+        lines.append(f"n{rng.randrange(index + 1)} {rng.choice('+|')} "
+                     f"{condition} => n{index + 1}")
+    return lines, ["n0"], [f"n{size}"]
+
+
+def biconditional(rng, size):
+    lines = [f"b{index} <=> b{index + 1}" for index in range(size)]
+    return lines, ["b0"], [f"b{size}", f"b{size // 2}"]
+
+
+def cycles(rng, size, length=10):
+    lines = []
+    rings = max(size // length, 1)
+    for ring in range(rings):
+        for index in range(length):
+            lines.append(f"r{ring}_{index} + !stop{ring} => "
+                         f"r{ring}_{(index + 1) % length}")
+        if ring:
+            lines.append(f"r{ring - 1}_0 => r{ring}_0")
+    queries = [f"r{ring}_{length - 1}" for ring in range(0, rings,
+                                                         max(rings // 10, 1))]
+    return lines, ["r0_0"], queries
+
+
+def negation(rng, size):
+    lines = []
+    for index in range(size):
+        operands = [f"{'!' if rng.random() < 0.7 else ''}"
+                    f"g{rng.randrange(index + 1)}"
+                    for _ in range(rng.randint(1, 4))]
+        if operands[0].startswith("!"):
+            operands.insert(0, f"g{rng.randrange(index + 1)}")
+        condition = operands[0]
+        for operand in operands[1:]:
+            condition += f" {rng.choice('+|')} {operand}"
+        lines.append(f"{condition} => g{index + 1}")
+    return lines, ["g0"], [f"g{size - index}" for index in range(10)]
+
+
+SHAPES = {
+    "chain": chain,
+    "wide_or": wide_or,
+    "wide_and": wide_and,
+    "nested": nested,
+    "biconditional": biconditional,
+    "cycles": cycles,
+    "negation": negation,
+}
+
+
+def generate(shape, size, seed=42):
+    """
+    Return the lines of an input file of the given shape and size.
+    """
+    lines, facts, queries = SHAPES[shape](random.Random(seed), size)
+    return lines + ["= " + " ".join(facts), "? " + " ".join(queries)]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in SHAPES:
+        print(f"Usage: {sys.argv[0]} {{{','.join(SHAPES)}}} size [seed]")
+        sys.exit(1)
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 42
+    for line in generate(sys.argv[1], int(sys.argv[2]), seed):
+        print(line)
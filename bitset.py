@@ -0,0 +1,290 @@
+from Node import NodeTypes
+from enums import OperatorsEnum
+from forward import ForwardEngine
+from schedule import Schedule
+
+
+class BitsetFacts:
+    """
+    Fact store keeping the known-true, known-false and undetermined facts
+    as three integer bitmasks, the bit of a fact being its symbol id.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.true = 0
+        self.false = 0
+        self.undetermined = 0
+
+    @staticmethod
+    def from_dict(facts: dict):
+        store = BitsetFacts(max(facts, default=-1) + 1)
+        for fact, value in facts.items():
+            store.set(fact, value)
+        return store
+
+    def to_dict(self) -> dict:
+        return {fact: self.get(fact) for fact in range(self.size)}
+
+    @staticmethod
+    def mask(facts) -> int:
+        mask = 0
+        for fact in facts:
+            mask |= 1 << fact
+        return mask
+
+    def get(self, fact):
+        bit = 1 << fact
+        if self.undetermined & bit:
+            return None
+        return bool(self.true & bit)
+
+    def set(self, fact, value):
+        if value is not True and value is not False and value is not None:
+            raise ValueError("Status must be True, False, or None")
+        bit = 1 << fact
+        self.true &= ~bit
+        self.false &= ~bit
+        self.undetermined &= ~bit
+        if value is True:
+            self.true |= bit
+        elif value is False:
+            self.false |= bit
+        else:
+            self.undetermined |= bit
+
+
+class BitsetEngine:
+    """
+    Saturates a BitsetFacts store by sweeping the rules, each condition
+    being compiled into a test on the three masks. A conjunction or a
+    disjunction of literals costs a few integer operations, for instance
+    `(true & mask) == mask` for `A + B + C`.
+    Like ForwardEngine, the rules using `!` or `^` are only tried once the
+    monotone rules are saturated, in the order of the strata, and so are
+    the decisions of the contested facts.
+    """
+
+    def __init__(self, rules, schedule: Schedule = None):
+        schedule = schedule or Schedule(rules)
+        self.contested = list(schedule.contested.items())
+        self.tests = []
+        self.conclusions = []
+        self.monotone = []
+        self.deferred = []
+        for index, rule in enumerate(rules):
+            condition = rule.get_compiled_condition()
+            self.tests.append(self.compile(condition))
+            self.conclusions.append(BitsetFacts.mask(
+                ForwardEngine.positive_conclusions(rule,
+                                                   schedule.contested)))
+            if not self.conclusions[index]:
+                continue  # it only takes part in decisions
+            if ForwardEngine.is_monotone(condition):
+                self.monotone.append(index)
+            else:
+                self.deferred.append(index)
+        self.deferred = schedule.stratified(
+            rules, self.deferred +
+            ForwardEngine.decisions(rules, self.contested))
+
+    @staticmethod
+    def store(facts: dict) -> BitsetFacts:
+        return BitsetFacts.from_dict(facts)
+
+    def literals(self, expression, operator):
+        """
+        Return the (positive, negative) masks of `expression` if it is a
+        chain of `operator` over facts and negated facts, None otherwise.
+        """
+        positive = negative = 0
+        pending = [expression]
+        while pending:
+            expression = pending.pop()
+            if expression.type == NodeTypes.FACT:
+                positive |= 1 << expression.value
+            elif expression.value == OperatorsEnum.NOT.value:
+                if expression.left.type != NodeTypes.FACT:
+                    return None
+                negative |= 1 << expression.left.value
+            elif expression.value != operator:
+                return None
+            else:
+                pending.append(expression.right)
+                pending.append(expression.left)
+        return positive, negative
+
+    def compile(self, expression):
+        """
+        Compile an Expression into a function of the (true, false,
+        undetermined) masks returning True, False or None.
+        """
+        conjunction = self.literals(expression, OperatorsEnum.AND.value)
+        if conjunction is not None:
+            positive, negative = conjunction
+            mask = positive | negative
+
+            def test_and(true, false, undetermined):
+                if undetermined & mask:
+                    return None
+                return ((true & positive) == positive and
+                        (false & negative) == negative)
+            return test_and
+        disjunction = self.literals(expression, OperatorsEnum.OR.value)
+        if disjunction is not None:
+            positive, negative = disjunction
+            mask = positive | negative
+
+            def test_or(true, false, undetermined):
+                if undetermined & mask:
+                    return None
+                return bool(true & positive or false & negative)
+            return test_or
+        program = self.program(expression)
+
+        def test_program(true, false, undetermined):
+            return self.run_program(program, true, false, undetermined)
+        return test_program
+
+    def program(self, expression) -> list[tuple]:
+        """
+        Postfix steps of `expression`, for run_program: each maximal
+        chain of `+` or `|` over literals is a single (operator, positive,
+        negative) step, and the other operators are (operator,) steps.
+        The masks of every subexpression are found once, children first,
+        so neither this nor run_program recurses on deep conditions.
+        """
+        AND = OperatorsEnum.AND.value
+        OR = OperatorsEnum.OR.value
+        chains = {}  # expression id -> (operator, positive, negative)
+        pending = [(expression, False)]
+        while pending:
+            node, visited = pending.pop()
+            if node.id in chains:
+                continue
+            if node.type == NodeTypes.FACT:
+                chains[node.id] = (None, 1 << node.value, 0)
+            elif node.value == OperatorsEnum.NOT.value:
+                if node.left.type == NodeTypes.FACT:
+                    chains[node.id] = (None, 0, 1 << node.left.value)
+                elif visited:
+                    chains[node.id] = None
+                else:
+                    pending.append((node, True))
+                    pending.append((node.left, False))
+            elif visited:
+                left = chains[node.left.id]
+                right = chains[node.right.id]
+                chains[node.id] = None
+                if (node.value in (AND, OR) and
+                        left is not None and right is not None and
+                        left[0] in (None, node.value) and
+                        right[0] in (None, node.value)):
+                    chains[node.id] = (node.value, left[1] | right[1],
+                                       left[2] | right[2])
+            else:
+                pending.append((node, True))
+                pending.append((node.right, False))
+                pending.append((node.left, False))
+        steps = []
+        pending = [(expression, False)]
+        while pending:
+            node, visited = pending.pop()
+            chain = chains.get(node.id)
+            if chain is not None:
+                steps.append((chain[0] or AND, chain[1], chain[2]))
+            elif visited:
+                steps.append((node.value,))
+            else:
+                pending.append((node, True))
+                if node.right is not None:
+                    pending.append((node.right, False))
+                pending.append((node.left, False))
+        return steps
+
+    @staticmethod
+    def run_program(program, true, false, undetermined):
+        """
+        Run the steps of `program` on the masks, operands on a stack.
+        """
+        values = []
+        for step in program:
+            if len(step) == 3:
+                operator, positive, negative = step
+                if undetermined & (positive | negative):
+                    values.append(None)
+                elif operator == OperatorsEnum.AND.value:
+                    values.append((true & positive) == positive and
+                                  (false & negative) == negative)
+                else:
+                    values.append(bool(true & positive or false & negative))
+            elif step[0] == OperatorsEnum.NOT.value:
+                if values[-1] is not None:
+                    values[-1] = not values[-1]
+            else:
+                rvalue = values.pop()
+                lvalue = values[-1]
+                if lvalue is None or rvalue is None:
+                    values[-1] = None
+                elif step[0] == OperatorsEnum.AND.value:
+                    values[-1] = lvalue and rvalue
+                elif step[0] == OperatorsEnum.OR.value:
+                    values[-1] = lvalue or rvalue
+                else:
+                    values[-1] = lvalue ^ rvalue
+        return values[0]
+
+    def run(self, store: BitsetFacts) -> BitsetFacts:
+        """
+        Saturate `store` in place and return it.
+        """
+        fired = [False] * (len(self.tests) + len(self.contested))
+        while True:
+            changed = True
+            while changed:
+                changed = False
+                for index in self.monotone:
+                    if not fired[index] and self._fire(index, store, fired):
+                        changed = True
+            for index in self.deferred:
+                if not fired[index] and self._fire(index, store, fired):
+                    break
+            else:
+                return store
+
+    def _fire(self, index, store, fired):
+        """
+        Fire rule `index` if its condition holds; return whether it made a
+        new fact true.
+        """
+        if index >= len(self.tests):
+            return self._decide(index, store, fired)
+        if not self._holds(index, store):
+            return False
+        fired[index] = True
+        new = self.conclusions[index] & ~store.true
+        if not new:
+            return False
+        store.true |= new
+        store.false &= ~new
+        store.undetermined &= ~new
+        return True
+
+    def _holds(self, index, store):
+        return self.tests[index](store.true, store.false,
+                                 store.undetermined) is True
+
+    def _decide(self, index, store, fired):
+        """
+        Decide the contested fact of decision `index` once, like
+        ForwardEngine, unless it is given; return whether it became true.
+        """
+        fired[index] = True
+        fact, links = self.contested[index - len(self.tests)]
+        if store.get(fact) is not False:
+            return False
+        if not ForwardEngine.decide(
+                links, lambda rule: self._holds(rule, store)):
+            return False
+        store.set(fact, True)
+        return True
@@ -0,0 +1,104 @@
+from array import array
+
+from Node import NodeTypes
+from enums import OperatorsEnum
+
+
+class Bytecode:
+    """
+    Postfix form of a compiled condition, run by a small stack machine.
+
+    The code is an `array("i")`: a non-negative entry pushes the value of
+    the fact with that id, a negative one is an operator applied to the
+    values on top of the stack (one for `!`, two for the others). So
+    `A + !(B | C)` is `A B C | ! +`, with fact ids in place of the names.
+    Values are True, False or None (unknown) with the semantics of
+    evaluate_node: an operator with an unknown operand gives an unknown
+    value.
+    """
+
+    NOT = -1
+    AND = -2
+    OR = -3
+    XOR = -4
+
+    opcodes = {
+        OperatorsEnum.NOT.value: NOT,
+        OperatorsEnum.AND.value: AND,
+        OperatorsEnum.OR.value: OR,
+        OperatorsEnum.XOR.value: XOR,
+    }
+    operators = {opcode: operator for operator, opcode in opcodes.items()}
+
+    @staticmethod
+    def compile(expression) -> array:
+        """
+        Return the postfix code of a compiled Expression.
+        """
+        code = array("i")
+        Bytecode._emit(expression, code)
+        return code
+
+    @staticmethod
+    def _emit(expression, code):
+        if expression.type == NodeTypes.FACT:
+            code.append(expression.value)
+            return
+        Bytecode._emit(expression.left, code)
+        if expression.right is not None:
+            Bytecode._emit(expression.right, code)
+        code.append(Bytecode.opcodes[expression.value])
+
+    @staticmethod
+    def facts(code) -> list[int]:
+        """
+        Ids of the facts read by `code`, each once, in order of appearance.
+        """
+        return list(dict.fromkeys(op for op in code if op >= 0))
+
+    @staticmethod
+    def run(code, facts):
+        """
+        Execute `code` against `facts` (fact id -> True, False or None) and
+        return the value of the condition.
+        """
+        if len(code) == 1:
+            return facts[code[0]]
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        for op in code:
+            if op >= 0:
+                push(facts[op])
+            elif op == -1:  # NOT
+                value = stack[-1]
+                if value is not None:
+                    stack[-1] = not value
+            else:
+                right = pop()
+                left = stack[-1]
+                if left is None or right is None:
+                    stack[-1] = None
+                elif op == -2:  # AND
+                    stack[-1] = left and right
+                elif op == -3:  # OR
+                    stack[-1] = left or right
+                else:
+                    stack[-1] = left ^ right
+        return stack[0]
+
+    @staticmethod
+    def to_string(code, symbols=None) -> str:
+        """
+        Disassemble `code` into its postfix listing, naming facts through
+        `symbols` (a SymbolTable) or by their id when it is not given.
+        """
+        words = []
+        for op in code:
+            if op < 0:
+                words.append(Bytecode.operators[op])
+            elif symbols is None:
+                words.append(f"#{op}")
+            else:
+                words.append(symbols.name(op))
+        return " ".join(words)
@@ -0,0 +1,203 @@
+import gc
+import hashlib
+import marshal
+import os
+from array import array
+
+from Node import NodeTypes
+from Rule import Rule
+from enums import OperatorsEnum, RelationEnum
+
+
+class CompiledCache:
+    """
+    Compiled form of a knowledge base, written next to its source file
+    (`rules.txt` -> `rules.txt.kbc`) so the next load of the same source
+    skips validation, tokenizing and compiling.
+
+    The file starts with a magic string, the format and marshal versions
+    and the SHA-256 of the source, followed by one marshal blob. Apart from
+    the rule texts and the fact names, everything is stored as flat integer
+    arrays, so reading the cache is a handful of bulk reads:
+    - expressions: (type, value, left id, right id) in id order, the value
+      of an operator being its index in `operators`;
+    - tokens: one code per token, `symbol id * 8 + LETTER` for a fact name
+      and the TokensEnum value otherwise, with one offset per rule side;
+    - conditions and conclusions: the expression id of each rule side;
+    - bytecode: the Bytecode of every condition, with offsets.
+    A cache is ignored when the hash of the source, or of one of the files
+    it includes, does not match.
+    """
+
+    suffix = ".kbc"
+    magic = b"EXPKB"
+    version = 5
+    operators = [operator.value for operator in OperatorsEnum]
+    relations = [relation.value for relation in RelationEnum]
+    fact_values = [False, True, None]
+
+    @staticmethod
+    def path(source):
+        return source + CompiledCache.suffix
+
+    @staticmethod
+    def digest(source) -> bytes:
+        sha = hashlib.sha256()
+        with open(source, "rb") as input:
+            for chunk in iter(lambda: input.read(1 << 20), b""):
+                sha.update(chunk)
+        return sha.digest()
+
+    @staticmethod
+    def include_digest(include):
+        """
+        Digest of an included file, None if it could not be read (its
+        creation must invalidate the cache too).
+        """
+        try:
+            return CompiledCache.digest(include)
+        except OSError:
+            return None
+
+    @staticmethod
+    def header(digest) -> bytes:
+        return (CompiledCache.magic +
+                bytes([CompiledCache.version, marshal.version]) + digest)
+
+    @staticmethod
+    def write(kb, source, digest, messages="", includes=()):
+        """
+        Save the compiled `kb`, loaded from `source` and the files
+        `includes`. Failing to write the cache (a read-only directory for
+        instance) is not an error.
+        """
+        operators = {operator: index for index, operator
+                     in enumerate(CompiledCache.operators)}
+        expressions = array("i")
+        for expression in sorted(kb.expressions.expressions.values(),
+                                 key=lambda expression: expression.id):
+            if expression.type == NodeTypes.FACT:
+                value = expression.value
+            else:
+                value = operators[expression.value]
+            expressions.extend((
+                expression.type.value, value,
+                expression.left.id if expression.left is not None else -1,
+                expression.right.id if expression.right is not None else -1))
+        texts = []
+        relations = bytearray()
+        tokens = array("i")
+        token_offsets = array("i", [0])
+        conditions = array("i")
+        conclusions = array("i")
+        bytecode = array("i")
+        bytecode_offsets = array("i", [0])
+        for rule in kb.rules + kb.ambiguous_rules:
+            texts.append(rule.conditions)
+            texts.append(rule.conclusions)
+            relations.append(CompiledCache.relations.index(rule.relation))
+            token_offsets.append(len(tokens) + rule.split)
+            tokens.extend(rule.tokens)
+            token_offsets.append(len(tokens))
+            conditions.append(rule.get_compiled_condition().id)
+            conclusions.append(rule.get_compiled_conclusion().id)
+            bytecode.extend(rule.get_bytecode())
+            bytecode_offsets.append(len(bytecode))
+        payload = (
+            "\n".join(kb.symbols.names),
+            expressions.tobytes(),
+            "\n".join(texts),
+            bytes(relations),
+            tokens.tobytes(),
+            token_offsets.tobytes(),
+            conditions.tobytes(),
+            conclusions.tobytes(),
+            bytecode.tobytes(),
+            bytecode_offsets.tobytes(),
+            bytes(CompiledCache.fact_values.index(kb.facts[fact])
+                  for fact in range(len(kb.facts))),
+            array("i", kb.queries).tobytes(),
+            messages,
+            [(include, CompiledCache.include_digest(include))
+             for include in includes],
+        )
+        path = CompiledCache.path(source)
+        try:
+            with open(path + ".tmp", "wb") as output:
+                output.write(CompiledCache.header(digest))
+                marshal.dump(payload, output)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def read(kb, source, digest):
+        """
+        Restore the cache of `source` into `kb`, an empty KnowledgeBase.
+        Return the messages printed when it was compiled, or None when there
+        is no cache matching `digest`.
+        """
+        header = CompiledCache.header(digest)
+        try:
+            with open(CompiledCache.path(source), "rb") as input:
+                if input.read(len(header)) != header:
+                    return None
+                payload = marshal.load(input)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        for include, include_digest in payload[-1]:
+            if CompiledCache.include_digest(include) != include_digest:
+                return None
+        # Restoring only allocates objects that stay alive, so the cycle
+        # collector would scan them again and again for nothing.
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return CompiledCache.restore(kb, payload)
+        finally:
+            if enabled:
+                gc.enable()
+
+    @staticmethod
+    def restore(kb, payload):
+        (names, expressions, texts, relations, tokens, token_offsets,
+         conditions, conclusions, bytecode, bytecode_offsets, facts,
+         queries, messages, _) = payload
+
+        names = names.split("\n")
+        for name in names:
+            kb.symbols.intern(name)
+        types = [type for type in sorted(NodeTypes,
+                                         key=lambda type: type.value)]
+        operators = CompiledCache.operators
+        expressions = array("i", expressions)
+        fact = NodeTypes.FACT.value
+        table = kb.expressions.restore(
+            (types[type],
+             value if type == fact else operators[value],
+             left, right)
+            for type, value, left, right in zip(*[iter(expressions)] * 4))
+
+        tokens = array("i", tokens)
+        token_offsets = array("i", token_offsets)
+        conclusions = array("i", conclusions)
+        bytecode = array("i", bytecode)
+        bytecode_offsets = array("i", bytecode_offsets)
+        texts = texts.split("\n")
+        for index, condition in enumerate(array("i", conditions)):
+            side = 2 * index
+            rule = Rule.restore(
+                texts[side], texts[side + 1],
+                CompiledCache.relations[relations[index]],
+                tokens[token_offsets[side]:token_offsets[side + 2]],
+                token_offsets[side + 1] - token_offsets[side],
+                table[condition],
+                table[conclusions[index]],
+                bytecode[bytecode_offsets[index]:
+                         bytecode_offsets[index + 1]])
+            kb.register_rule(rule)
+        kb.facts.clear()
+        kb.facts.update(enumerate(CompiledCache.fact_values[value]
+                                  for value in facts))
+        kb.queries.extend(array("i", queries))
+        return messages
@@ -21,3 +21,16 @@ class TokensEnum(Enum):
 class RelationEnum(Enum):
     IMPLICATION = "=>"
     BICONDITIONAL = "<=>"
+
+
+class GoalStatesEnum(Enum):
+    EXPANDED = 0
+    RESOLVED = 1
+
+
+class EngineEnum(Enum):
+    BACKWARD = "backward"
+    FORWARD = "forward"
+    BITSET = "bitset"
+    SAT = "sat"
+    LAZY = "lazy"
@@ -0,0 +1,190 @@
+from collections import deque
+
+from Node import NodeTypes
+from bytecode import Bytecode
+from enums import OperatorsEnum
+from schedule import Schedule
+
+
+class ForwardEngine:
+    """
+    Agenda-based forward chaining over a list of compiled rules.
+
+    Rules whose condition is a conjunction of positive facts keep a count
+    of their premises that are not yet true and fire when it drops to zero,
+    and disjunctions of positive facts fire as soon as one of them is true.
+    Other monotone conditions (using only `+` and `|`) are re-evaluated when
+    one of their facts becomes true. Conditions that use `!` or `^` can be
+    falsified by a new fact, so they are only tried once the monotone rules
+    have reached a fixpoint, one firing at a time, lowest stratum of the
+    Schedule first: the facts such a rule reads negatively are complete
+    when it fires, unless the negation goes through a cycle.
+    A negated conclusion never makes a fact true, so it is not fired, but
+    a contested fact of the Schedule (concluded by a rule and negated by
+    another) is not set by its rules either: it is decided at its stratum,
+    once the facts its rules read are complete, by the first of its rules
+    that holds, like the backward engine does.
+    """
+
+    def __init__(self, rules, schedule: Schedule = None):
+        schedule = schedule or Schedule(rules)
+        self.rules = rules
+        self.contested = list(schedule.contested.items())
+        self.premises = []  # facts of a conjunctive rule, None otherwise
+        self.disjunctive = []
+        self.conclusions = []
+        self.watchers = {}  # fact -> indexes of the monotone rules using it
+        self.deferred = []  # indexes of the rules using `!` or `^`
+        for index, rule in enumerate(rules):
+            condition = rule.get_compiled_condition()
+            self.conclusions.append(
+                self.positive_conclusions(rule, schedule.contested))
+            if self.is_conjunction(condition):
+                self.premises.append(condition.get_facts())
+            else:
+                self.premises.append(None)
+            self.disjunctive.append(
+                self.is_operator_chain(condition, OperatorsEnum.OR.value))
+            if not self.conclusions[index]:
+                continue  # it only takes part in decisions
+            if not self.is_monotone(condition):
+                self.deferred.append(index)
+                continue
+            for fact in condition.get_facts():
+                self.watchers.setdefault(fact, []).append(index)
+        # the decisions of the contested facts follow the rules
+        self.deferred = schedule.stratified(
+            rules, self.deferred + self.decisions(rules, self.contested))
+
+    @staticmethod
+    def positive_conclusions(rule, contested=()):
+        """
+        Facts that firing `rule` makes true: its positive conclusions but
+        the `contested` ones, which the first rule holding decides.
+        """
+        facts = []
+        for fact, positive in rule.get_conclusion_literals():
+            if positive and fact not in facts and fact not in contested:
+                facts.append(fact)
+        return facts
+
+    @staticmethod
+    def decisions(rules, contested) -> list[int]:
+        """
+        Indexes standing for the decisions of the `contested` facts in the
+        deferred rules, after the indexes of `rules` (see
+        Schedule.stratified).
+        """
+        return list(range(len(rules), len(rules) + len(contested)))
+
+    @staticmethod
+    def decide(links, holds):
+        """
+        Value given to a contested fact by the first of its (rule index,
+        positive) `links` whose rule holds according to `holds`, None
+        when none does.
+        """
+        for index, positive in links:
+            if holds(index):
+                return positive
+        return None
+
+    @staticmethod
+    def is_operator_chain(expression, operator):
+        """
+        Whether `expression` only combines facts with `operator`.
+        """
+        return ForwardEngine.only_operators(expression, (operator,))
+
+    @staticmethod
+    def is_conjunction(expression):
+        return ForwardEngine.is_operator_chain(expression,
+                                               OperatorsEnum.AND.value)
+
+    @staticmethod
+    def is_monotone(expression):
+        """
+        Whether `expression` only combines facts with `+` and `|`.
+        """
+        return ForwardEngine.only_operators(
+            expression, (OperatorsEnum.AND.value, OperatorsEnum.OR.value))
+
+    @staticmethod
+    def only_operators(expression, operators):
+        """
+        Whether every operator of `expression` is one of `operators`. The
+        DAG is walked with an explicit stack, each shared subexpression
+        once, so deep conditions do not hit the recursion limit.
+        """
+        seen = set()
+        pending = [expression]
+        while pending:
+            expression = pending.pop()
+            if expression.type == NodeTypes.FACT or expression.id in seen:
+                continue
+            if expression.value not in operators:
+                return False
+            seen.add(expression.id)
+            pending.append(expression.right)
+            pending.append(expression.left)
+        return True
+
+    def run(self, facts: dict) -> dict:
+        """
+        Saturate `facts` in place and return it.
+        """
+        fired = [False] * (len(self.rules) + len(self.contested))
+        # A monotone condition is false while none of its facts is true, so
+        # every rule gets its first look when one of its facts is taken off
+        # the agenda, starting with the facts that are already true.
+        missing = [len(premises) if premises is not None else 0
+                   for premises in self.premises]
+        agenda = deque(fact for fact, value in facts.items() if value is True)
+        while True:
+            while agenda:
+                fact = agenda.popleft()
+                for index in self.watchers.get(fact, ()):
+                    if fired[index]:
+                        continue
+                    if self.premises[index] is not None:
+                        missing[index] -= 1
+                        if missing[index] == 0:
+                            self._fire(index, facts, fired, agenda)
+                    elif (self.disjunctive[index] or
+                          self._holds(index, facts)):
+                        self._fire(index, facts, fired, agenda)
+            for index in self.deferred:
+                if fired[index]:
+                    continue
+                if index >= len(self.rules):
+                    self._decide(index, facts, fired, agenda)
+                elif self._holds(index, facts):
+                    self._fire(index, facts, fired, agenda)
+                if agenda:
+                    break
+            if not agenda:
+                return facts
+
+    def _holds(self, index, facts):
+        return Bytecode.run(self.rules[index].get_bytecode(), facts) is True
+
+    def _fire(self, index, facts, fired, agenda):
+        fired[index] = True
+        for fact in self.conclusions[index]:
+            if facts.get(fact) is not True:
+                facts[fact] = True
+                agenda.append(fact)
+
+    def _decide(self, index, facts, fired, agenda):
+        """
+        Decide the contested fact of decision `index`, unless it is given.
+        The facts its rules read are in lower strata, so they are complete
+        once the deferred rules reach it, and it is decided once.
+        """
+        fired[index] = True
+        fact, links = self.contested[index - len(self.rules)]
+        if facts.get(fact) is not False:
+            return
+        if self.decide(links, lambda rule: self._holds(rule, facts)):
+            facts[fact] = True
+            agenda.append(fact)
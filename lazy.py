@@ -0,0 +1,200 @@
+import logging
+
+from Node import NodeTypes, ChildLinkTypes
+from backward import BackwardEngine
+from enums import GoalStatesEnum, OperatorsEnum
+
+logger = logging.getLogger("expert_system.solver")
+
+
+class LazyEngine(BackwardEngine):
+    """
+    Backward chaining that expands a goal only when its value is needed.
+
+    The BackwardEngine solves every fact a query may depend on, in the
+    order of the Schedule. This engine instead walks the condition of each
+    rule from left to right, resolving a fact when the evaluation reaches
+    it: a `+` stops at its first false operand and a `|` at its first true
+    one, and the rules of a fact stop at the first one that holds, so the
+    facts behind an operand or a rule that is never read are never
+    expanded. A fact of a cyclic component is still solved with its whole
+    component, which has to be iterated to a fixpoint, and a fact whose
+    component is not branching in the Schedule (no rule below it can stop
+    early) is solved like the BackwardEngine does, without generators.
+
+    Goals are generators yielding the facts they need, driven from an
+    explicit stack, so deep chains of rules do not hit the recursion
+    limit. Only a fact some rule concludes is yielded: the others are
+    final as given. With `count`, or when the solver logs at INFO, solve
+    fills `expanded` with the facts whose rules were tried and sets
+    `avoided` to how many more the BackwardEngine would have tried (see
+    eager_expansions); that takes a walk of the Schedule, so it is not
+    counted otherwise.
+    """
+
+    def __init__(self, kb, facts: dict, count=False):
+        super().__init__(kb, facts)
+        self.expanded = set()
+        self.avoided = 0
+        self.count = count
+
+    def solve(self, queries) -> dict:
+        count = self.count or logger.isEnabledFor(logging.INFO)
+        if count:
+            eager = self.eager_expansions(queries)
+            unset = {fact for fact, value in self.facts.items()
+                     if value is False}
+        values = super().solve(queries)
+        if count:
+            rules_index = self.kb.rules_index
+            self.expanded.update(
+                fact for fact, goal in self.goals.items()
+                if goal == GoalStatesEnum.RESOLVED and fact in unset and
+                fact in rules_index)
+            self.avoided = eager - len(self.expanded)
+            logger.info("Lazy solve: %d goals expanded, %d expansions "
+                        "avoided.", len(self.expanded), self.avoided)
+        return values
+
+    def eager_expansions(self, queries) -> int:
+        """
+        Number of facts the BackwardEngine would solve for `queries`: the
+        facts of the components it plans that are false and concluded by a
+        rule, whose rules it tries.
+        """
+        planned = set()
+        members = self.schedule.members
+        rules_index = self.kb.rules_index
+        facts = self.facts
+        count = 0
+        for query in queries:
+            if facts.get(query) is not False:
+                continue
+            for component in self.schedule.plan(query, planned):
+                count += sum(facts[fact] is False and fact in rules_index
+                             for fact in members[component])
+        return count
+
+    def resolve_goal(self, fact):
+        """
+        Return the value of `fact`, expanding the goals it needs as their
+        values are read.
+        """
+        goal = self.goal(fact)
+        if goal is None:
+            return self.facts.get(fact)
+        stack = [(fact, goal)]
+        value = None
+        while stack:
+            current, goal = stack[-1]
+            try:
+                needed = goal.send(value)
+            except StopIteration:
+                stack.pop()
+                self.goals[current] = GoalStatesEnum.RESOLVED
+                self.planned.add(self.schedule.component[current])
+                value = self.facts[current]
+                continue
+            subgoal = self.goal(needed)
+            if subgoal is None:
+                value = self.facts[needed]
+            else:
+                stack.append((needed, subgoal))
+                value = None
+        return self.facts[fact]
+
+    def goal(self, fact):
+        """
+        Generator solving `fact`, or None when its value is already final:
+        given, resolved, or solved right away with its cyclic component.
+        """
+        if (self.facts.get(fact) is not False or
+                fact not in self.kb.rules_index):
+            return None
+        goal = self.goals.get(fact)
+        if goal == GoalStatesEnum.RESOLVED:
+            return None
+        component = self.schedule.component[fact]
+        if (goal is not None or component in self.schedule.cyclic or
+                not self.schedule.branching[component]):
+            # planned by (or to be solved with) the scheduled solve, which
+            # is as lazy where no rule below can stop early
+            super().resolve_goal(fact)
+            return None
+        self.goals[fact] = GoalStatesEnum.EXPANDED
+        return self.solve_lazily(fact)
+
+    def solve_lazily(self, fact):
+        """
+        Try the rules concluding `fact` in order, until one holds.
+        """
+        trace = logger.isEnabledFor(logging.DEBUG)
+        rules_index = self.kb.rules_index
+        for rule in rules_index.get(fact, ()):
+            if trace:
+                text = self.describe(rule)
+                logger.debug("solving condition: %s", text)
+            condition = rule.get_compiled_condition()
+            if condition.type == NodeTypes.FACT:
+                # a rule of one fact, as in a chain: no operator to walk
+                value = self.facts.get(condition.value)
+                if (value is False and condition.value in rules_index and
+                        self.goals.get(condition.value) !=
+                        GoalStatesEnum.RESOLVED):
+                    value = yield condition.value
+            else:
+                value = yield from self.condition(condition, self.facts,
+                                                  self.goals, rules_index)
+            if value is True:
+                self.facts[fact] = (self.determine_link(fact, rule) ==
+                                    ChildLinkTypes.DEFAULT)
+                self.derivations[fact] = rule
+                if trace:
+                    logger.debug("Fact %s set to %s based on condition %s.",
+                                 self.kb.symbols.name(fact), self.facts[fact],
+                                 text)
+                return
+
+    @staticmethod
+    def condition(expression, facts, goals, rules_index):
+        """
+        Evaluate `expression` from left to right, yielding each fact it
+        reads that is false, concluded by a rule of `rules_index` and not
+        resolved in `goals` yet, and skipping the right operand of a `+`
+        whose left one is false and of a `|` whose left one is true.
+        """
+        FACT = NodeTypes.FACT
+        NOT = OperatorsEnum.NOT.value
+        AND = OperatorsEnum.AND.value
+        OR = OperatorsEnum.OR.value
+        stack = [(expression, 0, None)]  # node, operands read, left value
+        value = None
+        while stack:
+            node, stage, left = stack.pop()
+            if node.type == FACT:
+                value = facts.get(node.value)
+                if (value is False and node.value in rules_index and
+                        goals.get(node.value) != GoalStatesEnum.RESOLVED):
+                    value = yield node.value
+                continue
+            operator = node.value
+            if stage == 0:
+                stack.append((node, 1, None))
+                stack.append((node.left, 0, None))
+            elif operator == NOT:
+                value = None if value is None else not value
+            elif stage == 1:
+                if (operator == AND and value is False or
+                        operator == OR and value is True):
+                    continue  # the right operand cannot change the value
+                stack.append((node, 2, value))
+                stack.append((node.right, 0, None))
+            elif operator == AND:
+                if value is not False:
+                    value = None if None in (left, value) else True
+            elif operator == OR:
+                if value is not True:
+                    value = None if None in (left, value) else False
+            else:
+                value = None if None in (left, value) else left != value
+        return value
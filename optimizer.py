@@ -0,0 +1,356 @@
+import logging
+from collections import deque
+
+from Node import NodeTypes
+from enums import OperatorsEnum
+
+logger = logging.getLogger("expert_system.solver")
+
+
+class Optimizer:
+    """
+    Partial evaluation of the rules of a knowledge base for one set of
+    facts, run between loading and solving.
+
+    Two kinds of facts are constant while a query is solved: the facts
+    given true, which no rule changes, and the facts no rule can make true,
+    which stay false. The optimizer folds these constants into the
+    conditions and simplifies them by boolean algebra (`A + A`, `A | !A`,
+    `!!A`, `A + (A | B)`, `A ^ A`...). It drops a rule whose condition
+    folds to false, which may leave more facts that no rule can make true,
+    and a rule that only concludes facts given true. Then it drops the
+    rules that repeat an earlier rule, the rules whose conclusion is part
+    of their own condition (`A + B => A`), and a rule whose condition
+    implies the condition of an earlier rule with the same conclusion (the
+    earlier one fires whenever it would). It repeats this until nothing
+    changes.
+
+    The remaining rules keep their order, and the answers of the engines
+    that use the rules with a definite conclusion do not change for these
+    facts. A knowledge base with a cycle through a negation (unstratified
+    in its Schedule) keeps all its rules as they are: the answers of such
+    a cycle depend on the order its facts are solved in, which dropping
+    any rule, even outside the cycle, may change. The sat engine keeps the
+    rules as they are: its rules with a `|` or `^` in their conclusion may
+    make true the facts taken here to stay false.
+    """
+
+    window = 64  # earlier rules of a conclusion a rule is compared with
+
+    def __init__(self, kb, facts: dict):
+        self.kb = kb
+        self.table = kb.expressions
+        self.facts = facts  # fact id -> value the rules are specialized to
+        self.true = {fact for fact, value in facts.items() if value is True}
+        self.false = set()  # facts that no rule can make true
+        self.memo = {}  # expression id -> simplified, for self.false
+        self.always = None  # condition rebuilt for a condition folded to true
+        self.folded = 0
+        self.dead = 0
+        self.duplicates = 0
+        self.subsumed = 0
+
+    def optimize(self) -> list:
+        """
+        Return the optimized rules: the rules of the knowledge base that
+        were not dropped, where a rule whose condition was simplified is
+        replaced by a new rule.
+        """
+        rules = self.kb.rules
+        if self.kb.schedule().unstratified:
+            logger.info("Optimizer: %d rules kept as they are, a cycle goes "
+                        "through a negation.", len(rules))
+            return list(rules)
+        self.conditions = [rule.get_compiled_condition() for rule in rules]
+        self.alive = [True] * len(rules)
+        self.support = {}  # fact -> rules alive that may make it true
+        self.readers = {}  # fact -> indexes of the rules reading it
+        for index, rule in enumerate(rules):
+            for fact in rule.get_concluded_facts():
+                if (fact, True) in rule.get_conclusion_literals():
+                    self.support[fact] = self.support.get(fact, 0) + 1
+            for fact in rule.get_condition_facts():
+                self.readers.setdefault(fact, []).append(index)
+        self.false = {fact for fact, value in self.facts.items()
+                      if value is False and fact not in self.support}
+        pending = deque(range(len(rules)))
+        while pending:
+            self.fold(pending)
+            self.drop_redundant(pending)
+        optimized = [self.rebuild(index) for index in range(len(rules))
+                     if self.alive[index]]
+        logger.info("Optimized %d rules into %d: %d conditions simplified, "
+                    "%d rules that cannot change a fact, %d duplicates and "
+                    "%d subsumed rules dropped.", len(rules), len(optimized),
+                    self.folded, self.dead, self.duplicates, self.subsumed)
+        return optimized
+
+    def fold(self, pending):
+        """
+        Simplify the conditions of the `pending` rules, dropping those
+        that can never change a fact, until no fact becomes constant.
+        """
+        queued = set(pending)
+        while pending:
+            index = pending.popleft()
+            queued.discard(index)
+            if not self.alive[index]:
+                continue
+            condition = self.simplify(self.conditions[index])
+            self.conditions[index] = condition
+            rule = self.kb.rules[index]
+            if condition is False or all(
+                    positive and fact in self.true
+                    for fact, positive in rule.get_conclusion_literals()):
+                self.dead += 1
+                for reader in self.drop(index):
+                    if reader not in queued:
+                        queued.add(reader)
+                        pending.append(reader)
+
+    def drop(self, index) -> list[int]:
+        """
+        Drop a rule, and return the rules reading the facts it leaves that
+        no rule can make true any more.
+        """
+        self.alive[index] = False
+        readers = []
+        rule = self.kb.rules[index]
+        for fact in rule.get_concluded_facts():
+            if (fact, True) not in rule.get_conclusion_literals():
+                continue
+            self.support[fact] -= 1
+            if self.support[fact] == 0 and self.facts.get(fact) is False:
+                self.false.add(fact)
+                self.memo.clear()
+                readers.extend(self.readers.get(fact, ()))
+        return readers
+
+    def drop_redundant(self, pending):
+        """
+        Drop the duplicate, self-supporting and subsumed rules, queueing in
+        `pending` the rules their removal affects.
+        """
+        seen = set()  # (condition, conclusion) of the rules kept
+        earlier = {}  # conclusion id -> indexes of the rules kept
+        for index, rule in enumerate(self.kb.rules):
+            if not self.alive[index]:
+                continue
+            condition = self.conditions[index]
+            conclusion = rule.get_compiled_conclusion().id
+            key = (condition, conclusion)
+            if key in seen:
+                self.duplicates += 1
+            elif self.supports_itself(rule, condition):
+                self.dead += 1
+            elif any(self.implies(condition, self.conditions[other])
+                     for other in earlier.get(conclusion, ())[-self.window:]):
+                self.subsumed += 1
+            else:
+                seen.add(key)
+                earlier.setdefault(conclusion, []).append(index)
+                continue
+            pending.extend(self.drop(index))
+
+    def supports_itself(self, rule, condition) -> bool:
+        """
+        Whether `condition` only holds when the facts `rule` makes true
+        already are, like in `A + B => A`.
+        """
+        if condition is True:
+            return False
+        conjunction = self.literals(condition, OperatorsEnum.AND.value)
+        return conjunction is not None and all(
+            positive and (fact, True) in conjunction
+            for fact, positive in rule.get_conclusion_literals())
+
+    def implies(self, condition, other) -> bool:
+        """
+        Whether `condition` implies `other`, when both are chains of
+        literals (a literal alone being both a conjunction and a
+        disjunction).
+        """
+        if other is True:
+            return True
+        if condition is True:
+            return False
+        conjunction = self.literals(condition, OperatorsEnum.AND.value)
+        other_conjunction = self.literals(other, OperatorsEnum.AND.value)
+        if (conjunction is not None and other_conjunction is not None and
+                other_conjunction <= conjunction):
+            return True
+        other_disjunction = self.literals(other, OperatorsEnum.OR.value)
+        if other_disjunction is None:
+            return False
+        if conjunction is not None:
+            return not conjunction.isdisjoint(other_disjunction)
+        disjunction = self.literals(condition, OperatorsEnum.OR.value)
+        return disjunction is not None and disjunction <= other_disjunction
+
+    @staticmethod
+    def literals(expression, operator) -> frozenset | None:
+        """
+        The (fact, positive) literals of `expression` when it is a chain of
+        `operator` over literals, None otherwise.
+        """
+        literals = set()
+        pending = [expression]
+        while pending:
+            expression = pending.pop()
+            if expression.type == NodeTypes.FACT:
+                literals.add((expression.value, True))
+            elif expression.value == OperatorsEnum.NOT.value:
+                if expression.left.type != NodeTypes.FACT:
+                    return None
+                literals.add((expression.left.value, False))
+            elif expression.value == operator:
+                pending.append(expression.left)
+                pending.append(expression.right)
+            else:
+                return None
+        return frozenset(literals)
+
+    def simplify(self, expression):
+        """
+        `expression` with the constant facts folded in and simplified:
+        True, False or an Expression of the same table.
+        """
+        if expression is True or expression is False:
+            return expression
+        simplified = self.memo.get(expression.id)
+        if simplified is None:
+            simplified = self._simplify(expression)
+            self.memo[expression.id] = simplified
+        return simplified
+
+    def _simplify(self, expression):
+        if expression.type == NodeTypes.FACT:
+            if expression.value in self.true:
+                return True
+            if expression.value in self.false:
+                return False
+            return expression
+        operator = expression.value
+        if operator == OperatorsEnum.NOT.value:
+            return self.negate(self.simplify(expression.left))
+        if operator == OperatorsEnum.XOR.value:
+            left = self.simplify(expression.left)
+            right = self.simplify(expression.right)
+            if isinstance(left, bool):
+                left, right = right, left
+            if isinstance(right, bool):
+                if isinstance(left, bool):
+                    return left != right
+                return self.negate(left) if right else left
+            if left is right:
+                return False
+            if (left is self.complement(right) or
+                    right is self.complement(left)):
+                return True
+            return self.table.make(NodeTypes.OPERATOR, operator, left, right)
+        # `+` and `|`: a flat list of operands without the identity
+        absorbing = operator == OperatorsEnum.OR.value
+        identity = not absorbing
+        operands = []
+        ids = set()
+        for operand in self.operands(expression, operator):
+            operand = self.simplify(operand)
+            if operand is absorbing:
+                return absorbing
+            if operand is identity:
+                continue
+            for part in self.operands(operand, operator):
+                if part.id not in ids:
+                    ids.add(part.id)
+                    operands.append(part)
+        if any(operand.type == NodeTypes.OPERATOR and
+               operand.value == OperatorsEnum.NOT.value and
+               operand.left.id in ids for operand in operands):
+            return absorbing  # `A + !A`, `A | !A`
+        dual = (OperatorsEnum.AND.value if absorbing
+                else OperatorsEnum.OR.value)
+        # absorption: `A + (A | B)` is `A`, `A | (A + B)` is `A`
+        operands = [operand for operand in operands
+                    if not (operand.type == NodeTypes.OPERATOR and
+                            operand.value == dual and
+                            any(part.id in ids for part
+                                in self.operands(operand, dual)))]
+        if not operands:
+            return identity
+        simplified = operands[0]
+        for operand in operands[1:]:
+            simplified = self.table.make(NodeTypes.OPERATOR, operator,
+                                         simplified, operand)
+        return simplified
+
+    @staticmethod
+    def operands(expression, operator) -> list:
+        """
+        Operands of a chain of `operator`, from left to right.
+        """
+        operands = []
+        pending = [expression]
+        while pending:
+            expression = pending.pop()
+            if (expression.type == NodeTypes.OPERATOR and
+                    expression.value == operator):
+                pending.append(expression.right)
+                pending.append(expression.left)
+            else:
+                operands.append(expression)
+        return operands
+
+    def negate(self, expression):
+        if isinstance(expression, bool):
+            return not expression
+        complement = self.complement(expression)
+        if complement is not None:
+            return complement
+        return self.table.make(NodeTypes.OPERATOR, OperatorsEnum.NOT.value,
+                               expression)
+
+    @staticmethod
+    def complement(expression):
+        """
+        The operand of a `!`, None for another expression.
+        """
+        if (expression.type == NodeTypes.OPERATOR and
+                expression.value == OperatorsEnum.NOT.value):
+            return expression.left
+        return None
+
+    def rebuild(self, index):
+        """
+        The rule at `index`, parsed again with its simplified condition
+        when it changed.
+        """
+        rule = self.kb.rules[index]
+        condition = self.conditions[index]
+        if condition is rule.get_compiled_condition():
+            return rule
+        self.folded += 1
+        if condition is True:
+            condition = self.witness(rule)
+        text = condition.to_string(self.kb.symbols)
+        return self.kb.parser.parse(f"{text} => {rule.get_conclusions()}")[0]
+
+    def witness(self, rule):
+        """
+        A condition that always holds for these facts, for a rule whose
+        condition folded to true: a fact given true, or the negation of a
+        fact that stays false, that no rule concludes (reading a concluded
+        fact could close a cycle), or else its own condition.
+        """
+        if self.always is None:
+            concluded = {fact for other in self.kb.rules
+                         for fact in other.get_concluded_facts()}
+            given = [fact for fact in self.true if fact not in concluded]
+            unset = [fact for fact in self.false if fact not in concluded]
+            if given:
+                self.always = self.table.make(NodeTypes.FACT, min(given))
+            elif unset:
+                self.always = self.negate(
+                    self.table.make(NodeTypes.FACT, min(unset)))
+            else:
+                self.always = False
+        return self.always or rule.get_compiled_condition()
@@ -0,0 +1,114 @@
+import json
+
+
+class Proof:
+    """
+    Explanation of the values of a solve, rebuilt on demand from its
+    backpointers.
+
+    While solving, an engine only records, for each fact a rule set, that
+    rule in its `derivations` (fact id -> Rule); the facts it used are the
+    condition facts of the rule. A Proof turns these records into a tree
+    per query: a derived fact has the rule that set it and the proofs of
+    the facts its condition read, a given fact and a fact no rule set are
+    leaves. A fact is only explained once per proof, so a proof stays the
+    size of the derivation graph behind it.
+    """
+
+    def __init__(self, kb, facts: dict, derivations: dict, given):
+        self.kb = kb
+        self.facts = facts  # fact id -> value at the end of the solve
+        self.derivations = derivations
+        self.given = given  # ids of the facts true before the solve
+        self.rule_ids = {}
+
+    def rule_id(self, rule) -> int:
+        """
+        Position of `rule` in the rules of the knowledge base.
+        """
+        if not self.rule_ids:
+            self.rule_ids = {id(rule): index
+                             for index, rule in enumerate(self.kb.rules)}
+        return self.rule_ids[id(rule)]
+
+    def describe_rule(self, rule) -> str:
+        symbols = self.kb.symbols
+        return (f"{rule.get_compiled_condition().to_string(symbols)} => "
+                f"{rule.get_compiled_conclusion().to_string(symbols)}")
+
+    def steps(self, fact) -> list[dict]:
+        """
+        Proof tree of `fact` (an id), flattened in depth-first order so
+        that deep derivations need no nesting. Each step is a dict with the
+        "fact" and its "value", and either "given": true, or the "rule"
+        (id and text) that set it with the "premises" (names) it read,
+        which the following steps explain. A fact no rule set has neither.
+        """
+        symbols = self.kb.symbols
+        steps = []
+        seen = set()
+        stack = [fact]
+        while stack:
+            fact = stack.pop()
+            if fact in seen:
+                continue
+            seen.add(fact)
+            step = {"fact": symbols.name(fact),
+                    "value": self.facts.get(fact, False)}
+            steps.append(step)
+            rule = self.derivations.get(fact)
+            if fact in self.given:
+                step["given"] = True
+            elif rule is not None:
+                premises = rule.get_condition_facts()
+                step["rule"] = {"id": self.rule_id(rule),
+                                "text": self.describe_rule(rule)}
+                step["premises"] = [symbols.name(premise)
+                                    for premise in premises]
+                stack.extend(reversed(premises))
+        return steps
+
+    def to_json(self, queries) -> str:
+        """
+        One JSON object mapping each query (an id) to its proof steps.
+        """
+        return json.dumps({self.kb.symbols.name(query): self.steps(query)
+                           for query in queries}, indent=2) + "\n"
+
+    def to_dot(self, queries) -> str:
+        """
+        Graphviz digraph of the derivations behind `queries` (ids): an
+        ellipse per fact, doubled for the given ones, and a box per rule
+        that fired, with edges from the facts a rule read to the rule and
+        from the rule to the fact it set.
+        """
+        symbols = self.kb.symbols
+        lines = ["digraph proof {", "  rankdir=BT;"]
+        seen = set()
+        stack = list(reversed(queries))
+        while stack:
+            fact = stack.pop()
+            if fact in seen:
+                continue
+            seen.add(fact)
+            name = symbols.name(fact)
+            value = self.facts.get(fact, False)
+            shape = "doublecircle" if fact in self.given else "ellipse"
+            lines.append(f"  {json.dumps(name)} [label="
+                         f"{json.dumps(f'{name} = {value}')}, "
+                         f"shape={shape}];")
+            rule = self.derivations.get(fact)
+            if rule is None or fact in self.given:
+                continue
+            node = json.dumps(f"{name} <- rule {self.rule_id(rule)}")
+            lines.append(f"  {node} [label="
+                         f"{json.dumps(self.describe_rule(rule))}, "
+                         f"shape=box];")
+            lines.append(f"  {node} -> {json.dumps(name)};")
+            premises = rule.get_condition_facts()
+            for premise in premises:
+                lines.append(f"  {json.dumps(symbols.name(premise))} -> "
+                             f"{node};")
+            stack.extend(reversed(premises))
+        lines.append("}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,82 @@
+import logging
+import os
+import re
+
+logger = logging.getLogger("expert_system.parser")
+
+
+class InputReader:
+    """
+    Streams the lines of an input file, reading it in fixed-size chunks so
+    memory does not grow with the size of the file, and follows include
+    directives:
+
+        #include common/rules.txt
+
+    An include path is relative to the file containing the directive. Older
+    versions read the directive as a comment. Every line is yielded as
+    (source, line number, line), so errors can be reported where they are
+    and the load can go on.
+    """
+
+    # `#include` and a path after whitespace: `#includes` is a comment
+    include_directive = re.compile(r"#include\s+(\S.*)")
+
+    def __init__(self, chunk_size=1 << 16):
+        self.chunk_size = chunk_size
+        self.stack = []  # absolute paths of the files being read
+        self.included = []  # every file read, in order
+
+    @staticmethod
+    def chunks(input, size):
+        while True:
+            chunk = input.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+    @staticmethod
+    def split_lines(chunks):
+        rest = ""
+        for chunk in chunks:
+            lines = (rest + chunk).split("\n")
+            rest = lines.pop()
+            yield from lines
+        if rest:
+            yield rest
+
+    def read_file(self, path):
+        """
+        Yield the lines of the file `path` and of the files it includes.
+        """
+        path = os.path.abspath(path)
+        if path in self.stack:
+            raise ValueError(f"{path} includes itself")
+        self.stack.append(path)
+        self.included.append(path)
+        try:
+            with open(path, "r") as input:
+                yield from self.read_lines(
+                    self.split_lines(self.chunks(input, self.chunk_size)),
+                    path)
+        finally:
+            self.stack.pop()
+
+    def read_lines(self, lines, source="<input>"):
+        """
+        Yield the lines of `lines`, an iterable of lines read from `source`,
+        replacing include directives by the lines of the included file.
+        """
+        directory = (os.path.dirname(source) if self.stack
+                     else os.getcwd())
+        for number, line in enumerate(lines, 1):
+            directive = self.include_directive.match(line)
+            if directive is None:
+                yield source, number, line
+                continue
+            path = directive.group(1).strip()
+            try:
+                yield from self.read_file(os.path.join(directory, path))
+            except (OSError, ValueError) as e:
+                logger.warning("Cannot include %s in line %d of %s: %s. "
+                               "Line skipped.", path, number, source, e)
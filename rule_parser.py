@@ -0,0 +1,194 @@
+import re
+from array import array
+
+from Node import NodeTypes
+from Rule import Rule
+from bytecode import Bytecode
+from enums import RelationEnum
+
+
+class RuleSyntaxError(ValueError):
+    """
+    A rule line that does not follow the grammar, with the 1-based column
+    at which the parser stopped.
+    """
+
+    def __init__(self, message, column):
+        super().__init__(f"{message} at column {column}")
+        self.column = column
+
+
+class RuleParser:
+    """
+    Reads a rule line in one left-to-right pass: a regular expression
+    scanner yields the tokens one at a time, and an operator precedence
+    parser validates each token as it comes while building, for each side
+    of the rule, its packed token codes (see Rule), its hash-consed
+    Expression and its Bytecode.
+    The grammar is
+
+        rule      := side ("=>" | "<=>") side
+        side      := operand (binary operand)*
+        operand   := name | "!" operand | "(" side ")"
+        name      := letter (letter | digit | "_")*
+
+    The parser is precedence climbing made iterative: pending operators
+    wait on a stack and are applied as soon as an operator of lower or
+    equal precedence (or a `)`) follows, so nesting depth is not limited by
+    the recursion limit and every token costs the same. Binary operators
+    all have the same precedence and associate to the left, like the
+    former token compiler; the precedence table only has to change to
+    give them different levels.
+    """
+
+    token_pattern = re.compile(
+        r" *(?:(?P<name>[A-Za-z][A-Za-z0-9_]*)|(?P<relation><=>|=>)"
+        r"|(?P<symbol>[!+|^()])|(?P<other>\S))")
+    precedence = {"+": 1, "|": 1, "^": 1}
+    symbol_tokens = {char: token.value
+                     for char, token in Rule.symbol_tokens.items()}
+
+    def __init__(self, table):
+        self.table = table  # the ExpressionTable the rules compile into
+
+    def parse(self, line) -> list[Rule]:
+        """
+        Return the rules of `line`: one for `=>`, and one per direction for
+        `<=>`. Raise RuleSyntaxError when the line is not a valid rule.
+        """
+        matches = self.token_pattern.finditer(line)
+        condition, relation = self.parse_side(matches, line)
+        if relation is None:
+            raise RuleSyntaxError(
+                "Expected an operator, `=>` or `<=>`, found the end of the "
+                "line", len(line.rstrip()) + 1)
+        conclusion, end = self.parse_side(matches, line)
+        if end is not None:
+            self.fail("Expected an operator", end)
+        conditions = line[:relation.start("relation")].strip()
+        conclusions = line[relation.end():].strip()
+        # the text of the relation is shared by all the rules
+        relation = RelationEnum(relation.group("relation")).value
+        rules = [self.make_rule(conditions, conclusions, relation,
+                                condition, conclusion)]
+        if relation == RelationEnum.BICONDITIONAL.value:
+            rules.append(self.make_rule(conclusions, conditions, relation,
+                                        conclusion, condition))
+        return rules
+
+    @staticmethod
+    def make_rule(conditions, conclusions, relation, condition, conclusion):
+        tokens, expression, code = condition
+        conclusion_tokens, conclusion_expression, _ = conclusion
+        return Rule.restore(conditions, conclusions, relation,
+                            tokens + conclusion_tokens, len(tokens),
+                            expression, conclusion_expression, code)
+
+    @staticmethod
+    def fail(message, match):
+        kind = match.lastgroup
+        raise RuleSyntaxError(f"{message}, found `{match.group(kind)}`",
+                              match.start(kind) + 1)
+
+    def parse_side(self, matches, line):
+        """
+        Read one side of the rule from the token `matches` and return its
+        (token codes, Expression, Bytecode) with the match of the relation
+        that ends it, None at the end of the line.
+        """
+        make = self.table.make
+        intern = self.table.symbols.intern
+        precedence = self.precedence
+        symbol_tokens = self.symbol_tokens
+        opcodes = Bytecode.opcodes
+        operator_type = NodeTypes.OPERATOR
+        fact_type = NodeTypes.FACT
+        letter = Rule.LETTER
+        tokens = array("i")
+        code = array("i")
+        values = []  # Expressions of the operands read so far
+        pending = []  # operators waiting for their right operand, and `(`
+        opened = []  # matches of the open parentheses
+        operand = True  # whether an operand is expected next
+        end = None
+        for match in matches:
+            kind = match.lastgroup
+            text = match.group(kind)
+            if kind == "other":
+                raise RuleSyntaxError(f"Unexpected character `{text}`",
+                                      match.start(kind) + 1)
+            if operand:
+                if kind == "name":
+                    fact = intern(text)
+                    tokens.append(fact * 8 + letter)
+                    code.append(fact)
+                    value = make(fact_type, fact)
+                    # an operand completes the `!` in front of it
+                    while pending and pending[-1] == "!":
+                        pending.pop()
+                        code.append(Bytecode.NOT)
+                        value = make(operator_type, "!", value)
+                    values.append(value)
+                    operand = False
+                elif text == "!" or text == "(":
+                    tokens.append(symbol_tokens[text])
+                    pending.append(text)
+                    if text == "(":
+                        opened.append(match)
+                else:
+                    self.fail("Expected a fact name, `!` or `(`", match)
+                continue
+            if kind == "relation":
+                end = match
+                break
+            level = precedence.get(text)
+            if level is not None:
+                while pending and precedence.get(pending[-1], 0) >= level:
+                    right = values.pop()
+                    operator = pending.pop()
+                    code.append(opcodes[operator])
+                    values[-1] = make(operator_type, operator,
+                                      values[-1], right)
+                tokens.append(symbol_tokens[text])
+                pending.append(text)
+                operand = True
+            elif text == ")":
+                if not opened:
+                    self.fail("Expected an operator", match)
+                while pending[-1] != "(":
+                    right = values.pop()
+                    operator = pending.pop()
+                    code.append(opcodes[operator])
+                    values[-1] = make(operator_type, operator,
+                                      values[-1], right)
+                pending.pop()
+                opened.pop()
+                tokens.append(symbol_tokens[text])
+                value = values[-1]
+                while pending and pending[-1] == "!":
+                    pending.pop()
+                    code.append(Bytecode.NOT)
+                    value = make(operator_type, "!", value)
+                values[-1] = value
+            else:
+                self.fail("Expected an operator", match)
+        if operand:
+            if end is not None:
+                self.fail("Expected a fact name, `!` or `(`", end)
+            raise RuleSyntaxError("Expected a fact name, `!` or `(`, found "
+                                  "the end of the line",
+                                  len(line.rstrip()) + 1)
+        if opened:
+            column = opened[-1].start("symbol") + 1
+            if end is not None:
+                self.fail(f"Expected `)` to close the `(` of column {column}",
+                          end)
+            raise RuleSyntaxError(
+                f"Expected `)` to close the `(` of column {column}, found "
+                "the end of the line", len(line.rstrip()) + 1)
+        while pending:
+            right = values.pop()
+            operator = pending.pop()
+            code.append(opcodes[operator])
+            values[-1] = make(operator_type, operator, values[-1], right)
+        return (tokens, values[0], code), end
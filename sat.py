@@ -0,0 +1,660 @@
+import heapq
+import logging
+import threading
+
+from Node import NodeTypes
+from enums import OperatorsEnum
+
+logger = logging.getLogger("expert_system.solver")
+
+
+class ContradictionError(ValueError):
+    """
+    The rules and the initial facts have no model at all.
+    """
+
+
+class SatSolver:
+    """
+    Conflict-driven clause learning over clauses in conjunctive normal
+    form. Variables are numbered from 0, and the literals of variable `v`
+    are `2 * v` (v is true) and `2 * v + 1` (v is false), so `literal ^ 1`
+    is the negation of `literal`.
+
+    Each clause watches two of its literals and is only visited when one of
+    them becomes false, so unit propagation costs nothing for the clauses
+    that are not about to become unit. A conflict is analysed back to its
+    first unique implication point, the learned clause is kept and the
+    search jumps back to the level where that clause becomes unit.
+    Decisions follow the variable activities (bumped for the variables of
+    each conflict) with the last value of each variable, and the search
+    restarts on the Luby sequence.
+
+    solve takes assumptions, tried as the first decisions: learned clauses
+    only depend on the clauses, so they stay valid from one call to the
+    next and the same solver answers many questions on one formula.
+    """
+
+    restart_base = 100  # conflicts in the first restart interval
+    decay = 0.95
+
+    def __init__(self, variables=0):
+        self.values = []  # literal -> True, False or None
+        self.level = []  # variable -> decision level of its value
+        self.reason = []  # variable -> clause that implied it, or None
+        self.activity = []
+        self.phase = []  # variable -> last value
+        self.seen = []
+        self.watches = []  # literal -> clauses watching it
+        self.clauses = 0
+        self.learned = 0
+        self.trail = []  # assigned literals, in order
+        self.limits = []  # trail length at the start of each level
+        self.head = 0  # next trail literal to propagate
+        self.increment = 1.0
+        self.heap = []  # (-activity, variable), with stale entries
+        self.ok = True
+        self.conflicts = 0
+        self.decisions = 0
+        for _ in range(variables):
+            self.new_variable()
+
+    def __len__(self):
+        return len(self.level)
+
+    def new_variable(self) -> int:
+        variable = len(self.level)
+        self.values += (None, None)
+        self.watches += ([], [])
+        self.level.append(0)
+        self.reason.append(None)
+        self.activity.append(0.0)
+        self.phase.append(False)
+        self.seen.append(False)
+        heapq.heappush(self.heap, (0.0, variable))
+        return variable
+
+    def value(self, variable):
+        return self.values[2 * variable]
+
+    def add_clause(self, literals) -> bool:
+        """
+        Add a clause, given as an iterable of literals. Return False once
+        the clauses are unsatisfiable.
+        """
+        if not self.ok:
+            return False
+        self.backtrack(0)
+        clause = []
+        for literal in literals:
+            value = self.values[literal]
+            if value is True or literal ^ 1 in clause:
+                return True  # satisfied (at level 0) or a tautology
+            if value is None and literal not in clause:
+                clause.append(literal)
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.watches[clause[0]].append(clause)
+            self.watches[clause[1]].append(clause)
+            self.clauses += 1
+        return self.ok
+
+    def assign(self, literal, reason):
+        self.values[literal] = True
+        self.values[literal ^ 1] = False
+        variable = literal >> 1
+        self.level[variable] = len(self.limits)
+        self.reason[variable] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Propagate the assignments of the trail through the watched
+        literals. Return a conflicting clause, or None.
+        """
+        values = self.values
+        watches = self.watches
+        trail = self.trail
+        while self.head < len(trail):
+            false = trail[self.head] ^ 1
+            self.head += 1
+            watchers = watches[false]
+            kept = 0
+            index = 0
+            count = len(watchers)
+            while index < count:
+                clause = watchers[index]
+                index += 1
+                # the false literal goes second, the other watch first
+                if clause[0] == false:
+                    clause[0] = clause[1]
+                    clause[1] = false
+                first = clause[0]
+                if values[first] is True:
+                    watchers[kept] = clause
+                    kept += 1
+                    continue
+                for position in range(2, len(clause)):
+                    literal = clause[position]
+                    if values[literal] is not False:
+                        clause[1] = literal
+                        clause[position] = false
+                        watches[literal].append(clause)
+                        break
+                else:
+                    watchers[kept] = clause
+                    kept += 1
+                    if values[first] is False:
+                        while index < count:
+                            watchers[kept] = watchers[index]
+                            kept += 1
+                            index += 1
+                        del watchers[kept:]
+                        self.head = len(trail)
+                        return clause
+                    self.assign(first, clause)
+            del watchers[kept:]
+        return None
+
+    def analyze(self, conflict):
+        """
+        Return the first-UIP clause learned from `conflict`, its asserting
+        literal first and a literal of the highest remaining level second,
+        with the level to jump back to.
+        """
+        seen = self.seen
+        level = self.level
+        trail = self.trail
+        current = len(self.limits)
+        learned = [0]
+        pending = 0  # literals of the current level still to resolve
+        index = len(trail) - 1
+        clause = conflict
+        start = 0
+        while True:
+            for position in range(start, len(clause)):
+                literal = clause[position]
+                variable = literal >> 1
+                if seen[variable] or level[variable] == 0:
+                    continue
+                seen[variable] = True
+                self.bump(variable)
+                if level[variable] == current:
+                    pending += 1
+                else:
+                    learned.append(literal)
+            while not seen[trail[index] >> 1]:
+                index -= 1
+            literal = trail[index]
+            index -= 1
+            variable = literal >> 1
+            seen[variable] = False
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.reason[variable]
+            start = 1  # the first literal of a reason is the implied one
+        learned[0] = literal ^ 1
+        back = 0
+        for position in range(1, len(learned)):
+            variable = learned[position] >> 1
+            seen[variable] = False
+            if level[variable] > back:
+                back = level[variable]
+                learned[1], learned[position] = (learned[position],
+                                                 learned[1])
+        return learned, back
+
+    def bump(self, variable):
+        activity = self.activity[variable] + self.increment
+        self.activity[variable] = activity
+        if activity > 1e100:
+            self.activity = [value * 1e-100 for value in self.activity]
+            self.increment *= 1e-100
+            self.heap = [(-self.activity[variable], variable)
+                         for variable in range(len(self.level))
+                         if self.values[2 * variable] is None]
+            heapq.heapify(self.heap)
+        else:
+            heapq.heappush(self.heap, (-activity, variable))
+
+    def backtrack(self, level):
+        if len(self.limits) <= level:
+            return
+        start = self.limits[level]
+        values = self.values
+        for literal in self.trail[start:]:
+            variable = literal >> 1
+            self.phase[variable] = not literal & 1
+            values[literal] = None
+            values[literal ^ 1] = None
+            self.reason[variable] = None
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+        del self.trail[start:]
+        del self.limits[level:]
+        self.head = start
+
+    def decide(self):
+        """
+        Unassigned variable of highest activity, None when all are set.
+        """
+        heap = self.heap
+        values = self.values
+        while heap:
+            _, variable = heapq.heappop(heap)
+            if values[2 * variable] is None:
+                return variable
+        return None
+
+    @staticmethod
+    def luby(index):
+        """
+        The `index`-th term (from 0) of 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, ...
+        """
+        size = 1
+        sequence = 0
+        while size < index + 1:
+            sequence += 1
+            size = 2 * size + 1
+        while size - 1 != index:
+            size = (size - 1) >> 1
+            sequence -= 1
+            index %= size
+        return 1 << sequence
+
+    def solve(self, assumptions=()) -> bool:
+        """
+        Look for a model of the clauses in which every literal of
+        `assumptions` is true. Return True and leave the model in the
+        values (see value) until the next call, or return False.
+        """
+        if not self.ok:
+            return False
+        self.backtrack(0)
+        if self.propagate() is not None:
+            self.ok = False
+            return False
+        restarts = 0
+        budget = self.restart_base * self.luby(restarts)
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                if not self.limits:
+                    self.ok = False
+                    return False
+                learned, back = self.analyze(conflict)
+                self.backtrack(back)
+                if len(learned) == 1:
+                    self.assign(learned[0], None)
+                else:
+                    self.watches[learned[0]].append(learned)
+                    self.watches[learned[1]].append(learned)
+                    self.learned += 1
+                    self.assign(learned[0], learned)
+                self.increment /= self.decay
+                budget -= 1
+                if budget == 0:
+                    restarts += 1
+                    budget = self.restart_base * self.luby(restarts)
+                    self.backtrack(0)
+                continue
+            level = len(self.limits)
+            if level < len(assumptions):
+                literal = assumptions[level]
+                value = self.values[literal]
+                if value is False:
+                    return False
+                self.limits.append(len(self.trail))
+                if value is None:
+                    self.assign(literal, None)
+                continue
+            variable = self.decide()
+            if variable is None:
+                return True
+            self.decisions += 1
+            self.limits.append(len(self.trail))
+            self.assign(2 * variable + (not self.phase[variable]), None)
+
+
+class SatEngine:
+    """
+    Decides the queries of a KnowledgeBase on its rules read as
+    propositional formulas, including the rules with `|` or `^` in their
+    conclusion that the other engines cannot use.
+
+    The rules are converted once to clauses, each operator of a side
+    getting a variable through the Tseitin encoding (shared
+    subexpressions are encoded once). Besides `condition => conclusion`, a
+    fact that is not given must be supported: it can only be true if the
+    condition of a rule that may conclude it holds (the completion of the
+    rules). Support must also be founded, a cycle of rules like `A => B`
+    and `B => A` does not make its facts true by itself: every model is
+    checked for true facts that only support each other, and when there
+    are some, the clause saying that one of them needs support from
+    outside of the set (its loop formula) is added and the search goes on.
+    On rules without negation, the only model left is the one of the
+    backward engine.
+
+    A query is true when it holds in every model of the clauses with the
+    given facts, false when it holds in none, and undetermined (None)
+    otherwise. After the first model, each search asks for a model in
+    which one of the queries not yet seen with both values takes the
+    other one, so a knowledge base whose queries are all decided takes
+    two searches whatever their number.
+    """
+
+    def __init__(self, kb):
+        self.size = len(kb.symbols)
+        # variable f is the fact f, variable size + f whether it is given
+        self.solver = SatSolver(2 * self.size)
+        self.false = 2 * self.solver.new_variable()
+        self.solver.add_clause((self.false ^ 1,))
+        self.literals = {}  # expression id -> literal
+        self.supports = [[] for _ in range(self.size)]
+        self.loops = 0
+        self.lock = threading.Lock()
+        for rule in kb.rules + kb.ambiguous_rules:
+            condition = rule.get_compiled_condition()
+            literal = self.encode(condition)
+            self.solver.add_clause(
+                (literal ^ 1, self.encode(rule.get_compiled_conclusion())))
+            for fact in self.positive_facts(rule.get_compiled_conclusion()):
+                self.supports[fact].append((condition, literal))
+        for fact in range(self.size):
+            given = 2 * (self.size + fact)
+            self.solver.add_clause((given ^ 1, 2 * fact))
+            self.solver.add_clause(
+                [2 * fact + 1, given] +
+                [literal for _, literal in self.supports[fact]])
+        logger.info("sat: %d variables, %d clauses.", len(self.solver),
+                    self.solver.clauses)
+
+    @staticmethod
+    def positive_facts(expression) -> set:
+        """
+        Facts that `expression` may require to be true: those under an even
+        number of `!`, and every fact under a `^`.
+        """
+        facts = set()
+        pending = [(expression, True)]
+        while pending:
+            expression, positive = pending.pop()
+            if expression.type == NodeTypes.FACT:
+                if positive:
+                    facts.add(expression.value)
+            elif expression.value == OperatorsEnum.NOT.value:
+                pending.append((expression.left, not positive))
+            elif expression.value == OperatorsEnum.XOR.value:
+                facts.update(expression.get_facts())
+            else:
+                pending.append((expression.right, positive))
+                pending.append((expression.left, positive))
+        return facts
+
+    def encode(self, expression, unfounded=(), positive=True, memo=None):
+        """
+        Literal equivalent to `expression`, adding the Tseitin clauses of
+        its operators the first time it is met. With `unfounded`, the facts
+        of that set read in positive position (see positive_facts) are
+        replaced by false, a `^` over them being expanded as in evaluate,
+        and `memo` keeps the literals of this encoding.
+        The subexpressions are encoded before their operator from an
+        explicit stack, so deep conditions do not hit the recursion limit.
+        """
+        if memo is None:
+            memo = self.literals
+        pending = [(expression, positive, memo)]
+        while pending:
+            missing = []
+            if self.encode_step(*pending[-1], unfounded, missing) is None:
+                pending.extend(missing)
+            else:
+                pending.pop()
+        return self.lookup(expression, positive, memo, unfounded, [])
+
+    def lookup(self, expression, positive, memo, unfounded, missing):
+        """
+        Literal of `expression` already encoded in `memo` (self.literals
+        for the plain encoding), None after adding it to `missing`.
+        """
+        plain = memo is self.literals
+        if expression.type == NodeTypes.FACT:
+            if not plain and positive and expression.value in unfounded:
+                return self.false
+            return 2 * expression.value
+        literal = memo.get(expression.id if plain else
+                           (expression.id, positive))
+        if literal is None:
+            missing.append((expression, positive, memo))
+        return literal
+
+    def encode_step(self, expression, positive, memo, unfounded, missing):
+        """
+        Encode `expression` once the literals of its operands are known,
+        and return its literal; otherwise return None, the operands to
+        encode first being in `missing`.
+        """
+        literal = self.lookup(expression, positive, memo, unfounded, [])
+        if literal is not None:
+            return literal
+        plain = memo is self.literals
+        key = expression.id if plain else (expression.id, positive)
+        if expression.value == OperatorsEnum.NOT.value:
+            literal = self.lookup(expression.left, not positive, memo,
+                                  unfounded, missing)
+            if literal is None:
+                return None
+            memo[key] = literal ^ 1
+            return literal ^ 1
+        operands = [self.lookup(operand, positive, memo, unfounded, missing)
+                    for operand in (expression.left, expression.right)]
+        xor = expression.value == OperatorsEnum.XOR.value
+        if not plain:
+            operands += [self.lookup(operand, True, self.literals, (),
+                                     missing)
+                         for operand in (expression.left, expression.right)]
+            if xor:
+                operands += [self.lookup(operand, not positive, memo,
+                                         unfounded, missing)
+                             for operand in (expression.left,
+                                             expression.right)]
+        if None in operands:
+            return None
+        left, right = operands[:2]
+        if not plain:
+            plain_operands = tuple(operands[2:4])
+            if xor:
+                # as in evaluate, `(A + !B) | (!A + B)`
+                negative = tuple(operands[4:])
+                if (left, right) != plain_operands or \
+                        negative != plain_operands:
+                    literal = self.disjunction(
+                        self.conjunction(left, negative[1] ^ 1),
+                        self.conjunction(negative[0] ^ 1, right))
+                    memo[key] = literal
+                    return literal
+            if (left, right) == plain_operands:
+                literal = self.lookup(expression, True, self.literals, (),
+                                      missing)
+                if literal is not None:
+                    memo[key] = literal
+                return literal
+        literal = 2 * self.solver.new_variable()
+        add = self.solver.add_clause
+        if expression.value == OperatorsEnum.AND.value:
+            add((literal ^ 1, left))
+            add((literal ^ 1, right))
+            add((literal, left ^ 1, right ^ 1))
+        elif expression.value == OperatorsEnum.OR.value:
+            add((literal, left ^ 1))
+            add((literal, right ^ 1))
+            add((literal ^ 1, left, right))
+        else:
+            add((literal ^ 1, left, right))
+            add((literal ^ 1, left ^ 1, right ^ 1))
+            add((literal, left ^ 1, right))
+            add((literal, left, right ^ 1))
+        memo[key] = literal
+        return literal
+
+    def conjunction(self, left, right):
+        literal = 2 * self.solver.new_variable()
+        self.solver.add_clause((literal ^ 1, left))
+        self.solver.add_clause((literal ^ 1, right))
+        self.solver.add_clause((literal, left ^ 1, right ^ 1))
+        return literal
+
+    def disjunction(self, left, right):
+        return self.conjunction(left ^ 1, right ^ 1) ^ 1
+
+    def evaluate(self, expression, founded, positive=True) -> bool:
+        """
+        Value of `expression` in the current model, except that the facts
+        read in positive position are only true when they are `founded`.
+        `A ^ B` is read as `(A + !B) | (!A + B)`, each operand in both
+        positions, so that more founded facts never make it false. The
+        operands are evaluated first from an explicit stack, the right
+        operand of `+` and `|` only when the left one does not decide.
+        """
+        AND = OperatorsEnum.AND.value
+        OR = OperatorsEnum.OR.value
+        values = {}  # (expression id, positive) -> value
+        pending = [(expression, positive)]
+        while pending:
+            node, sign = pending[-1]
+            if (node.id, sign) in values:
+                pending.pop()
+                continue
+            if node.type == NodeTypes.FACT:
+                values[(node.id, sign)] = (founded[node.value] if sign else
+                                           self.solver.value(node.value))
+                pending.pop()
+                continue
+            if node.value == OperatorsEnum.NOT.value:
+                needed = [(node.left, not sign)]
+            elif node.value in (AND, OR):
+                needed = [(node.left, sign)]
+                left = values.get((node.left.id, sign))
+                if left is not None and left == (node.value == AND):
+                    needed.append((node.right, sign))
+            else:
+                needed = [(node.left, sign), (node.right, not sign),
+                          (node.left, not sign), (node.right, sign)]
+            missing = [(operand, operand_sign)
+                       for operand, operand_sign in needed
+                       if (operand.id, operand_sign) not in values]
+            if missing:
+                pending.extend(reversed(missing))
+                continue
+            results = [values[(operand.id, operand_sign)]
+                       for operand, operand_sign in needed]
+            if node.value == OperatorsEnum.NOT.value:
+                value = not results[0]
+            elif node.value in (AND, OR):
+                value = results[-1]
+            else:
+                value = (results[0] and not results[1] or
+                         not results[2] and results[3])
+            values[(node.id, sign)] = value
+            pending.pop()
+        return values[(expression.id, positive)]
+
+    def unfounded(self) -> list[int]:
+        """
+        True facts of the current model that are neither given nor derived
+        from given facts by rules whose condition holds.
+        """
+        size = self.size
+        value = self.solver.value
+        founded = [value(size + fact) for fact in range(size)]
+        pending = [fact for fact in range(size)
+                   if value(fact) and not founded[fact]]
+        changed = True
+        while changed and pending:
+            changed = False
+            remaining = []
+            for fact in pending:
+                if any(self.evaluate(condition, founded)
+                       for condition, _ in self.supports[fact]):
+                    founded[fact] = True
+                    changed = True
+                else:
+                    remaining.append(fact)
+            pending = remaining
+        return pending
+
+    def solve(self, assumptions) -> bool:
+        """
+        Look for a model with founded support, adding the loop formula of
+        the unfounded facts of each model that has some.
+        """
+        solver = self.solver
+        while solver.solve(assumptions):
+            unfounded = self.unfounded()
+            if not unfounded:
+                return True
+            members = set(unfounded)
+            memo = {}
+            outside = [2 * (self.size + fact) for fact in unfounded]
+            for fact in unfounded:
+                for condition, _ in self.supports[fact]:
+                    outside.append(self.encode(condition, members, True,
+                                               memo))
+            for fact in unfounded:
+                solver.add_clause([2 * fact + 1] + outside)
+            self.loops += 1
+        return False
+
+    def answer(self, facts: dict, queries) -> dict:
+        """
+        Decide `queries` (fact ids) with `facts` (fact id -> value) given,
+        and return their values by id. Raise ContradictionError when the
+        rules and the facts have no model.
+        """
+        size = self.size
+        assumptions = [2 * (size + fact) + (facts.get(fact) is not True)
+                       for fact in range(size)]
+        with self.lock:
+            solver = self.solver
+            if not self.solve(assumptions):
+                raise ContradictionError(
+                    "The rules contradict the initial facts.")
+            seen = {query: {solver.value(query)}
+                    for query in queries if query < size}
+            while True:
+                single = [query for query, values in seen.items()
+                          if len(values) == 1]
+                if not single:
+                    break
+                # the clause only holds while `selector` is assumed
+                selector = 2 * solver.new_variable()
+                solver.add_clause(
+                    [selector ^ 1] +
+                    [2 * query + next(iter(seen[query]))
+                     for query in single])
+                found = self.solve(assumptions + [selector])
+                if found:
+                    for query, values in seen.items():
+                        values.add(solver.value(query))
+                solver.add_clause((selector ^ 1,))  # clears the model
+                if not found:
+                    break
+            answers = {}
+            for query in queries:
+                if query >= size:
+                    # interned after the rules were encoded: only given
+                    answers[query] = facts.get(query) is True
+                elif len(seen[query]) == 2:
+                    answers[query] = None
+                else:
+                    answers[query] = next(iter(seen[query]))
+            logger.debug("sat: %d conflicts, %d decisions, %d learned "
+                         "clauses and %d loop formulas so far.",
+                         solver.conflicts, solver.decisions, solver.learned,
+                         self.loops)
+        return answers
@@ -0,0 +1,233 @@
+from array import array
+
+from Node import NodeTypes
+from enums import OperatorsEnum
+from utils import Utils
+
+
+class Schedule:
+    """
+    Dependency graph of the facts of a list of compiled rules, where every
+    fact read by the condition of a rule points to the facts its conclusion
+    sets, cut into strongly connected components once when the rules are
+    loaded.
+
+    Components are numbered in evaluation order: the rules concluding the
+    facts of a component only read facts of the same component or of
+    components with a lower number, so solving the components in
+    increasing order resolves every fact once, after everything it depends
+    on. Only the cyclic components (several facts, or a fact reading
+    itself) need to be iterated to a fixpoint. The component and the
+    stratum of each fact are packed in arrays, and the members and the
+    required components of each component are tuples.
+
+    A fact read under a `!` (or a `^`, whose value can drop when an operand
+    becomes true) is read negatively, and the stratum of a component is one
+    more than the strata of the components it reads negatively: a negated
+    fact is complete before any rule reading it runs. A negative read
+    inside a cyclic component cannot be stratified, and the answers of such
+    a component still depend on the order of its rules.
+
+    A fact concluded by a rule and negated by another (`A => F`,
+    `B => !F`) is contested: like the backward engine, it takes the value
+    of the first of its rules that holds, so every fact these rules read
+    is read negatively too. `contested` maps such a fact to the (rule
+    index, positive) links of the rules concluding it, in rule order.
+
+    A component is branching when solving it may read fewer facts than all
+    those it depends on: one of its facts, or of the components it
+    requires, has several rules (the first that holds decides) or a rule
+    whose condition uses `+` or `|` (which can stop at one operand). The
+    lazy engine only walks conditions where that can save expansions.
+    """
+
+    def __init__(self, rules, size: int = None):
+        if size is None:
+            size = 1 + max((fact for rule in rules
+                            for side in (rule.get_condition_facts(),
+                                         rule.get_concluded_facts())
+                            for fact in side), default=-1)
+        self.size = size
+        self.contested = self.contested_facts(rules)
+        edges = {}  # fact -> facts concluded by the rules reading it
+        negative = set()  # (read fact, concluded fact) read negatively
+        rule_counts = {}  # fact -> number of rules concluding it
+        branching = set()  # facts concluded by a rule with `+` or `|`
+        for rule in rules:
+            reads = self.read_facts(rule.get_compiled_condition())
+            concluded = rule.get_concluded_facts()
+            for fact in concluded:
+                rule_counts[fact] = rule_counts.get(fact, 0) + 1
+            if self.has_branches(rule.get_compiled_condition()):
+                branching.update(concluded)
+            for fact, positive in reads.items():
+                edges.setdefault(fact, []).extend(concluded)
+                negative.update((fact, conclusion)
+                                for conclusion in concluded
+                                if not positive or
+                                conclusion in self.contested)
+        tarjan = Utils.strongly_connected_components(size, edges)
+        count = max(tarjan, default=-1) + 1
+        # Tarjan numbers a component after the components it reaches
+        self.component = array("i", [count - 1 - id for id in tarjan])
+        members = [[] for _ in range(count)]
+        for fact, component in enumerate(self.component):
+            members[component].append(fact)
+        self.members = [tuple(facts) for facts in members]
+        requires = {}  # component -> components it reads
+        self.cyclic = set()
+        self.unstratified = set()
+        reads_negatively = set()  # (source, target) read negatively
+        for fact, conclusions in edges.items():
+            source = self.component[fact]
+            for conclusion in conclusions:
+                target = self.component[conclusion]
+                if target != source:
+                    requires.setdefault(target, set()).add(source)
+                    if (fact, conclusion) in negative:
+                        reads_negatively.add((source, target))
+                    continue
+                self.cyclic.add(target)
+                if (fact, conclusion) in negative:
+                    self.unstratified.add(target)
+        # most components require none or few others: a tuple each, the
+        # empty one being shared, keeps large rule sets small
+        self.requires = [tuple(requires.get(component, ()))
+                         for component in range(count)]
+        self.stratum = array("i", [0]) * count
+        self.branching = array("b", [0]) * count
+        for fact, rules_count in rule_counts.items():
+            if rules_count > 1:
+                branching.add(fact)
+        for fact in branching:
+            self.branching[self.component[fact]] = 1
+        for component in range(count):
+            if any(self.branching[source]
+                   for source in self.requires[component]):
+                self.branching[component] = 1
+            for source in self.requires[component]:
+                self.stratum[component] = max(
+                    self.stratum[component],
+                    self.stratum[source] +
+                    ((source, component) in reads_negatively))
+
+    @staticmethod
+    def contested_facts(rules) -> dict:
+        """
+        Facts concluded both positively and negatively by `rules`, mapped
+        to the (rule index, positive) links of all the rules concluding
+        them, in rule order. A conclusion like `F + !F` is positive, as in
+        BackwardEngine.determine_link.
+        """
+        negated = {fact for rule in rules
+                   for fact, positive in rule.get_conclusion_literals()
+                   if not positive}
+        if not negated:
+            return {}
+        links = {}
+        for index, rule in enumerate(rules):
+            literals = rule.get_conclusion_literals()
+            for fact in rule.get_concluded_facts():
+                if fact in negated:
+                    links.setdefault(fact, []).append(
+                        (index, (fact, True) in literals))
+        return {fact: tuple(links[fact]) for fact in links
+                if any(positive for _, positive in links[fact]) and
+                not all(positive for _, positive in links[fact])}
+
+    @staticmethod
+    def read_facts(expression) -> dict:
+        """
+        Facts read by `expression`, mapped to False when at least one read
+        is negative (under an odd number of `!`, or under a `^`).
+        """
+        reads = {}
+        # True or False for a positive or negative position, None for the
+        # operands of a `^`, which are read both ways
+        pending = [(expression, True)]
+        while pending:
+            expression, positive = pending.pop()
+            if expression.type == NodeTypes.FACT:
+                reads[expression.value] = (
+                    reads.get(expression.value, True) and positive is True)
+            elif expression.value == OperatorsEnum.NOT.value:
+                pending.append((expression.left,
+                                None if positive is None else not positive))
+            else:
+                if expression.value == OperatorsEnum.XOR.value:
+                    positive = None
+                pending.append((expression.right, positive))
+                pending.append((expression.left, positive))
+        return reads
+
+    @staticmethod
+    def has_branches(expression) -> bool:
+        """
+        Whether `expression` uses `+` or `|`.
+        """
+        pending = [expression]
+        while pending:
+            expression = pending.pop()
+            if expression.type == NodeTypes.FACT:
+                continue
+            if expression.value in (OperatorsEnum.AND.value,
+                                    OperatorsEnum.OR.value):
+                return True
+            pending.append(expression.left)
+            if expression.right is not None:
+                pending.append(expression.right)
+        return False
+
+    def fact_stratum(self, fact) -> int:
+        """
+        Stratum of `fact`; a fact interned after the rules is only given.
+        """
+        if fact >= self.size:
+            return 0
+        return self.stratum[self.component[fact]]
+
+    def stratified(self, rules, indexes) -> list[int]:
+        """
+        Sort the `indexes` of `rules` by the lowest stratum of the facts
+        their rule concludes, keeping the order of the rules in a stratum,
+        for the engines that fire the rules using `!` or `^` one at a time.
+        An index past the end of `rules` stands for the contested fact of
+        that rank in `contested`, decided at its own stratum.
+        """
+        contested = list(self.contested)
+
+        def stratum(index):
+            if index >= len(rules):
+                return self.fact_stratum(contested[index - len(rules)])
+            return min((self.fact_stratum(fact)
+                        for fact in rules[index].get_concluded_facts()),
+                       default=0)
+        return sorted(indexes, key=stratum)
+
+    def plan(self, fact, planned) -> list[int]:
+        """
+        Components that must be solved to resolve `fact`, skipping those in
+        the set `planned` and adding the others to it, in evaluation order.
+        """
+        if fact >= self.size or self.component[fact] in planned:
+            return []
+        pending = [self.component[fact]]
+        planned.add(pending[0])
+        components = []
+        while pending:
+            component = pending.pop()
+            components.append(component)
+            for source in self.requires[component]:
+                if source not in planned:
+                    planned.add(source)
+                    pending.append(source)
+        components.sort()
+        return components
+
+    def cycles(self) -> list[tuple[list[int], bool]]:
+        """
+        Facts of every cyclic component, in evaluation order, with whether
+        a negation goes through the cycle.
+        """
+        return [(self.members[component], component in self.unstratified)
+                for component in sorted(self.cyclic)]
@@ -0,0 +1,112 @@
+import asyncio
+import json
+import os
+import sys
+
+from enums import EngineEnum
+
+
+class QueryServer:
+    """
+    Answers a stream of JSON requests against one loaded KnowledgeBase, so
+    the rules are read and compiled once for every request. A request is
+    one line such as
+
+        {"id": 1, "facts": ["A", "B"], "queries": ["G", "V"]}
+
+    with the optional keys "engine" (backward, lazy, forward, bitset or
+    sat) and "queries" (the queries of the input file by default). The
+    facts are only asserted for that request, and the answer is the line
+
+        {"id": 1, "answers": {"G": true, "V": false}}
+
+    or {"id": 1, "error": "..."} if the request could not be answered.
+    """
+
+    def __init__(self, kb):
+        self.kb = kb
+
+    def handle(self, line: str | bytes) -> dict:
+        request_id = None
+        try:
+            if isinstance(line, bytes):
+                line = line.decode()
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object.")
+            request_id = request.get("id")
+            facts = request.get("facts", [])
+            queries = request.get("queries")
+            if not self.is_name_list(facts):
+                raise ValueError('"facts" must be a list of fact names.')
+            if queries is not None and not self.is_name_list(queries):
+                raise ValueError('"queries" must be a list of fact names.')
+            engine = EngineEnum(request.get("engine",
+                                            EngineEnum.BACKWARD.value))
+            answers = self.kb.query(queries, facts, engine)
+        except Exception as e:
+            return {"id": request_id, "error": str(e)}
+        return {"id": request_id, "answers": answers}
+
+    @staticmethod
+    def is_name_list(value) -> bool:
+        return (isinstance(value, list) and
+                all(isinstance(name, str) for name in value))
+
+    def respond(self, line: bytes) -> bytes:
+        response = self.handle(line)
+        return (json.dumps(response) + "\n").encode()
+
+    async def serve_stdio(self):
+        """
+        Read requests from stdin and write the answers to stdout, one JSON
+        object per line, until stdin is closed. A regular file given as
+        stdin (`< requests.jsonl`) cannot be read through a pipe transport,
+        so its lines are read in the default executor.
+        """
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        try:
+            await loop.connect_read_pipe(
+                lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+            readline = reader.readline
+        except ValueError:
+            def readline():
+                return loop.run_in_executor(None, sys.stdin.buffer.readline)
+        output = sys.stdout.buffer
+        while True:
+            line = await readline()
+            if not line:
+                return
+            if not line.strip():
+                continue
+            output.write(self.respond(line))
+            output.flush()
+
+    async def serve_unix(self, path):
+        """
+        Accept clients on the Unix socket `path`, each sending requests and
+        reading answers in the same JSON lines format as serve_stdio.
+        """
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self.serve_client, path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+
+    async def serve_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                writer.write(self.respond(line))
+                await writer.drain()
+        finally:
+            writer.close()
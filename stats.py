@@ -0,0 +1,127 @@
+import json
+import time
+from contextlib import contextmanager
+
+from backward import BackwardEngine
+from bytecode import Bytecode
+from enums import OperatorsEnum
+
+
+class Stats:
+    """
+    Counters and timings of a run, in total and per query. Nothing is
+    counted unless a Stats object is given to KnowledgeBase.query, which
+    then solves with InstrumentedBackwardEngine instead of BackwardEngine,
+    so a run without statistics executes no instrumentation code at all.
+    """
+
+    counters = ("rules_looked_up", "goal_expansions", "instructions",
+                "cycle_passes", "goals_avoided")
+
+    def __init__(self):
+        self.run = self.new_counters()
+        self.phases = {}  # phase -> seconds
+        self.queries = {}  # query name -> counters and seconds
+
+    @staticmethod
+    def new_counters():
+        counters = dict.fromkeys(Stats.counters, 0)
+        counters["operators"] = dict.fromkeys(
+            (operator.value for operator in OperatorsEnum), 0)
+        return counters
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = (self.phases.get(name, 0) +
+                                 time.perf_counter() - start)
+
+    def add_query(self, name, counters, seconds):
+        counters["time"] = seconds
+        self.queries[name] = counters
+
+    def to_dict(self):
+        return {"run": self.run, "phases": self.phases,
+                "queries": self.queries}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_text(self):
+        lines = ["Statistics:"]
+        for phase, seconds in self.phases.items():
+            lines.append(f"  {phase:<16} {seconds * 1e3:10.3f} ms")
+        lines.extend(self.format_counters("run", self.run))
+        for name, counters in self.queries.items():
+            lines.append(f"  query {name:<10} "
+                         f"{counters['time'] * 1e3:10.3f} ms")
+            lines.extend(self.format_counters("", counters))
+        return "\n".join(lines)
+
+    @staticmethod
+    def format_counters(title, counters):
+        lines = [f"  {title}"] if title else []
+        for counter in Stats.counters:
+            lines.append(f"    {counter:<16} {counters[counter]:>10}")
+        operators = " ".join(f"{operator}:{count}" for operator, count
+                             in counters["operators"].items())
+        lines.append(f"    {'operators':<16} {operators}")
+        return lines
+
+
+class InstrumentedBackwardEngine(BackwardEngine):
+    """
+    BackwardEngine counting its work into the current counters of a
+    Stats object.
+    """
+
+    def __init__(self, kb, facts: dict, stats: Stats):
+        super().__init__(kb, facts)
+        self.stats = stats
+        self.counters = stats.run
+
+    def solve(self, queries) -> dict:
+        symbols = self.kb.symbols
+        values = {}
+        for query in queries:
+            self.counters = Stats.new_counters()
+            start = time.perf_counter()
+            values[query] = self.resolve_goal(query)
+            self.stats.add_query(symbols.name(query), self.counters,
+                                 time.perf_counter() - start)
+            self.merge(self.stats.run, self.counters)
+        self.counters = self.stats.run
+        return values
+
+    @staticmethod
+    def merge(total, counters):
+        for counter in Stats.counters:
+            total[counter] += counters[counter]
+        for operator, count in counters["operators"].items():
+            total["operators"][operator] += count
+
+    def expand_goal(self, fact):
+        goals = len(self.goals)
+        super().expand_goal(fact)
+        self.counters["goal_expansions"] += len(self.goals) - goals
+
+    def solve_pass(self, members) -> bool:
+        self.counters["cycle_passes"] += 1
+        return super().solve_pass(members)
+
+    def solve_goal(self, fact):
+        self.counters["rules_looked_up"] += len(
+            self.kb.rules_index.get(fact, ()))
+        return super().solve_goal(fact)
+
+    def evaluate(self, rule):
+        code = rule.get_bytecode()
+        self.counters["instructions"] += len(code)
+        operators = self.counters["operators"]
+        for op in code:
+            if op < 0:
+                operators[Bytecode.operators[op]] += 1
+        return super().evaluate(rule)
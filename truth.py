@@ -0,0 +1,295 @@
+from collections import deque
+
+from bytecode import Bytecode
+from forward import ForwardEngine
+from schedule import Schedule
+
+
+class TruthMaintenance:
+    """
+    Keeps the answers of a KnowledgeBase up to date while facts are
+    asserted and retracted, like the forward engine would compute them
+    from scratch but only re-evaluating what a change can affect.
+
+    Every rule whose condition holds supports the facts of its conclusion,
+    and a fact is true while it is asserted or supported by at least one
+    rule. When a fact changes, only the rules reading it are evaluated
+    again, and only the facts whose support appears or disappears change
+    in turn.
+    Support counting alone would let the facts of a cycle (`A => B`,
+    `B => A`) keep each other true once their outside support is gone, so
+    when a fact of a cyclic component may lose a support (a fact read by
+    one of its rules becomes false, or a fact read under a `!` or a `^`
+    changes), the whole component is derived again from the facts around
+    it.
+    A contested fact of the Schedule (concluded by a rule and negated by
+    another) is only supported while the first of its rules that holds
+    concludes it, the rules negating it being kept in `against`.
+    As with the forward engine, the answers of a knowledge base with a
+    negation through a cycle depend on the order of evaluation.
+    """
+
+    def __init__(self, kb):
+        self.kb = kb
+        self.conditions = []
+        self.conclusions = []
+        self.readers = {}  # fact -> rules whose condition reads it
+        self.negative = set()  # (fact, rule) read under a `!` or a `^`
+        self.concluders = {}  # fact -> rules concluding it
+        self.negated = []  # contested facts each rule negates
+        schedule = kb.schedule()
+        contested = schedule.contested
+        for index, rule in enumerate(kb.rules):
+            self.conditions.append(rule.get_bytecode())
+            self.conclusions.append(ForwardEngine.positive_conclusions(rule))
+            literals = rule.get_conclusion_literals()
+            self.negated.append([fact for fact in rule.get_concluded_facts()
+                                 if fact in contested and
+                                 (fact, True) not in literals])
+            reads = Schedule.read_facts(rule.get_compiled_condition())
+            for fact, positive in reads.items():
+                self.readers.setdefault(fact, []).append(index)
+                if not positive:
+                    self.negative.add((fact, index))
+            for fact in self.conclusions[index] + self.negated[index]:
+                self.concluders.setdefault(fact, []).append(index)
+        # the components of the Schedule; a fact interned after the rules
+        # is in none of them, and makes one on its own
+        count = len(schedule.members)
+        self.component = list(schedule.component) + list(
+            range(count, count + len(kb.symbols) - schedule.size))
+        self.cyclic = schedule.cyclic
+        self.members = {component: schedule.members[component]
+                        for component in self.cyclic}
+
+        self.asserted = {fact for fact, value in kb.facts.items()
+                         if value is True}
+        self.values = dict.fromkeys(range(len(kb.symbols)), False)
+        self.firing = [False] * len(kb.rules)
+        self.support = {}  # fact -> rules currently concluding it
+        self.against = {}  # contested fact -> rules currently negating it
+        self.evaluations = 0  # conditions evaluated by the last update
+        self.changed = {}
+        queue = deque()
+        for fact in self.asserted:
+            self.values[fact] = True
+        for index in range(len(kb.rules)):
+            for component in self._evaluate(index, queue):
+                self._rederive(component, queue)
+        self._propagate(queue)
+
+    def fact_ids(self, names):
+        ids = []
+        for name in names:
+            fact = self.kb.symbols.get(name)
+            if fact is None:
+                raise ValueError(f"Unknown fact: {name}")
+            ids.append(fact)
+        return ids
+
+    def assert_facts(self, names) -> dict:
+        """
+        Assert the facts `names` and return the facts whose value changed,
+        by name.
+        """
+        self.evaluations = 0
+        self.changed = {}
+        queue = deque()
+        for fact in self.fact_ids(names):
+            self.asserted.add(fact)
+            self._set(fact, True, queue)
+        self._propagate(queue)
+        return self.changes()
+
+    def retract_facts(self, names) -> dict:
+        """
+        Retract the facts `names` and return the facts whose value changed,
+        by name. A retracted fact stays true while a rule supports it.
+        """
+        self.evaluations = 0
+        self.changed = {}
+        queue = deque()
+        cyclic = set()
+        for fact in self.fact_ids(names):
+            if fact not in self.asserted:
+                continue
+            self.asserted.discard(fact)
+            if self.component[fact] in self.cyclic:
+                cyclic.add(self.component[fact])
+            elif not self._supported(fact):
+                self._set(fact, False, queue)
+        for component in cyclic:
+            self._rederive(component, queue)
+        self._propagate(queue)
+        return self.changes()
+
+    def asserted_names(self) -> set:
+        return {self.kb.symbols.name(fact) for fact in self.asserted}
+
+    def changes(self) -> dict:
+        symbols = self.kb.symbols
+        return {symbols.name(fact): self.values[fact]
+                for fact, before in self.changed.items()
+                if self.values[fact] != before}
+
+    def answers(self, queries=None) -> dict:
+        """
+        Current values of `queries` (names, the queries of the knowledge
+        base by default).
+        """
+        symbols = self.kb.symbols
+        if queries is None:
+            queries = [symbols.name(query) for query in self.kb.queries]
+        answers = {}
+        for name in queries:
+            fact = symbols.get(name)
+            answers[name] = self.values[fact] if fact is not None else False
+        return answers
+
+    def _supported(self, fact) -> bool:
+        """
+        Whether a rule holding supports `fact`, before any rule holding
+        negates it.
+        """
+        support = self.support.get(fact)
+        if not support:
+            return False
+        against = self.against.get(fact)
+        return not against or min(support) < min(against)
+
+    def _set(self, fact, value, queue):
+        if self.values[fact] == value:
+            return
+        self.changed.setdefault(fact, self.values[fact])
+        self.values[fact] = value
+        queue.append(fact)
+
+    def _evaluate(self, index, queue):
+        """
+        Evaluate the condition of rule `index` again and update the support
+        of its conclusions. Return the cyclic components in which a fact
+        lost a support but is still supported, which must be derived again.
+        """
+        self.evaluations += 1
+        holds = Bytecode.run(self.conditions[index], self.values) is True
+        if holds == self.firing[index]:
+            return ()
+        self.firing[index] = holds
+        rederive = []
+        for fact in self.conclusions[index]:
+            support = self.support.setdefault(fact, set())
+            if holds:
+                support.add(index)
+                if self._supported(fact):
+                    self._set(fact, True, queue)
+                continue
+            support.discard(index)
+            if fact in self.asserted:
+                continue
+            if self.component[fact] in self.cyclic:
+                rederive.append(self.component[fact])
+            elif not self._supported(fact):
+                self._set(fact, False, queue)
+        for fact in self.negated[index]:
+            against = self.against.setdefault(fact, set())
+            if holds:
+                against.add(index)
+            else:
+                against.discard(index)
+            if fact in self.asserted:
+                continue
+            if self.component[fact] in self.cyclic:
+                rederive.append(self.component[fact])
+            else:
+                self._set(fact, self._supported(fact), queue)
+        return rederive
+
+    def _propagate(self, queue):
+        while queue:
+            fact = queue.popleft()
+            rederive = set()
+            for index in self.readers.get(fact, ()):
+                rederive.update(self._evaluate(index, queue))
+                if self.values[fact] and (fact, index) not in self.negative:
+                    continue
+                # The rule may still hold through the cycle it feeds, which
+                # is then no longer supported by `fact`.
+                for conclusion in self.conclusions[index]:
+                    component = self.component[conclusion]
+                    if (component in self.cyclic and
+                            component != self.component[fact]):
+                        rederive.add(component)
+            for component in rederive:
+                self._rederive(component, queue)
+
+    def _rederive(self, component, queue):
+        """
+        Derive the facts of a cyclic component again, with the other cyclic
+        components its rules also conclude facts of (and theirs, found
+        through a worklist): they all start from false (unless asserted),
+        then the rules concluding each component fire until nothing
+        changes, so a fact only stays true if it is supported from outside
+        the cycles.
+        """
+        components = {component}
+        pending = [component]
+        concluders = {}  # component -> rules concluding its facts
+        while pending:
+            component = pending.pop()
+            rules = concluders[component] = sorted(
+                {index for fact in self.members[component]
+                 for index in self.concluders.get(fact, ())})
+            for index in rules:
+                for conclusion in self.conclusions[index]:
+                    other = self.component[conclusion]
+                    if other in self.cyclic and other not in components:
+                        components.add(other)
+                        pending.append(other)
+        members = [fact for component in components
+                   for fact in self.members[component]]
+        before = {fact: self.values[fact] for fact in members}
+        for fact in members:
+            self.values[fact] = fact in self.asserted
+        outside = set()
+        for rules in concluders.values():
+            for index in rules:
+                self.firing[index] = False
+                for fact in self.conclusions[index]:
+                    self.support.get(fact, set()).discard(index)
+                    if self.component[fact] not in components:
+                        outside.add(fact)
+                for fact in self.negated[index]:
+                    self.against.get(fact, set()).discard(index)
+                    if self.component[fact] not in components:
+                        outside.add(fact)
+        # in evaluation order, so that the facts a rule reads under a `!`
+        # are derived before it
+        for component in sorted(components):
+            changed = True
+            while changed:
+                changed = False
+                for index in concluders[component]:
+                    if self.firing[index]:
+                        continue
+                    self.evaluations += 1
+                    if Bytecode.run(self.conditions[index],
+                                    self.values) is not True:
+                        continue
+                    self.firing[index] = True
+                    for fact in self.negated[index]:
+                        self.against.setdefault(fact, set()).add(index)
+                    for fact in self.conclusions[index]:
+                        self.support.setdefault(fact, set()).add(index)
+                        if (self.component[fact] in components and
+                                not self.values[fact] and
+                                self._supported(fact)):
+                            self.values[fact] = True
+                            changed = True
+        for fact in members:
+            if self.values[fact] != before[fact]:
+                self.changed.setdefault(fact, before[fact])
+                queue.append(fact)
+        # the other facts these rules conclude are not in a cycle
+        for fact in outside:
+            self._set(fact, fact in self.asserted or
+                      self._supported(fact), queue)
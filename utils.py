@@ -1,24 +1,12 @@
+import logging
 import string
 from Rule import Rule
 
+logger = logging.getLogger("expert_system.parser")
 
-class Utils:
-    authorized_symbols = "!=><+|^()?# "
-
-    @staticmethod
-    def resolve_fact(Facts, fact, status):
-        if status is not True and status is not False and status is not None:
-            raise ValueError("Status must be True, False, or None")
-        Facts[fact] = status
 
-    @staticmethod
-    def get_associated_rules(rules, fact):
-        associated_rules = []
-        for rule in rules:
-            conclusion = rule.get_conclusion()
-            if conclusion.get_fact() == fact:
-                associated_rules.append(rule)
-        return associated_rules
+class Utils:
+    authorized_symbols = "!=><+|^()?# _"
 
     @staticmethod
     def remove_query(queries, query_to_remove):
@@ -35,36 +23,81 @@ class Utils:
     def is_string_valid(line):
         for char in line:
             if ((char not in string.ascii_letters)
+                    and (char not in string.digits)
                     and (char not in Utils.authorized_symbols)):
-                print(f"Invalid character found: {char}")
+                logger.debug("Invalid character found: %s", char)
                 return False
         return True
 
     @staticmethod
-    def is_rule_valid(rule):
-        if (("<=>" not in rule) and ("=>" not in rule)):
-            return False
-        if (not rule[0].isalpha()):
-            return False
-        if (rule.isalpha()):
-            return False
-        return True
+    def is_fact_name(name):
+        return (len(name) > 0 and name[0].isalpha() and
+                all(char.isalnum() or char == "_" for char in name))
+
+    @staticmethod
+    def is_letter_group(name):
+        """
+        Whether `=` and `?` lines read `name` one letter per fact: ASCII
+        letters all in the same case, like `ABC` or `abc`.
+        """
+        return (name.isascii() and name.isalpha() and
+                (name.isupper() or name.islower()))
 
     @staticmethod
-    def is_char(char):
-        return char.isalpha() and len(char) == 1
+    def index_rule(index: dict[int, list[Rule]], rule: Rule):
+        """
+        Register `rule` under every fact its conclusion sets, so that the
+        rules concluding a fact can be looked up without scanning Rules.
+        """
+        for fact in rule.get_concluded_facts():
+            index.setdefault(fact, []).append(rule)
 
     @staticmethod
-    def find_associated_rules(query: str, Rules: list[Rule]):
-        if not Utils.is_char(query):
-            raise TypeError("""Wrong argument: expected a
-                    character and an array of Rule objects.""")
-        associated_rules = []
-        for rule in Rules:
-            if (query in rule.conclusions):
-                associated_rules.append(rule)
+    def strongly_connected_components(size: int, edges: dict):
+        """
+        Tarjan's algorithm, without recursion, over the nodes 0..size-1 and
+        `edges` (node -> successors). Return the component id of every node;
+        components are numbered in reverse topological order, a component
+        only reaching components with a lower id.
+        """
+        index = [-1] * size
+        lowlink = [0] * size
+        component = [-1] * size
+        stack = []
+        count = 0
+        next_index = 0
+        for root in range(size):
+            if index[root] != -1:
                 continue
-        return associated_rules
+            work = [(root, iter(edges.get(root, ())))]
+            index[root] = lowlink[root] = next_index
+            next_index += 1
+            stack.append(root)
+            while work:
+                node, successors = work[-1]
+                for successor in successors:
+                    if index[successor] == -1:
+                        index[successor] = lowlink[successor] = next_index
+                        next_index += 1
+                        stack.append(successor)
+                        work.append((successor,
+                                     iter(edges.get(successor, ()))))
+                        break
+                    if component[successor] == -1:
+                        lowlink[node] = min(lowlink[node], index[successor])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        while True:
+                            member = stack.pop()
+                            component[member] = count
+                            if member == node:
+                                break
+                        count += 1
+        return component
 
     @staticmethod
     def find_all_indexes(str, char):
@@ -0,0 +1,154 @@
+from Node import NodeTypes
+from enums import OperatorsEnum
+from forward import ForwardEngine
+from schedule import Schedule
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for batched evaluation
+    np = None
+
+
+class VectorEngine:
+    """
+    Evaluates one rule set against many initial-fact scenarios at once.
+    The scenarios are a boolean array of shape (scenarios, facts); every
+    pass evaluates each rule condition as `&`, `|`, `^` and `~` over whole
+    columns and ORs the result into the columns of its conclusions, until
+    no scenario changes. Rules using `!` or `^` are handled like in
+    ForwardEngine: once the monotone rules are saturated, each scenario
+    fires the first of them (in the order of the strata) that makes a new
+    fact true, then saturates again. The decisions of the contested facts
+    of the Schedule take their place among these rules, a scenario making
+    such a fact true when the first of its rules that holds concludes it.
+    """
+
+    def __init__(self, rules, size, schedule: Schedule = None):
+        if np is None:
+            raise ImportError("The vectorized engine requires numpy.")
+        schedule = schedule or Schedule(rules, size)
+        self.size = size  # number of facts, the column of a fact is its id
+        self.contested = list(schedule.contested.items())
+        self.conditions = []
+        self.conclusions = []
+        self.monotone = []
+        self.deferred = []
+        for index, rule in enumerate(rules):
+            condition = rule.get_compiled_condition()
+            self.conditions.append(condition)
+            self.conclusions.append(np.array(
+                ForwardEngine.positive_conclusions(rule, schedule.contested),
+                dtype=np.intp))
+            if ForwardEngine.is_monotone(condition):
+                self.monotone.append(index)
+            else:
+                self.deferred.append(index)
+        for fact, _ in self.contested:
+            self.conclusions.append(np.array([fact], dtype=np.intp))
+        self.deferred = schedule.stratified(
+            rules, self.deferred +
+            ForwardEngine.decisions(rules, self.contested))
+        self.passes = 0
+
+    def scenarios(self, scenarios) -> "np.ndarray":
+        """
+        Build the initial state array from one list of true fact ids per
+        scenario.
+        """
+        scenarios = list(scenarios)
+        state = np.zeros((len(scenarios), self.size), dtype=bool)
+        for row, facts in enumerate(scenarios):
+            state[row, facts] = True
+        return state
+
+    def evaluate(self, expression, state, memo):
+        """
+        Evaluate `expression` for every scenario. Subexpressions shared
+        between rules are computed once per pass through `memo`, and the
+        operands are computed first from an explicit stack, so deep
+        conditions do not hit the recursion limit.
+        """
+        pending = [expression]
+        while pending:
+            node = pending[-1]
+            if node.id in memo:
+                pending.pop()
+                continue
+            if node.type == NodeTypes.FACT:
+                memo[node.id] = state[:, node.value]
+                pending.pop()
+                continue
+            operands = [operand for operand in (node.left, node.right)
+                        if operand is not None and operand.id not in memo]
+            if operands:
+                pending.extend(operands)
+                continue
+            pending.pop()
+            left = memo[node.left.id]
+            if node.value == OperatorsEnum.NOT.value:
+                memo[node.id] = ~left
+                continue
+            right = memo[node.right.id]
+            if node.value == OperatorsEnum.AND.value:
+                memo[node.id] = left & right
+            elif node.value == OperatorsEnum.OR.value:
+                memo[node.id] = left | right
+            else:
+                memo[node.id] = left ^ right
+        return memo[expression.id]
+
+    def run(self, state) -> "np.ndarray":
+        """
+        Saturate every scenario of `state` in place and return it.
+        """
+        self.passes = 0
+        while True:
+            self._saturate(state)
+            pending = np.ones(len(state), dtype=bool)
+            memo = {}
+            for index in self.deferred:
+                conclusions = self.conclusions[index]
+                if len(conclusions) == 0:
+                    continue
+                if index < len(self.conditions):
+                    holds = self.evaluate(self.conditions[index], state, memo)
+                else:
+                    holds = self.decide(index, state, memo)
+                fires = (pending & holds &
+                         ~state[:, conclusions].all(axis=1))
+                if fires.any():
+                    state[np.ix_(fires, conclusions)] = True
+                    pending &= ~fires
+            self.passes += 1
+            if pending.all():
+                return state
+
+    def decide(self, index, state, memo) -> "np.ndarray":
+        """
+        Scenarios in which the first rule holding of the contested fact of
+        decision `index` concludes it.
+        """
+        _, links = self.contested[index - len(self.conditions)]
+        decided = np.zeros(len(state), dtype=bool)
+        positive = np.zeros(len(state), dtype=bool)
+        for rule, concludes in links:
+            holds = (self.evaluate(self.conditions[rule], state, memo) &
+                     ~decided)
+            if concludes:
+                positive |= holds
+            decided |= holds
+        return positive
+
+    def _saturate(self, state):
+        while True:
+            self.passes += 1
+            before = state.copy()
+            memo = {}
+            for index in self.monotone:
+                conclusions = self.conclusions[index]
+                if len(conclusions) == 0:
+                    continue
+                fires = self.evaluate(self.conditions[index], before, memo)
+                state[:, conclusions] |= fires[:, None]
+            if np.array_equal(before, state):
+                return